@@ -0,0 +1,325 @@
+"""
+并发会话压力测试
+用 Streamlit AppTest 在同一进程内模拟 N 个同时在线的学生（每个学生一个线程、一个会话），
+每个学生登录后反复切换核心问题并提交浏览器端暂存的交互记录，统计重跑耗时分位数和吞吐量，
+结束后核对交互记录：按（学生, 节点）比较提交的访问次数与最终存储的访问次数，发现丢失或重复
+
+后端：
+    json   —— 不连接Neo4j，交互记录只写入本地缓冲文件
+    neo4j  —— 用内存中的 Neo4j 替身（实现 UNWIND … MERGE 的按 id 合并语义，可设置写入延迟）接收后台同步
+
+用法：
+    python benchmarks/load_test.py --students 20 --steps 10
+    python benchmarks/load_test.py --backend neo4j --students 50 --write-latency-ms 20
+"""
+import argparse
+import json
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+
+# 浏览器端暂存的交互记录通过这个会话状态键传给替换后的 st_javascript
+PENDING_KEY = "loadtest_pending"
+
+
+def _app_script():
+    """AppTest 执行的脚本：导入（已打过补丁的）主程序模块并运行一次 main()"""
+    import gjf_graph_main
+    gjf_graph_main.main()
+
+
+def _fake_st_javascript(code, key=None):
+    """替换 streamlit_javascript：读取暂存交互记录时返回压测线程放入会话状态的数据，其余脚本返回 None"""
+    import streamlit as st
+    if "pending_interactions" in code:
+        return st.session_state.pop(PENDING_KEY, None)
+    return None
+
+
+def _share_apptest_runtime():
+    """
+    AppTest 每次运行都会替换进程全局的 Runtime 单例，并在结束时把它清空，多个线程同时运行时会互相打断；
+    这里让所有会话共用第一个创建的模拟 Runtime，与真实服务器中所有会话共用一个 Runtime 的情况一致
+    """
+    from streamlit import config
+    from streamlit.runtime import Runtime
+
+    shared = {}
+
+    def instance(cls):
+        if cls._instance is not None:
+            shared.setdefault("runtime", cls._instance)
+        if "runtime" not in shared:
+            raise RuntimeError("Runtime hasn't been created!")
+        return shared["runtime"]
+
+    Runtime.instance = classmethod(instance)
+    Runtime.exists = classmethod(lambda cls: cls._instance is not None or "runtime" in shared)
+    # AppTest 运行期间临时打开该选项、结束时恢复原值；事先打开，避免并发运行时被其他线程恢复为关闭
+    config.set_option("global.appTest", True)
+
+
+# ==================== Neo4j 替身 ====================
+class Neo4jStandInStore:
+    """替身的共享存储：Interaction 节点按 id 保存，写入按批加锁并模拟网络和事务延迟"""
+
+    def __init__(self, write_latency):
+        self.write_latency = write_latency
+        self.nodes = {}
+        self.creates = 0
+        self.updates = 0
+        self.write_batches = 0
+        self._lock = threading.Lock()
+
+    def merge(self, events):
+        time.sleep(self.write_latency)
+        now_ms = int(time.time() * 1000)
+        with self._lock:
+            self.write_batches += 1
+            for event in events:
+                node = self.nodes.get(event["id"])
+                if node is None:
+                    # ON CREATE SET
+                    node = self.nodes[event["id"]] = {
+                        key: event.get(key) for key in ("id", "student_id", "node_id", "node_label", "action_type", "timestamp")
+                    }
+                    self.creates += 1
+                else:
+                    self.updates += 1
+                # SET
+                node["count"] = event.get("count") if event.get("count") is not None else 1
+                node["duration"] = event.get("duration")
+                node["synced_ms"] = now_ms
+
+    def query(self, since=None):
+        with self._lock:
+            return [dict(node) for node in self.nodes.values() if since is None or node["synced_ms"] > since]
+
+
+def make_stand_in_class(base, store):
+    """生成 Neo4jConnection 的替身子类：只实现主程序用到的读写接口"""
+
+    class Neo4jStandIn(base):
+        def __init__(self, uri=None, user=None, password=None):
+            self.driver = object()
+
+        @classmethod
+        def shared(cls, driver):
+            return cls()
+
+        def close(self):
+            pass
+
+        def execute_write(self, query, parameters=None):
+            if "UNWIND $events" in query:
+                store.merge((parameters or {})["events"])
+            # 约束、索引等语句在替身中无需处理
+            return None
+
+        def execute_query(self, query, parameters=None):
+            return store.query((parameters or {}).get("since"))
+
+        def iter_query(self, query, parameters=None, fetch_size=1000):
+            yield from store.query()
+
+    return Neo4jStandIn
+
+
+# ==================== 模拟学生 ====================
+class SimulatedStudent(threading.Thread):
+    def __init__(self, index, args, node_pool, start_barrier):
+        super().__init__(name=f"student-{index}", daemon=True)
+        self.student_id = f"load{index:04d}"
+        self.args = args
+        self.rng = random.Random(args.seed * 100003 + index)
+        self.node_pool = node_pool
+        self.start_barrier = start_barrier
+        self.latencies = []          # 每次重跑的耗时（秒）
+        self.submitted = {}          # node_id -> 提交的访问次数
+        self.error = None
+
+    def _run_app(self, at):
+        start = time.perf_counter()
+        at.run()
+        self.latencies.append(time.perf_counter() - start)
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+
+    def run(self):
+        from streamlit.testing.v1 import AppTest
+        try:
+            at = AppTest.from_function(_app_script, default_timeout=self.args.timeout)
+            self.start_barrier.wait()
+            self._run_app(at)
+
+            # 登录
+            at.text_input(key="login_input_field").input(self.student_id)
+            next(button for button in at.button if button.label == "确认登录").click()
+            self._run_app(at)
+
+            for _ in range(self.args.steps):
+                # 切换核心问题
+                question_radio = at.sidebar.radio[1]
+                question_radio.set_value(self.rng.choice(question_radio.options))
+
+                # 浏览器端暂存的交互记录，在本次重跑中提交
+                pending = []
+                for _ in range(self.rng.randint(1, self.args.max_pending)):
+                    node_id, label = self.rng.choice(self.node_pool)
+                    count = self.rng.randint(1, 3)
+                    pending.append({"node_id": node_id, "node_label": label, "count": count,
+                                    "duration": round(self.rng.uniform(1, 60), 1)})
+                    self.submitted[node_id] = self.submitted.get(node_id, 0) + count
+                at.session_state[PENDING_KEY] = json.dumps(pending, ensure_ascii=False)
+                self._run_app(at)
+
+                if self.args.think_time:
+                    time.sleep(self.rng.uniform(0, self.args.think_time))
+        except Exception as e:
+            self.error = f"{type(e).__name__}: {e}"
+
+
+# ==================== 结果核对 ====================
+def reconcile(students, records):
+    """按（学生, 节点）比较提交的访问次数与存储的访问次数"""
+    stored = {}
+    for record in records:
+        key = (record.get("student_id"), record.get("node_id"))
+        stored[key] = stored.get(key, 0) + int(record.get("count") or 1)
+
+    expected = {}
+    for student in students:
+        for node_id, count in student.submitted.items():
+            expected[(student.student_id, node_id)] = count
+
+    lost = sum(max(count - stored.get(key, 0), 0) for key, count in expected.items())
+    duplicated = sum(max(stored.get(key, 0) - expected.get(key, 0), 0) for key in stored)
+    return {
+        "expected_views": sum(expected.values()),
+        "stored_views": sum(stored.values()),
+        "stored_records": len(records),
+        "lost_views": lost,
+        "duplicated_views": duplicated,
+    }
+
+
+def _percentile(sorted_values, q):
+    if not sorted_values:
+        return 0.0
+    index = min(int(round(q * (len(sorted_values) - 1))), len(sorted_values) - 1)
+    return sorted_values[index]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="并发会话压力测试（Streamlit AppTest）")
+    parser.add_argument("--students", type=int, default=10, help="同时在线的学生数")
+    parser.add_argument("--steps", type=int, default=10, help="每个学生切换核心问题并提交交互记录的次数")
+    parser.add_argument("--max-pending", type=int, default=5, help="每次重跑最多提交的交互记录数")
+    parser.add_argument("--think-time", type=float, default=0.0, help="两次操作之间的最长思考时间（秒）")
+    parser.add_argument("--backend", choices=["json", "neo4j"], default="json")
+    parser.add_argument("--write-latency-ms", type=float, default=5.0, help="Neo4j 替身每批写入的延迟（毫秒）")
+    parser.add_argument("--graph", help="知识图谱JSON文件（默认使用项目中的 国际法知识图谱.json）")
+    parser.add_argument("--timeout", type=float, default=120, help="单次重跑的超时时间（秒）")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", help="把结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    # 临时目录在结束时删除（后台同步线程可能仍持有其中的文件，删除失败时忽略）
+    with tempfile.TemporaryDirectory(prefix="gjf_load_", ignore_cleanup_errors=True) as work_dir:
+        result = run_load_test(args, work_dir)
+    if result["errors"] or result["lost_views"] or result["duplicated_views"]:
+        print("❌ 发现错误、丢失或重复的交互记录")
+        sys.exit(1)
+    print("✅ 交互记录无丢失、无重复")
+
+
+def run_load_test(args, work_dir):
+    """在 work_dir 中运行压测，打印并返回结果"""
+    # 导入主程序并打补丁：交互记录写入临时目录，浏览器端脚本由压测线程提供数据
+    os.environ["NEO4J_URI"] = "bolt://127.0.0.1:1"
+    sys.path.insert(0, REPO_DIR)
+    import gjf_graph_main as app
+    app.INTERACTIONS_FILE = os.path.join(work_dir, "interactions_log.jsonl")
+    app.LEGACY_INTERACTIONS_FILE = os.path.join(work_dir, "interactions_log.json")
+    # 只托管配置区的默认课程（忽略部署目录中的课程列表文件）
+    app.COURSES_FILE = os.path.join(work_dir, "courses.json")
+    app.st_javascript = _fake_st_javascript
+    if args.graph:
+        app.JSON_FILE_PATH = os.path.abspath(args.graph)
+
+    store = None
+    if args.backend == "neo4j":
+        store = Neo4jStandInStore(args.write_latency_ms / 1000)
+        app.Neo4jConnection = make_stand_in_class(app.Neo4jConnection, store)
+
+    with open(app.JSON_FILE_PATH, "r", encoding="utf-8") as f:
+        graph = json.load(f)
+    node_pool = [(node["id"], node["label"]) for node in graph["nodes"]]
+
+    _share_apptest_runtime()
+    barrier = threading.Barrier(args.students)
+    students = [SimulatedStudent(index, args, node_pool, barrier) for index in range(args.students)]
+    print(f"▶️ {args.students} 个学生 × {args.steps} 步，后端 {args.backend}，临时目录 {work_dir}")
+    wall_start = time.perf_counter()
+    for student in students:
+        student.start()
+    for student in students:
+        student.join()
+    wall = time.perf_counter() - wall_start
+
+    # 等待后台同步完成，再核对存储结果
+    course_key = app.current_course().key
+    spool = app.get_interaction_spool(course_key)
+    if store is not None:
+        app.get_spool_replayer(course_key).sync_once()
+        records = store.query()
+    else:
+        records = spool.read_all()
+
+    latencies = sorted(latency for student in students for latency in student.latencies)
+    errors = [f"{student.student_id}: {student.error}" for student in students if student.error]
+    submitted_records = sum(len(student.submitted) for student in students)
+    result = {
+        "time": datetime.now().isoformat(timespec="seconds"),
+        "backend": args.backend,
+        "students": args.students,
+        "steps": args.steps,
+        "reruns": len(latencies),
+        "wall_s": round(wall, 3),
+        "reruns_per_s": round(len(latencies) / wall, 2) if wall else 0.0,
+        "rerun_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 1) if latencies else 0.0,
+            "p50": round(_percentile(latencies, 0.50) * 1000, 1),
+            "p95": round(_percentile(latencies, 0.95) * 1000, 1),
+            "p99": round(_percentile(latencies, 0.99) * 1000, 1),
+            "max": round(latencies[-1] * 1000, 1) if latencies else 0.0,
+        },
+        "submitted_student_nodes": submitted_records,
+        "errors": errors,
+        **reconcile(students, records),
+    }
+    if store is not None:
+        result["neo4j_stand_in"] = {
+            "write_batches": store.write_batches,
+            "creates": store.creates,
+            "updates": store.updates,
+            "spool_records": len(spool.read_all()),
+        }
+
+    print(json.dumps(result, ensure_ascii=False, indent=2))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""
+性能基准测试
+在 100 / 1k / 10k / 100k 节点的合成图谱上测量主程序的热点函数，结果写入 JSON 文件，便于在版本之间对比
+
+每个（用例, 规模）在独立的子进程中运行：互不影响缓存和内存，超时的用例记为 timeout 而不会拖住整个测试
+
+用法：
+    python benchmarks/run_benchmarks.py                          # 全部用例和规模
+    python benchmarks/run_benchmarks.py --sizes 100 1000 --repeat 5
+    python benchmarks/run_benchmarks.py --compare benchmarks/results/旧版本.json
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+BENCH_DIR = os.path.dirname(os.path.abspath(__file__))
+REPO_DIR = os.path.dirname(BENCH_DIR)
+RESULTS_DIR = os.path.join(BENCH_DIR, "results")
+
+DEFAULT_SIZES = [100, 1000, 10000, 100000]
+CASES = [
+    "compile_snapshot",
+    "load_snapshot",
+    "create_knowledge_graph",
+    "subgraph_filter",
+    "generate_html",
+    "record_interaction_json",
+    "get_all_interactions",
+    "admin_aggregates",
+    "learning_analytics",
+    "path_query",
+]
+# 每个节点对应的模拟交互记录条数，以及交互记录总数上限
+EVENTS_PER_NODE = 5
+MAX_EVENTS = 500000
+# record_interaction 用例每轮写入的次数
+RECORD_CALLS = 2000
+# path_query 用例每轮查询的随机节点对数
+PATH_QUERIES = 20
+# 子进程输出结果时使用的行前缀
+RESULT_PREFIX = "BENCH_RESULT "
+
+
+# ==================== 子进程：运行单个用例 ====================
+def _load_app(work_dir):
+    """在基准测试环境下导入主程序：不连接Neo4j，交互记录写入临时目录"""
+    os.environ["NEO4J_URI"] = "bolt://127.0.0.1:1"
+    sys.path.insert(0, REPO_DIR)
+    sys.path.insert(0, BENCH_DIR)
+    import gjf_graph_main as app
+    app.INTERACTIONS_FILE = os.path.join(work_dir, "interactions_log.jsonl")
+    app.LEGACY_INTERACTIONS_FILE = os.path.join(work_dir, "interactions_log.json")
+    # 只托管配置区的默认课程（忽略部署目录中的课程列表文件）
+    app.COURSES_FILE = os.path.join(work_dir, "courses.json")
+    return app
+
+
+def _measure(func, repeat):
+    """运行 repeat 次，返回每次耗时（秒）和最后一次的返回值"""
+    timings = []
+    result = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func()
+        timings.append(time.perf_counter() - start)
+    return timings, result
+
+
+def _peak_memory(func):
+    """运行一次，返回运行期间新分配内存的峰值和结束时仍保留的内存（字节）"""
+    tracemalloc.start()
+    try:
+        # 测量时仍持有返回值，current 即为结果常驻的内存
+        result = func()
+        current, peak = tracemalloc.get_traced_memory()
+        del result
+    finally:
+        tracemalloc.stop()
+    return peak, current
+
+
+def run_case(case, n_nodes, repeat):
+    """在临时目录中运行单个用例，结束后删除临时目录"""
+    with tempfile.TemporaryDirectory(prefix="gjf_bench_", ignore_cleanup_errors=True) as work_dir:
+        return _run_case(case, n_nodes, repeat, work_dir)
+
+
+def _run_case(case, n_nodes, repeat, work_dir):
+    from synthetic_graph import generate_graph, generate_interactions
+
+    app = _load_app(work_dir)
+    import perf_metrics
+    import graph_snapshot
+
+    raw_graph = generate_graph(n_nodes)
+    # 与主程序一致：使用只读的共享快照
+    graph = graph_snapshot.freeze(graph_snapshot.compile_graph(raw_graph, app.node_style, style_hash=app.STYLE_HASH))
+    n_events = min(n_nodes * EVENTS_PER_NODE, MAX_EVENTS)
+    extra = {"nodes": len(graph["nodes"]), "relationships": len(graph["relationships"])}
+    conn = app.Neo4jConnection(app.NEO4J_URI, app.NEO4J_USER, app.NEO4J_PASSWORD)
+    core_question = next(node for node in graph["nodes"] if node.get("level") == 1)
+
+    if case == "compile_snapshot":
+        json_path = os.path.join(work_dir, "graph.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(raw_graph, f, ensure_ascii=False, indent=2)
+        timings, _ = _measure(lambda: graph_snapshot.build_snapshot(json_path, app.node_style, app.STYLE_HASH), repeat)
+        extra["json_bytes"] = os.path.getsize(json_path)
+        extra["snapshot_bytes"] = os.path.getsize(graph_snapshot.snapshot_path_for(json_path))
+        extra["peak_bytes"], extra["resident_bytes"] = _peak_memory(
+            lambda: graph_snapshot.build_snapshot(json_path, app.node_style, app.STYLE_HASH))
+
+    elif case == "load_snapshot":
+        json_path = os.path.join(work_dir, "graph.json")
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(raw_graph, f, ensure_ascii=False, indent=2)
+        graph_snapshot.build_snapshot(json_path, app.node_style, app.STYLE_HASH)
+        timings, _ = _measure(lambda: graph_snapshot.load_snapshot(json_path, app.node_style, app.STYLE_HASH), repeat)
+        extra["peak_bytes"], extra["resident_bytes"] = _peak_memory(
+            lambda: graph_snapshot.freeze(graph_snapshot.load_snapshot(json_path, app.node_style, app.STYLE_HASH)))
+
+    elif case == "create_knowledge_graph":
+        timings, _ = _measure(lambda: app.create_knowledge_graph(graph), repeat)
+
+    elif case == "subgraph_filter":
+        perf_metrics.reset()
+        timings, (net, _) = _measure(lambda: app.create_knowledge_graph(graph, core_question), repeat)
+        histogram = perf_metrics.get_histogram("create_knowledge_graph.filter")
+        extra["filter_mean_ms"] = round(histogram.total / max(histogram.count, 1) * 1000, 3)
+        extra["subgraph_nodes"] = len(net.nodes)
+
+    elif case == "generate_html":
+        net, drag_script = app.create_knowledge_graph(graph)
+
+        def generate():
+            return net.generate_html().replace("</body>", drag_script + "</body>")
+
+        timings, html = _measure(generate, repeat)
+        extra["html_bytes"] = len(html.encode("utf-8"))
+
+    elif case == "record_interaction_json":
+        node_ids = [(node["id"], node["label"]) for node in graph["nodes"]]
+
+        def record():
+            for index in range(RECORD_CALLS):
+                node_id, label = node_ids[index % len(node_ids)]
+                app.record_interaction(conn, f"student{index % 50}", node_id, label, "view", 12.5)
+
+        timings, _ = _measure(record, repeat)
+        timings = [elapsed / RECORD_CALLS for elapsed in timings]
+        extra["calls_per_round"] = RECORD_CALLS
+        extra["unit"] = "per call"
+
+    elif case == "get_all_interactions":
+        _write_spool(app.INTERACTIONS_FILE, generate_interactions(graph, n_events))
+        timings, records = _measure(lambda: app.get_all_interactions(conn), repeat)
+        extra["events"] = len(records)
+        extra["spool_bytes"] = os.path.getsize(app.INTERACTIONS_FILE)
+
+    elif case in ("admin_aggregates", "learning_analytics"):
+        from dashboard_cache import DashboardCache
+        df = DashboardCache._to_frame(generate_interactions(graph, n_events))
+        extra["events"] = len(df)
+        versions = iter(range(repeat))
+        # 每轮使用新的数据版本，绕过 st.cache_resource，测量实际计算耗时
+        if case == "admin_aggregates":
+            timings, _ = _measure(lambda: app.get_dashboard_aggregates(next(versions), "", df, graph), repeat)
+        else:
+            timings, _ = _measure(lambda: app.get_learning_analytics(next(versions), "", df, graph), repeat)
+
+    elif case == "path_query":
+        import random
+        from graph_paths import PathIndex
+        build_start = time.perf_counter()
+        index = PathIndex(graph)
+        extra["build_ms"] = round((time.perf_counter() - build_start) * 1000, 3)
+        rng = random.Random(0)
+        node_ids = [node["id"] for node in graph["nodes"]]
+        pairs = [(rng.choice(node_ids), rng.choice(node_ids)) for _ in range(PATH_QUERIES)]
+
+        def query():
+            for source, target in pairs:
+                index.k_shortest_paths(source, target, app.PATH_RESULT_LIMIT)
+
+        timings, _ = _measure(query, repeat)
+        timings = [elapsed / PATH_QUERIES for elapsed in timings]
+        extra["queries_per_round"] = PATH_QUERIES
+        extra["k"] = app.PATH_RESULT_LIMIT
+        extra["unit"] = "per query"
+
+    else:
+        raise ValueError(f"未知用例: {case}")
+
+    conn.close()
+    return {"timings": timings, "extra": extra}
+
+
+def _write_spool(path, events):
+    with open(path, "w", encoding="utf-8") as f:
+        for event in events:
+            f.write(json.dumps(event, ensure_ascii=False) + "\n")
+
+
+# ==================== 主进程：调度与汇总 ====================
+def _summarize(case, n_nodes, timings, extra):
+    ms = sorted(t * 1000 for t in timings)
+    return {
+        "case": case,
+        "size": n_nodes,
+        "status": "ok",
+        "repeat": len(ms),
+        "min_ms": round(ms[0], 4),
+        "median_ms": round(statistics.median(ms), 4),
+        "max_ms": round(ms[-1], 4),
+        **extra,
+    }
+
+
+def run_in_subprocess(case, n_nodes, repeat, timeout):
+    command = [sys.executable, os.path.abspath(__file__), "--worker", case, str(n_nodes), "--repeat", str(repeat)]
+    try:
+        completed = subprocess.run(command, capture_output=True, text=True, encoding="utf-8", timeout=timeout)
+    except subprocess.TimeoutExpired:
+        return {"case": case, "size": n_nodes, "status": "timeout", "timeout_s": timeout}
+
+    for line in completed.stdout.splitlines():
+        if line.startswith(RESULT_PREFIX):
+            payload = json.loads(line[len(RESULT_PREFIX):])
+            return _summarize(case, n_nodes, payload["timings"], payload["extra"])
+    error_lines = (completed.stderr or "").strip().splitlines()
+    return {"case": case, "size": n_nodes, "status": "error", "error": error_lines[-1] if error_lines else "无输出"}
+
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=REPO_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def compare(results, baseline_path):
+    """与基线结果对比，打印中位数耗时的变化"""
+    with open(baseline_path, "r", encoding="utf-8") as f:
+        baseline = {(r["case"], r["size"]): r for r in json.load(f)["results"]}
+    print(f"\n=== 与基线对比（{baseline_path}）===")
+    compared = 0
+    for result in results:
+        old = baseline.get((result["case"], result["size"]))
+        if not old or old.get("status") != "ok" or result["status"] != "ok":
+            continue
+        compared += 1
+        ratio = result["median_ms"] / old["median_ms"] if old["median_ms"] else float("inf")
+        print(f"{result['case']:<26}{result['size']:>8}  {old['median_ms']:>12.3f} -> {result['median_ms']:>12.3f} ms  ({ratio:.2f}x)")
+    if not compared:
+        print("基线中没有相同用例和规模的成功结果")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识图谱性能基准测试")
+    parser.add_argument("--sizes", type=int, nargs="+", default=DEFAULT_SIZES, help="图谱节点数")
+    parser.add_argument("--cases", nargs="+", default=CASES, choices=CASES, help="要运行的用例")
+    parser.add_argument("--repeat", type=int, default=3, help="每个用例的重复次数")
+    parser.add_argument("--timeout", type=int, default=300, help="单个用例的超时时间（秒）")
+    parser.add_argument("--output", help="结果文件路径（默认 benchmarks/results/<提交>_<时间>.json）")
+    parser.add_argument("--compare", help="与之对比的基线结果文件")
+    parser.add_argument("--worker", nargs=2, metavar=("CASE", "SIZE"), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        case, n_nodes = args.worker[0], int(args.worker[1])
+        payload = run_case(case, n_nodes, args.repeat)
+        print(RESULT_PREFIX + json.dumps(payload, ensure_ascii=False))
+        return
+
+    commit = _git_commit()
+    results = []
+    for n_nodes in args.sizes:
+        for case in args.cases:
+            result = run_in_subprocess(case, n_nodes, args.repeat, args.timeout)
+            results.append(result)
+            if result["status"] == "ok":
+                print(f"{case:<26}{n_nodes:>8}  median {result['median_ms']:>12.3f} ms")
+            else:
+                print(f"{case:<26}{n_nodes:>8}  {result['status']}: {result.get('error', '')}")
+
+    output = args.output or os.path.join(RESULTS_DIR, f"{commit}_{time.strftime('%Y%m%d_%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump({
+            "commit": commit,
+            "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "repeat": args.repeat,
+            "results": results,
+        }, f, ensure_ascii=False, indent=2)
+    print(f"\n✅ 结果已写入 {output}")
+
+    if args.compare:
+        compare(results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
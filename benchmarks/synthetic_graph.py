@@ -0,0 +1,179 @@
+"""
+合成知识图谱生成器
+生成与 国际法知识图谱.json 结构一致的图谱：1个根节点（level=0）、8个核心问题（level=1）、
+各问题下的知识点（level=2/3，type 取自 TYPE_TO_CATEGORY），包含关系构成树，另加少量跨问题关联；
+以及对应的模拟交互记录（与 interactions_log.jsonl 中的记录格式一致）
+
+用法：python benchmarks/synthetic_graph.py --nodes 10000 --out graph_10k.json [--interactions 50000 --interactions-out log.jsonl]
+"""
+import argparse
+import json
+import random
+from datetime import datetime, timedelta
+
+# 与主程序 TYPE_TO_CATEGORY 的键保持一致（此处不导入主程序，生成器可独立运行）
+NODE_TYPES = [
+    "问题导向", "理论基础", "基本规则", "最高规范", "主体资格", "国家要素", "国家关系", "法律形式",
+    "条约基础", "条约程序", "缔约技巧", "条约消灭", "国际标准", "人权保护", "个人身份", "刑事合作",
+    "外交组织", "外交核心", "领事制度", "强行法规则", "合法武力", "解决方法", "海洋法", "海洋法核心",
+    "海洋制度", "适用规则", "中国贡献", "中国实践", "中国智慧", "理论创新",
+    "典型案例", "经典判例", "历史人物", "现实问题", "法律争议",
+]
+# 第3级节点及跨问题关联常用的关系类型
+DETAIL_RELATION_TYPES = ["案例", "中国实践", "体现", "延伸", "应用", "经典判例", "构成要素"]
+CROSS_RELATION_TYPES = ["中国实践", "核心贡献", "案例说明", "渊源之一", "前提条件", "保护方式"]
+
+CORE_QUESTION_COUNT = 8
+# 第2级节点占知识点的比例（与现有数据相近），其余为第3级
+LEVEL2_RATIO = 0.75
+# 跨问题关联边数量占节点数的比例（现有数据约 1.2 条边/节点）
+CROSS_EDGE_RATIO = 0.25
+
+
+def _node(node_id, label, node_type, level, rng):
+    return {
+        "id": node_id,
+        "label": label,
+        "category": "核心问题",
+        "type": node_type,
+        "level": level,
+        "description": f"{label}的定义、适用范围与相关争议",
+        "properties": {
+            "定义": f"{label}是国际法中的重要概念",
+            "课时": f"{rng.randint(1, 4)}学时",
+            "要点": "规则-利益-争议三层结构",
+        },
+    }
+
+
+def generate_graph(n_nodes, seed=0):
+    """生成约 n_nodes 个节点的知识图谱（至少包含根节点和8个核心问题）"""
+    rng = random.Random(seed)
+    nodes = [_node("root", "国际法知识图谱", "知识体系", 0, rng)]
+    relationships = []
+
+    core_ids = []
+    for index in range(1, CORE_QUESTION_COUNT + 1):
+        core_id = f"core_q{index}"
+        core_ids.append(core_id)
+        nodes.append(_node(core_id, f"{'①②③④⑤⑥⑦⑧'[index - 1]} 核心问题{index}", "问题导向", 1, rng))
+        relationships.append({"source": "root", "target": core_id, "type": "包含",
+                              "description": "国际法知识体系的组成部分"})
+
+    remaining = max(n_nodes - len(nodes), 0)
+    level2_count = max(int(remaining * LEVEL2_RATIO), min(remaining, CORE_QUESTION_COUNT))
+    level2_ids = []
+    for index in range(level2_count):
+        core_id = core_ids[index % CORE_QUESTION_COUNT]
+        node_id = f"{core_id[5:]}_k{index}"
+        level2_ids.append(node_id)
+        nodes.append(_node(node_id, f"知识点{index}", rng.choice(NODE_TYPES), 2, rng))
+        relationships.append({"source": core_id, "target": node_id, "type": "包含", "description": ""})
+
+    detail_ids = []
+    for index in range(remaining - level2_count):
+        parent_id = rng.choice(level2_ids)
+        node_id = f"{parent_id}_d{index}"
+        detail_ids.append(node_id)
+        nodes.append(_node(node_id, f"案例与实践{index}", rng.choice(NODE_TYPES), 3, rng))
+        relationships.append({"source": parent_id, "target": node_id,
+                              "type": rng.choice(DETAIL_RELATION_TYPES), "description": ""})
+
+    # 跨问题关联（不与已有边重复，不形成自环）
+    knowledge_ids = level2_ids + detail_ids
+    existing = {(rel["source"], rel["target"]) for rel in relationships}
+    for _ in range(int(len(nodes) * CROSS_EDGE_RATIO) if len(knowledge_ids) > 1 else 0):
+        source, target = rng.sample(knowledge_ids, 2)
+        if (source, target) in existing or (target, source) in existing:
+            continue
+        existing.add((source, target))
+        relationships.append({"source": source, "target": target,
+                              "type": rng.choice(CROSS_RELATION_TYPES), "description": ""})
+
+    return {
+        "metadata": {
+            "title": f"合成知识图谱（{len(nodes)}个节点）",
+            "description": "性能测试用合成数据",
+            "created_time": "2026-01-05",
+            "version": "synthetic",
+            "seed": seed,
+        },
+        "nodes": nodes,
+        "relationships": relationships,
+    }
+
+
+def generate_interactions(graph, n_events, n_students=None, seed=0, days=30):
+    """
+    生成模拟交互记录（按时间升序）
+    学生以会话为单位浏览：会话内多数时候沿图谱的边跳转，偶尔随机跳到其他节点
+    """
+    rng = random.Random(seed)
+    nodes = graph["nodes"]
+    labels = {node["id"]: node["label"] for node in nodes}
+    neighbors = {}
+    for rel in graph["relationships"]:
+        neighbors.setdefault(rel["source"], []).append(rel["target"])
+        neighbors.setdefault(rel["target"], []).append(rel["source"])
+    node_ids = [node["id"] for node in nodes]
+
+    n_students = n_students or max(10, n_events // 50)
+    students = [f"2026{index:05d}" for index in range(n_students)]
+    start = datetime(2026, 3, 1, 8, 0, 0)
+
+    sessions = []
+    produced = 0
+    while produced < n_events:
+        length = min(rng.randint(3, 25), n_events - produced)
+        sessions.append((rng.choice(students), start + timedelta(seconds=rng.uniform(0, days * 86400)), length))
+        produced += length
+
+    events = []
+    for student_id, timestamp, length in sessions:
+        node_id = rng.choice(node_ids[:CORE_QUESTION_COUNT + 1]) if rng.random() < 0.5 else rng.choice(node_ids)
+        for _ in range(length):
+            duration = round(rng.expovariate(1 / 40), 1)
+            events.append({
+                "student_id": student_id,
+                "node_id": node_id,
+                "node_label": labels[node_id],
+                "action_type": "view",
+                "count": 1 if rng.random() < 0.9 else rng.randint(2, 4),
+                "duration": min(duration, 600.0),
+                "timestamp": timestamp,
+            })
+            timestamp += timedelta(seconds=duration + rng.uniform(2, 30))
+            next_nodes = neighbors.get(node_id)
+            node_id = rng.choice(next_nodes) if next_nodes and rng.random() < 0.8 else rng.choice(node_ids)
+
+    events.sort(key=lambda event: event["timestamp"])
+    for index, event in enumerate(events):
+        event["id"] = f"{event['student_id']}_{event['node_id']}_{event['timestamp'].strftime('%Y%m%d%H%M%S%f')}_{index}"
+        event["timestamp"] = event["timestamp"].isoformat()
+    return events
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成合成知识图谱和交互记录")
+    parser.add_argument("--nodes", type=int, default=1000, help="节点数")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="synthetic_graph.json", help="图谱输出文件")
+    parser.add_argument("--interactions", type=int, default=0, help="交互记录条数（0 表示不生成）")
+    parser.add_argument("--interactions-out", default="synthetic_interactions.jsonl", help="交互记录输出文件（JSONL）")
+    args = parser.parse_args()
+
+    graph = generate_graph(args.nodes, seed=args.seed)
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(graph, f, ensure_ascii=False, indent=2)
+    print(f"✅ 已生成 {len(graph['nodes'])} 个节点、{len(graph['relationships'])} 条关系 -> {args.out}")
+
+    if args.interactions:
+        events = generate_interactions(graph, args.interactions, seed=args.seed)
+        with open(args.interactions_out, "w", encoding="utf-8") as f:
+            for event in events:
+                f.write(json.dumps(event, ensure_ascii=False) + "\n")
+        print(f"✅ 已生成 {len(events)} 条交互记录 -> {args.interactions_out}")
+
+
+if __name__ == "__main__":
+    main()
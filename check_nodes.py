@@ -1,47 +1,295 @@
+"""
+知识图谱统计与检查
+一次遍历统计所有核心问题的子节点（沿 source -> target 方向可达的节点）数量、层级分布和知识分类分布，
+并检查孤立节点、端点不存在的关系、重复的节点 id、关系中的环，以及不属于任何核心问题的节点。
+总耗时 O(N+E)：邻接表只建一次；各核心问题的可达性用位掩码在同一次按层广度优先搜索中并行传播；
+环用迭代式 Tarjan 强连通分量算法查找（不递归，长链也不会超出递归深度限制）
+
+命令行：
+    python check_nodes.py [JSON文件]            # 文字报告
+    python check_nodes.py --json               # JSON 输出，供 CI 检查
+    python check_nodes.py --strict             # 有环或孤立节点时也返回非零退出码
+有重复 id、缺少 id 的节点或端点不存在的关系时返回非零退出码
+"""
+import argparse
 import json
+import sys
+import time
+
+# 列表类检查结果（孤立节点、环等）最多列出的条数，数量另行统计
+EXAMPLE_LIMIT = 100
+# 文字报告中每个核心问题列出的直接子节点数
+PREVIEW_CHILDREN = 3
+
+
+def _bits(mask):
+    """位掩码中为 1 的位序号"""
+    while mask:
+        low = mask & -mask
+        yield low.bit_length() - 1
+        mask ^= low
+
+
+def find_cycles(children):
+    """有向图中包含环的强连通分量（迭代式 Tarjan），每个分量为按 id 排序的节点列表"""
+    index_of = {}
+    low = {}
+    on_stack = set()
+    stack = []
+    cycles = []
+    counter = 0
+    for root in children:
+        if root in index_of:
+            continue
+        index_of[root] = low[root] = counter
+        counter += 1
+        stack.append(root)
+        on_stack.add(root)
+        work = [(root, iter(children[root]))]
+        while work:
+            node, remaining = work[-1]
+            descended = False
+            for child in remaining:
+                if child not in index_of:
+                    index_of[child] = low[child] = counter
+                    counter += 1
+                    stack.append(child)
+                    on_stack.add(child)
+                    work.append((child, iter(children[child])))
+                    descended = True
+                    break
+                if child in on_stack:
+                    low[node] = min(low[node], index_of[child])
+            if descended:
+                continue
+            work.pop()
+            if work:
+                parent = work[-1][0]
+                low[parent] = min(low[parent], low[node])
+            if low[node] == index_of[node]:
+                component = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component.append(member)
+                    if member == node:
+                        break
+                if len(component) > 1 or node in children[node]:
+                    cycles.append(sorted(component))
+    return cycles
+
+
+def compute_stats(data, categorize=None):
+    """
+    统计图谱，返回可直接序列化为 JSON 的字典
+    categorize(node) -> 知识分类名称，默认使用节点的 category 字段
+    """
+    categorize = categorize or (lambda node: node.get("category", ""))
+
+    # 节点：按 id 建索引，同时发现缺少 id 和重复的节点
+    nodes = {}
+    duplicate_ids = []
+    missing_ids = 0
+    for node in data.get("nodes", []):
+        node_id = node.get("id") if isinstance(node, dict) else None
+        if not node_id:
+            missing_ids += 1
+        elif node_id in nodes:
+            duplicate_ids.append(node_id)
+        else:
+            nodes[node_id] = node
+
+    # 关系：建邻接表，同时发现端点不存在的关系
+    children = {node_id: [] for node_id in nodes}
+    degree = dict.fromkeys(nodes, 0)
+    dangling = []
+    valid_relationships = 0
+    for index, rel in enumerate(data.get("relationships", [])):
+        source, target = rel.get("source"), rel.get("target")
+        if source not in nodes or target not in nodes:
+            dangling.append({"index": index, "source": source, "target": target, "type": rel.get("type", ""),
+                             "missing": [endpoint for endpoint in (source, target) if endpoint not in nodes]})
+            continue
+        children[source].append(target)
+        degree[source] += 1
+        degree[target] += 1
+        valid_relationships += 1
+
+    core_ids = sorted(node_id for node_id, node in nodes.items()
+                      if node.get("level") == 1 and node.get("category") == "核心问题")
+
+    # 各核心问题的可达性：第 i 位表示可由第 i 个核心问题到达；某一位在第 d 层首次到达某节点，即该节点距该问题 d 层
+    reach = {node_id: 1 << position for position, node_id in enumerate(core_ids)}
+    depth_histograms = [{} for _ in core_ids]
+    frontier = dict(reach)
+    depth = 0
+    while frontier:
+        depth += 1
+        next_frontier = {}
+        for node_id, bits in frontier.items():
+            for child in children[node_id]:
+                new_bits = bits & ~reach.get(child, 0)
+                if new_bits:
+                    reach[child] = reach.get(child, 0) | new_bits
+                    next_frontier[child] = next_frontier.get(child, 0) | new_bits
+        for bits in next_frontier.values():
+            for position in _bits(bits):
+                histogram = depth_histograms[position]
+                histogram[depth] = histogram.get(depth, 0) + 1
+        frontier = next_frontier
+
+    # 各核心问题子节点的知识分类分布，以及属于多个核心问题的节点
+    node_categories = {node_id: categorize(node) for node_id, node in nodes.items()}
+    question_categories = [{} for _ in core_ids]
+    shared = 0
+    own_bit = {node_id: 1 << position for position, node_id in enumerate(core_ids)}
+    for node_id, bits in reach.items():
+        bits &= ~own_bit.get(node_id, 0)
+        owners = 0
+        category = node_categories[node_id]
+        for position in _bits(bits):
+            owners += 1
+            counts = question_categories[position]
+            counts[category] = counts.get(category, 0) + 1
+        if owners > 1:
+            shared += 1
+
+    core_questions = []
+    for position, node_id in enumerate(core_ids):
+        histogram = depth_histograms[position]
+        core_questions.append({
+            "id": node_id,
+            "label": nodes[node_id].get("label", node_id),
+            "descendants": sum(histogram.values()),
+            "direct_children": len(children[node_id]),
+            "max_depth": max(histogram, default=0),
+            "depth_histogram": {str(level): histogram[level] for level in sorted(histogram)},
+            "categories": dict(sorted(question_categories[position].items(), key=lambda item: -item[1])),
+            "children_preview": [
+                {"id": child, "label": nodes[child].get("label", child), "type": nodes[child].get("type", "Unknown")}
+                for child in children[node_id][:PREVIEW_CHILDREN]
+            ],
+        })
+
+    categories = {}
+    levels = {}
+    for node_id, node in nodes.items():
+        category = node_categories[node_id]
+        categories[category] = categories.get(category, 0) + 1
+        level = str(node.get("level", ""))
+        levels[level] = levels.get(level, 0) + 1
+
+    orphans = [node_id for node_id, count in degree.items() if count == 0]
+    # 根节点（level=0）和核心问题本身不算在内
+    uncovered = [node_id for node_id, node in nodes.items()
+                 if node_id not in reach and node.get("level") != 0]
+    cycles = find_cycles(children)
+
+    return {
+        "nodes": len(nodes),
+        "relationships": valid_relationships,
+        "levels": dict(sorted(levels.items())),
+        "categories": dict(sorted(categories.items(), key=lambda item: -item[1])),
+        "core_questions": core_questions,
+        "shared_nodes": shared,
+        "uncovered_count": len(uncovered),
+        "uncovered_nodes": uncovered[:EXAMPLE_LIMIT],
+        "orphan_count": len(orphans),
+        "orphans": orphans[:EXAMPLE_LIMIT],
+        "dangling_count": len(dangling),
+        "dangling_relationships": dangling[:EXAMPLE_LIMIT],
+        "duplicate_id_count": len(duplicate_ids),
+        "duplicate_ids": duplicate_ids[:EXAMPLE_LIMIT],
+        "missing_id_count": missing_ids,
+        "cycle_count": len(cycles),
+        "cycles": cycles[:EXAMPLE_LIMIT],
+    }
+
+
+def has_errors(stats, strict=False):
+    """是否存在错误（重复或缺少 id、端点不存在的关系）；strict 时环和孤立节点也算错误"""
+    errors = stats["duplicate_id_count"] or stats["missing_id_count"] or stats["dangling_count"]
+    if strict:
+        errors = errors or stats["cycle_count"] or stats["orphan_count"]
+    return bool(errors)
+
+
+def _examples(items, limit=10):
+    shown = ", ".join(str(item) for item in items[:limit])
+    return shown + (" ..." if len(items) > limit else "")
+
+
+def print_report(stats):
+    print("=== 核心问题与子节点统计 ===\n")
+    for question in stats["core_questions"]:
+        print(question["label"])
+        print(f"  总子节点: {question['descendants']}")
+        print(f"  直接连接: {question['direct_children']}")
+        if question["depth_histogram"]:
+            print("  层级分布: " + " · ".join(f"第{level}层 {count}" for level, count in question["depth_histogram"].items()))
+        if question["categories"]:
+            print("  知识分类: " + " · ".join(f"{name} {count}" for name, count in question["categories"].items()))
+        for child in question["children_preview"]:
+            print(f"    • {child['label']} ({child['type']})")
+        if question["direct_children"] > len(question["children_preview"]):
+            print(f"    ... 还有 {question['direct_children'] - len(question['children_preview'])} 个")
+        print()
+
+    print("=== 全图检查 ===\n")
+    print(f"总知识节点数: {stats['nodes']}")
+    print(f"总关系数: {stats['relationships']}")
+    print("知识分类: " + " · ".join(f"{name} {count}" for name, count in stats["categories"].items()))
+    print(f"属于多个核心问题的节点: {stats['shared_nodes']}")
+    checks = [
+        ("❌", "重复的节点 id", stats["duplicate_id_count"], stats["duplicate_ids"]),
+        ("❌", "缺少 id 的节点", stats["missing_id_count"], []),
+        ("❌", "端点不存在的关系", stats["dangling_count"],
+         [f"{rel['source']} -> {rel['target']}" for rel in stats["dangling_relationships"]]),
+        ("⚠️", "关系中的环", stats["cycle_count"], [" -> ".join(cycle) for cycle in stats["cycles"]]),
+        ("⚠️", "孤立节点（没有任何关系）", stats["orphan_count"], stats["orphans"]),
+        ("⚠️", "不属于任何核心问题的节点", stats["uncovered_count"], stats["uncovered_nodes"]),
+    ]
+    for icon, name, count, examples in checks:
+        if count:
+            print(f"{icon} {name}: {count}" + (f"（{_examples(examples)}）" if examples else ""))
+        else:
+            print(f"✅ {name}: 0")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识图谱统计与检查")
+    parser.add_argument("json_path", nargs="?", help="知识图谱JSON文件（默认使用主程序配置的文件）")
+    parser.add_argument("--json", action="store_true", help="以 JSON 格式输出统计结果")
+    parser.add_argument("--strict", action="store_true", help="有环或孤立节点时也返回非零退出码")
+    args = parser.parse_args()
+
+    # 知识分类与主程序 node_style 的规则一致：根节点、核心问题，其余按 type 映射
+    import gjf_graph_main as app
+
+    def categorize(node):
+        if node.get("level") == 0:
+            return "根节点"
+        if node.get("level") == 1 and node.get("category") == "核心问题":
+            return "核心问题"
+        return app.TYPE_TO_CATEGORY.get(node.get("type", "Unknown"), "理论基础")
+
+    json_path = args.json_path or app.JSON_FILE_PATH
+    start = time.perf_counter()
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    stats = compute_stats(data, categorize)
+    stats["file"] = json_path
+    stats["elapsed_ms"] = round((time.perf_counter() - start) * 1000, 1)
+
+    if args.json:
+        print(json.dumps(stats, ensure_ascii=False, indent=2))
+    else:
+        print_report(stats)
+        print(f"\n统计耗时 {stats['elapsed_ms']} ms")
+
+    if has_errors(stats, args.strict):
+        sys.exit(1)
+
 
-with open('国际法知识图谱.json', 'r', encoding='utf-8') as f:
-    data = json.load(f)
-
-# 获取8个核心问题（level=1的节点）
-core_questions = [n for n in data['nodes'] if n.get('level') == 1 and n.get('category') == '核心问题']
-core_questions = sorted(core_questions, key=lambda x: x['id'])
-
-print('=== 核心问题与子节点统计 ===\n')
-total_nodes = 0
-
-for q in core_questions:
-    q_id = q['id']
-    
-    # 找所有与该问题相关的节点（递归）
-    related_nodes = {q_id}
-    
-    def add_children(node_id):
-        for rel in data['relationships']:
-            if rel['source'] == node_id and rel['target'] not in related_nodes:
-                related_nodes.add(rel['target'])
-                add_children(rel['target'])
-    
-    add_children(q_id)
-    
-    child_count = len(related_nodes) - 1
-    total_nodes += child_count
-    
-    # 获取直接子节点
-    direct_children = [rel['target'] for rel in data['relationships'] if rel['source'] == q_id]
-    
-    print(f"{q['label']}")
-    print(f"  总子节点: {child_count}")
-    print(f"  直接连接: {len(direct_children)}")
-    
-    if direct_children:
-        for child_id in direct_children[:3]:
-            child_node = next((n for n in data['nodes'] if n['id'] == child_id), None)
-            if child_node:
-                print(f"    • {child_node['label']} ({child_node.get('type', 'Unknown')})")
-        if len(direct_children) > 3:
-            print(f"    ... 还有 {len(direct_children)-3} 个")
-    print()
-
-print(f"总知识节点数: {len(data['nodes'])}")
-print(f"总关系数: {len(data['relationships'])}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,120 @@
+"""
+多课程托管：课程注册表
+一个进程同时托管多门课程，每门课程有自己的 Neo4j 标签（知识节点为 标签，交互记录为 Interaction_标签）、
+图谱文件（及快照）、交互记录缓冲文件和全文索引；图谱、索引和渲染缓存按课程分别保存，Neo4j 驱动由所有课程共用
+
+课程列表文件（courses.json）格式：
+    {
+        "courses": [
+            {
+                "key": "international_law",          # 课程标识，用于地址参数 ?course=（小写字母、数字、_ 和 -）
+                "title": "国际法",                    # 课程名称，显示在页面标题和侧边栏
+                "label": "InternationalLaw",         # Neo4j 标签（字母、数字和下划线，不能以数字开头）
+                "graph": "国际法知识图谱.json",        # 图谱文件，相对路径相对于课程列表文件所在目录
+                "interactions": "interactions_log.jsonl",   # 可选，默认 interactions_log_<key>.jsonl
+                "legacy_interactions": "interactions_log.json",  # 可选，旧版交互记录文件，首次启动时导入
+                "subtitle": "基于8大核心问题的国际法知识体系重构",   # 可选，页面副标题
+                "icon": "⚖️"                          # 可选
+            }
+        ]
+    }
+列表中的第一门课程为默认课程（地址中没有 ?course= 时显示）
+"""
+import json
+import os
+import re
+
+import graph_snapshot
+
+COURSE_KEY_PATTERN = re.compile(r"^[a-z0-9_-]+$")
+# 标签直接拼接在 Cypher 语句中，只允许标识符
+LABEL_PATTERN = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+DEFAULT_ICON = "📚"
+
+
+class Course:
+    """一门课程的配置"""
+
+    def __init__(self, key, title, label, json_path, interactions_file, legacy_interactions_file=None,
+                 subtitle="", icon=DEFAULT_ICON):
+        if not isinstance(key, str) or not COURSE_KEY_PATTERN.match(key):
+            raise ValueError(f"课程标识 {key!r} 无效：只能包含小写字母、数字、_ 和 -")
+        if not isinstance(label, str) or not LABEL_PATTERN.match(label):
+            raise ValueError(f"课程 {key} 的 Neo4j 标签 {label!r} 无效：只能包含字母、数字和下划线，且不能以数字开头")
+        if not title:
+            raise ValueError(f"课程 {key} 缺少名称（title）")
+        self.key = key
+        self.title = title
+        self.label = label
+        self.json_path = json_path
+        self.snapshot_path = graph_snapshot.snapshot_path_for(json_path)
+        self.interactions_file = interactions_file
+        self.legacy_interactions_file = legacy_interactions_file
+        self.subtitle = subtitle
+        self.icon = icon or DEFAULT_ICON
+        self.search_index_name = f"{label}_fulltext"
+        # 浏览器 localStorage 中暂存交互记录和当前浏览节点的键，不同课程互不混淆
+        self.pending_storage_key = f"pending_interactions_{key}"
+        self.view_storage_key = f"current_view_{key}"
+
+    def __repr__(self):
+        return f"Course({self.key!r}, {self.title!r})"
+
+
+class CourseRegistry:
+    """按课程标识查找课程；课程标识和 Neo4j 标签都不能重复"""
+
+    def __init__(self, courses):
+        if not courses:
+            raise ValueError("课程列表为空")
+        self._courses = {}
+        labels = set()
+        for course in courses:
+            if course.key in self._courses:
+                raise ValueError(f"课程标识重复：{course.key}")
+            if course.label in labels:
+                raise ValueError(f"Neo4j 标签重复：{course.label}（不同课程的数据会混在一起）")
+            labels.add(course.label)
+            self._courses[course.key] = course
+        self.default = courses[0]
+
+    def get(self, key):
+        """课程标识对应的课程，不存在时返回 None"""
+        return self._courses.get(key) if isinstance(key, str) else None
+
+    def __iter__(self):
+        return iter(self._courses.values())
+
+    def __len__(self):
+        return len(self._courses)
+
+
+def load_courses(config_path):
+    """读取课程列表文件，返回 Course 列表；格式错误时抛出 ValueError"""
+    base_dir = os.path.dirname(os.path.abspath(config_path))
+    with open(config_path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    entries = config.get("courses") if isinstance(config, dict) else None
+    if not isinstance(entries, list):
+        raise ValueError(f"{config_path} 中缺少 courses 列表")
+
+    def resolve(path):
+        return path if os.path.isabs(path) else os.path.join(base_dir, path)
+
+    courses = []
+    for position, entry in enumerate(entries, 1):
+        if not isinstance(entry, dict):
+            raise ValueError(f"第 {position} 门课程的配置不是对象")
+        missing = [field for field in ("key", "title", "label", "graph") if not entry.get(field)]
+        if missing:
+            raise ValueError(f"第 {position} 门课程缺少字段：{', '.join(missing)}")
+        key = entry["key"]
+        legacy = entry.get("legacy_interactions")
+        courses.append(Course(
+            key, entry["title"], entry["label"], resolve(entry["graph"]),
+            resolve(entry.get("interactions") or f"interactions_log_{key}.jsonl"),
+            resolve(legacy) if legacy else None,
+            subtitle=entry.get("subtitle", ""),
+            icon=entry.get("icon"),
+        ))
+    return courses
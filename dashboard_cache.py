@@ -0,0 +1,85 @@
+"""
+管理端数据缓存
+有效期（TTL）内直接复用已缓存的交互数据；过期或手动刷新时只拉取上次水位之后新增或更新的记录，
+按记录 id 合并进缓存，避免每次页面重跑都全量查询数据库
+"""
+import threading
+import time
+
+import pandas as pd
+
+import perf_metrics
+
+
+class DashboardCache:
+    """进程内共享的交互数据缓存，version 在数据发生变化时递增，可作为下游聚合结果的缓存键"""
+
+    def __init__(self, ttl_seconds):
+        self.ttl = ttl_seconds
+        self._lock = threading.Lock()
+        self.version = 0
+        self.reset()
+
+    def reset(self):
+        """清空缓存，下次访问时全量加载（version 保持递增，避免命中旧的下游缓存）"""
+        self.df = None
+        self.watermark = None
+        self.refreshed_at = 0.0
+        self.last_new_records = 0
+
+    @property
+    def age(self):
+        """距上次刷新的秒数"""
+        return time.time() - self.refreshed_at if self.df is not None else None
+
+    def get(self, fetch, force=False):
+        """
+        返回缓存的交互数据 DataFrame
+        fetch(watermark) -> (记录列表, 新水位, 是否为增量结果)；watermark 为 None 时需返回全量数据
+        """
+        with self._lock:
+            perf_metrics.increment("cache_requests_total", cache="dashboard")
+            if self.df is not None and not force and self.age < self.ttl:
+                return self.df
+            perf_metrics.increment("cache_misses_total", cache="dashboard")
+
+            records, watermark, incremental = fetch(self.watermark if self.df is not None else None)
+            if self.df is None or not incremental:
+                # 首次加载，或数据来源切换等无法增量的情况，全量替换
+                self.df = self._to_frame(records)
+                self.version += 1
+                self.last_new_records = len(records)
+            else:
+                new = self._changed(self.df, self._to_frame(records))
+                if not new.empty:
+                    self.df = self._merge(self.df, new)
+                    self.version += 1
+                self.last_new_records = len(new)
+            self.watermark = watermark
+            self.refreshed_at = time.time()
+            return self.df
+
+    @staticmethod
+    def _to_frame(records):
+        df = pd.DataFrame(records)
+        if df.empty:
+            return df
+        # 合并后的记录带有访问次数，旧记录按1次计
+        df["count"] = df["count"].fillna(1).astype(int) if "count" in df.columns else 1
+        return df
+
+    @staticmethod
+    def _changed(cached, new):
+        """去掉与缓存中完全相同的记录：水位边界上的记录每次增量拉取都会再次返回"""
+        if new.empty or cached.empty or list(new.columns) != list(cached.columns):
+            return new
+        seen = new.merge(cached.drop_duplicates(), how="left", indicator=True)["_merge"] == "both"
+        return new[~seen.to_numpy()]
+
+    @staticmethod
+    def _merge(cached, new):
+        """新记录按 id 覆盖缓存中的旧版本（合并更新），再按时间倒序排列"""
+        if "id" in cached.columns and "id" in new.columns:
+            cached = cached[~cached["id"].isin(new["id"])]
+        merged = pd.concat([cached, new], ignore_index=True)
+        return merged.sort_values("timestamp", ascending=False, kind="stable", ignore_index=True)
@@ -6,19 +6,40 @@
 """
 import streamlit as st
 import streamlit.components.v1 as components
+from streamlit.runtime.scriptrunner import add_script_run_ctx
 import json
 import os
-import pandas as pd
-from datetime import datetime
-from neo4j import GraphDatabase
-from pyvis.network import Network
+from datetime import datetime, timedelta
+from collections.abc import Mapping
 import hashlib
 import time
-from streamlit_javascript import st_javascript
+import secrets
+import threading
+import functools
+from interaction_spool import InteractionSpool, SpoolReplayer, InteractionCoalescer
+from recommendations import CoVisitIndex
+import interaction_export
+# pandas / neo4j / pyvis / streamlit_javascript 以及依赖 pandas 的 learning_analytics、dashboard_cache
+# 启动时加载耗时较长，改为在用到它们的函数中导入：学生端不加载 pandas，管理端不加载 pyvis
+import perf_metrics
+from query_log import query_log
+import metrics_exporter
+import profile_capture
+import graph_snapshot
+from graph_store import GraphStore
+from graph_search import SearchIndex, Neo4jFullTextSearch
+from graph_paths import PathIndex
+from graph_neo4j import Neo4jGraphSource
+from graph_compact import file_hash
+from render_cache import RenderCache
+from course_registry import Course, CourseRegistry, load_courses
 
 # ==================== 配置区 ====================
 # 1. 专属标签 (通过修改这个后缀，区分不同的课程)
 TARGET_LABEL = "InternationalLaw"
+# 课程标识（地址参数 ?course=）和名称；同时托管多门课程时改用课程列表文件，见第13项
+COURSE_KEY = "international_law"
+COURSE_TITLE = "国际法"
 
 # 2. 管理员密码
 ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin888")
@@ -27,11 +48,73 @@ ADMIN_PASSWORD = os.getenv("ADMIN_PASSWORD", "admin888")
 NEO4J_URI = os.getenv("NEO4J_URI", "bolt://localhost:7687")
 NEO4J_USER = os.getenv("NEO4J_USERNAME", os.getenv("NEO4J_USER", "neo4j"))
 NEO4J_PASSWORD = os.getenv("NEO4J_PASSWORD", "wE7pV36hqNSo43mpbjTlfzE7n99NWcYABDFqUGvgSrk")
+# 所有课程和会话共用一个 Neo4j 驱动（自带连接池）；连接失败时以纯JSON模式运行，每隔这么多秒重新尝试连接
+NEO4J_RETRY_INTERVAL = float(os.getenv("NEO4J_RETRY_INTERVAL", "30"))
 
 # 4. JSON文件路径
 current_dir = os.path.dirname(os.path.abspath(__file__))
 JSON_FILE_PATH = os.path.join(current_dir, "国际法知识图谱.json")
-INTERACTIONS_FILE = os.path.join(current_dir, "interactions_log.json")
+# 编译后的图谱快照与源文件放在同一目录（源文件或样式配置变化时自动重新编译，也可运行 python graph_snapshot.py 手动编译）
+# 交互记录缓冲文件（JSONL，追加写入，后台同步到Neo4j）
+INTERACTIONS_FILE = os.path.join(current_dir, "interactions_log.jsonl")
+# 旧版交互记录文件（JSON数组），首次启动时自动导入缓冲文件
+LEGACY_INTERACTIONS_FILE = os.path.join(current_dir, "interactions_log.json")
+# 导出文件目录（不公开，只能在管理端通过下载按钮获取）
+EXPORT_DIR = os.path.join(current_dir, "exports")
+# 下载按钮需要把整个文件读入内存，超过这么多 MB 的导出文件不提供下载按钮，由管理员直接从导出目录获取
+EXPORT_DOWNLOAD_MAX_MB = int(os.getenv("EXPORT_DOWNLOAD_MAX_MB", "50"))
+
+# 5. 交互记录合并：同一学生在窗口期内重复查看同一节点，浏览器端和服务端都合并为一条记录（0 表示不合并）
+COALESCE_WINDOW_SECONDS = int(os.getenv("COALESCE_WINDOW_SECONDS", "60"))
+# 单次停留时长上限（秒），避免离开页面的空闲时间被计入浏览时长
+MAX_DWELL_SECONDS = int(os.getenv("MAX_DWELL_SECONDS", "600"))
+
+# 6. 管理端数据缓存有效期（秒），过期后只增量拉取新记录
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "60"))
+
+# 7. Prometheus 指标导出：METRICS_PORT 非 0 时在该端口提供 /metrics；
+#    METRICS_FILE 非空时每隔 METRICS_FILE_INTERVAL 秒重写该文件（供 node_exporter textfile collector 读取）
+#    同一台机器运行多个实例时，每个实例需使用不同的端口或文件
+METRICS_PORT = int(os.getenv("METRICS_PORT", "0"))
+METRICS_FILE = os.getenv("METRICS_FILE", "")
+METRICS_FILE_INTERVAL = int(os.getenv("METRICS_FILE_INTERVAL", "15"))
+
+# 8. 性能剖析结果目录（管理员开启后，每次重跑的 cProfile 统计保存在这里）
+PROFILE_DIR = os.path.join(current_dir, "profiles")
+
+# 9. 知识图谱热更新：每隔多少秒检查一次源文件是否被修改（修改后后台重新编译，无需重启）
+GRAPH_RELOAD_INTERVAL = float(os.getenv("GRAPH_RELOAD_INTERVAL", "2"))
+
+# 10. 启动预热：首次运行时在后台线程中预先加载图谱并生成默认视图和各核心问题的图谱HTML（设为 0 关闭）
+GRAPH_WARMUP = os.getenv("GRAPH_WARMUP", "1") == "1"
+
+# 11. 知识点搜索：memory 使用内存倒排索引（默认）；neo4j 使用 Neo4j 全文索引（初始化知识图谱时创建，查询失败时回退到内存索引）
+SEARCH_BACKEND = os.getenv("SEARCH_BACKEND", "memory")
+SEARCH_RESULT_LIMIT = 8
+
+# 12. 知识点路径：最多显示的最短路径条数
+PATH_RESULT_LIMIT = 3
+
+# 13. 多课程托管：COURSES_FILE 存在时托管其中列出的所有课程（格式见 course_registry.py），
+#     地址加 ?course=课程标识 或在侧边栏切换；不存在时只托管第1、4项配置的课程
+COURSES_FILE = os.getenv("COURSES_FILE", os.path.join(current_dir, "courses.json"))
+#     最近使用的几门课程的图谱、索引和推荐数据常驻内存，其余课程的被淘汰，再次访问时从快照文件重新加载
+MAX_ACTIVE_COURSES = max(int(os.getenv("MAX_ACTIVE_COURSES", "3")), 1)
+
+# 14. 图谱数据来源：memory 在进程内加载整张图谱（默认）；neo4j 只从 Neo4j 查询当前视图需要的子图
+#     （根节点和核心问题概览 + 所选核心问题的2级邻域，节点详情点开时再查），进程内存与图谱总规模无关；
+#     需要先在管理端初始化知识图谱到 Neo4j，Neo4j 不可用或尚未导入时回退到 memory
+GRAPH_BACKEND = os.getenv("GRAPH_BACKEND", "memory")
+#     单个视图最多包含的节点数，以及子图查询结果的缓存条数和有效期（秒）
+SUBGRAPH_NODE_LIMIT = int(os.getenv("SUBGRAPH_NODE_LIMIT", "2000"))
+SUBGRAPH_CACHE_SIZE = int(os.getenv("SUBGRAPH_CACHE_SIZE", "64"))
+SUBGRAPH_CACHE_TTL = int(os.getenv("SUBGRAPH_CACHE_TTL", "300"))
+
+# 15. 磁盘渲染缓存：图谱HTML、注入页面的节点数据和静态导出的布局坐标按内容保存在此目录，
+#     同一台机器上的多个 Streamlit 进程（以及 static_export 的进程池）共用，一个进程生成后其余进程直接读取，
+#     新启动的进程不必从头生成；超过容量上限（MB）时删除最久未使用的。设为空字符串时关闭
+RENDER_CACHE_DIR = os.getenv("RENDER_CACHE_DIR", os.path.join(current_dir, "render_cache"))
+RENDER_CACHE_MAX_MB = int(os.getenv("RENDER_CACHE_MAX_MB", "256"))
 
 # ==================== 颜色配置 ====================
 CATEGORY_COLORS = {
@@ -94,46 +177,204 @@ CORE_QUESTION_SIZE = 60
 ROOT_NODE_COLOR = "#9B59B6"      # 紫色 - 最核心的中心点
 ROOT_NODE_SIZE = 80
 
+# 知识点路径的高亮颜色（渲染时使用，不写入快照）
+PATH_COLOR = "#FF6D00"       # 橙色 - 路径上的节点边框和关系
+
+# 样式配置的指纹，写入快照；修改上面的颜色或分类映射后，快照中预先解析的样式自动失效
+STYLE_HASH = hashlib.sha256(json.dumps(
+    [CATEGORY_COLORS, TYPE_TO_CATEGORY, CORE_QUESTION_COLOR, CORE_QUESTION_SIZE, ROOT_NODE_COLOR, ROOT_NODE_SIZE],
+    ensure_ascii=False, sort_keys=True
+).encode("utf-8")).hexdigest()[:16]
+
+# 本文件内容的指纹，写入磁盘渲染缓存的键；部署新版本（渲染代码改变）后，旧版本生成的HTML自然失效
+RENDER_CODE_HASH = file_hash(os.path.abspath(__file__))[:16]
+
+def node_style(node):
+    """节点的颜色和大小 (color, size)"""
+    # 根节点（level=0）使用最特殊的颜色和大小
+    if node.get("level") == 0:
+        return ROOT_NODE_COLOR, ROOT_NODE_SIZE
+    # 核心问题（level=1）使用特殊颜色和大小
+    if node.get("level") == 1 and node.get("category") == "核心问题":
+        return CORE_QUESTION_COLOR, CORE_QUESTION_SIZE
+    # 其他节点根据type字段映射到分类，然后获取颜色
+    node_type = node.get("type", "Unknown")
+    mapped_category = TYPE_TO_CATEGORY.get(node_type, "理论基础")  # 默认映射到理论基础
+    return CATEGORY_COLORS.get(mapped_category, "#888888"), (40 - (node.get("level", 1) - 1) * 5) * 2
+
 # ==================== Neo4j 数据库操作类 ====================
 class Neo4jConnection:
     def __init__(self, uri, user, password):
         self.driver = None
+        self._shared = False
         try:
+            from neo4j import GraphDatabase
             self.driver = GraphDatabase.driver(uri, auth=(user, password))
             self.driver.verify_connectivity()
         except Exception as e:
             # Neo4j连接失败时静默处理，系统将使用纯JSON模式运行
             self.driver = None
     
+    @classmethod
+    def shared(cls, driver):
+        """使用进程内共享的驱动（见 Neo4jDriverPool），close 时不关闭驱动；driver 为 None 时为纯JSON模式"""
+        conn = cls.__new__(cls)
+        conn.driver = driver
+        conn._shared = True
+        return conn
+    
     def close(self):
-        if self.driver:
+        if self.driver and not self._shared:
             self.driver.close()
     
+    def _observe(self, kind, query, parameters, start, rows, summary, error):
+        """记录耗时直方图和查询日志（耗时、行数、服务器计数器、慢查询）"""
+        elapsed = time.perf_counter() - start
+        perf_metrics.observe(f"neo4j.{kind}", elapsed)
+        query_log.record(kind, query, parameters, elapsed, rows, summary, error)
+    
     def execute_query(self, query, parameters=None):
         if not self.driver:
             return []
-        with self.driver.session() as session:
-            result = session.run(query, parameters or {})
-            return [record.data() for record in result]
+        start = time.perf_counter()
+        records, summary, error = [], None, None
+        try:
+            with self.driver.session() as session:
+                result = session.run(query, parameters or {})
+                records = [record.data() for record in result]
+                summary = result.consume()
+                return records
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._observe("execute_query", query, parameters, start, len(records), summary, error)
+    
+    def iter_query(self, query, parameters=None, fetch_size=1000):
+        """逐条产出查询结果，按 fetch_size 分批从服务器拉取，不在内存中保存全部结果"""
+        if not self.driver:
+            return
+        start = time.perf_counter()
+        rows, summary, error = 0, None, None
+        try:
+            with self.driver.session(fetch_size=fetch_size) as session:
+                result = session.run(query, parameters or {})
+                for record in result:
+                    rows += 1
+                    yield record.data()
+                summary = result.consume()
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._observe("iter_query", query, parameters, start, rows, summary, error)
     
     def execute_write(self, query, parameters=None):
+        if not self.driver:
+            return None
+        start = time.perf_counter()
+        summary, error = None, None
+        try:
+            with self.driver.session() as session:
+                result = session.run(query, parameters or {})
+                summary = result.consume()
+                return summary
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            self._observe("execute_write", query, parameters, start, 0, summary, error)
+    
+    def fetch_plan(self, query, parameters=None, profile=False):
+        """用 EXPLAIN（不执行）或 PROFILE（执行并统计）获取执行计划"""
         if not self.driver:
             return None
         with self.driver.session() as session:
-            result = session.run(query, parameters or {})
-            return result.consume()
+            result = session.run(("PROFILE " if profile else "EXPLAIN ") + query, parameters or {})
+            summary = result.consume()
+            return summary.profile if profile else summary.plan
+
+class Neo4jDriverPool:
+    """
+    进程内唯一的 Neo4j 驱动，所有课程、会话和后台同步线程共用（驱动自带连接池，不再每次重跑新建驱动并验证连接）；
+    连接失败时不会每次重跑都重试，而是每隔 retry_interval 秒重试一次，其余时间直接以纯JSON模式运行
+    """
+
+    def __init__(self, uri, user, password, retry_interval=NEO4J_RETRY_INTERVAL):
+        self.uri = uri
+        self.user = user
+        self.password = password
+        self.retry_interval = retry_interval
+        self._driver = None
+        self._last_attempt = None
+        self._lock = threading.Lock()
+
+    def get_driver(self):
+        if self._driver is None:
+            now = time.monotonic()
+            with self._lock:
+                if self._driver is None and (self._last_attempt is None
+                                             or now - self._last_attempt >= self.retry_interval):
+                    self._last_attempt = now
+                    self._driver = Neo4jConnection(self.uri, self.user, self.password).driver
+        return self._driver
+
+    def connection(self):
+        return Neo4jConnection.shared(self.get_driver())
+
+@st.cache_resource
+def get_neo4j_pool():
+    """进程内共享的 Neo4j 驱动"""
+    return Neo4jDriverPool(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+
+# ==================== 多课程 ====================
+# 切换课程时清除的会话状态（节点 id 只在各自的课程中有意义）
+COURSE_SESSION_KEYS = ("selected_question", "selected_node", "question_choice", "search_focus", "search_query",
+                       "path_overlay", "path_source", "path_target", "path_types", "path_directed", "last_export")
+
+@st.cache_resource
+def get_course_registry():
+    """进程内共享的课程注册表：COURSES_FILE 存在时从中读取，否则只有配置区的一门课程"""
+    if os.path.exists(COURSES_FILE):
+        return CourseRegistry(load_courses(COURSES_FILE))
+    return CourseRegistry([Course(
+        COURSE_KEY, COURSE_TITLE, TARGET_LABEL, JSON_FILE_PATH, INTERACTIONS_FILE, LEGACY_INTERACTIONS_FILE,
+        subtitle="基于8大核心问题的国际法知识体系重构", icon="⚖️",
+    )])
+
+def current_course():
+    """当前会话的课程（由 select_course 选定）；没有会话时（命令行、基准测试）为默认课程"""
+    registry = get_course_registry()
+    return registry.get(st.session_state.get("course_key")) or registry.default
+
+def select_course():
+    """按地址参数 ?course= 选定本次会话的课程；切换课程时清除上一门课程的页面状态"""
+    registry = get_course_registry()
+    course = registry.get(st.query_params.get("course")) or current_course()
+    previous = st.session_state.get("course_key")
+    if previous != course.key:
+        if previous is not None:
+            for key in COURSE_SESSION_KEYS:
+                st.session_state.pop(key, None)
+        st.session_state.course_key = course.key
+    return course
+
+def switch_course():
+    """侧边栏切换课程：写入地址参数，刷新或分享链接时仍是这门课程"""
+    st.query_params["course"] = st.session_state.course_choice
 
 # ==================== 数据初始化 ====================
 def clear_all_data(conn):
-    """清除所有图形和数据（包括知识图谱和交互记录）"""
+    """清除当前课程的所有图形和数据（包括知识图谱和交互记录）"""
     if not conn.driver:
         return False
     
+    label = current_course().label
     try:
         # 清除知识图谱节点
-        conn.execute_write(f"MATCH (n:{TARGET_LABEL}) DETACH DELETE n")
+        conn.execute_write(f"MATCH (n:{label}) DETACH DELETE n")
         # 清除交互记录
-        conn.execute_write(f"MATCH (i:Interaction_{TARGET_LABEL}) DELETE i")
+        conn.execute_write(f"MATCH (i:Interaction_{label}) DELETE i")
         st.success("✅ 数据库清除成功")
         return True
     except Exception as e:
@@ -141,10 +382,9 @@ def clear_all_data(conn):
         return False
 
 def clear_local_files():
-    """清除本地文件"""
+    """清除当前课程的本地交互记录"""
     try:
-        if os.path.exists(INTERACTIONS_FILE):
-            os.remove(INTERACTIONS_FILE)
+        if get_interaction_spool(current_course().key).clear():
             st.success("✅ 本地交互记录清除成功")
         else:
             st.info("ℹ️ 本地文件不存在，无需清除")
@@ -154,215 +394,371 @@ def clear_local_files():
         return False
 
 def init_neo4j_data(conn, json_data):
-    """将JSON数据导入Neo4j"""
+    """
+    将当前课程的知识图谱导入Neo4j（UNWIND 分批写入，每批一个事务）
+    子图模式（GRAPH_BACKEND=neo4j）下内存中只有当前视图，直接从图谱文件流式导入整张图谱
+    """
     if not conn.driver:
         return False
     
-    # 清除旧数据
-    conn.execute_write(f"MATCH (n:{TARGET_LABEL}) DETACH DELETE n")
+    course = current_course()
+    source = Neo4jGraphSource(conn, course.label)
+    # 清除旧数据后导入节点和关系
+    if GRAPH_BACKEND == "neo4j":
+        source.import_file(course.json_path)
+    else:
+        source.import_graph(json_data.get("nodes", []), json_data.get("relationships", []))
+    # 之前查询的子图已过期
+    clear_subgraph_caches()
     
-    # 创建节点
-    for node in json_data.get("nodes", []):
-        properties_json = json.dumps(node.get("properties", {}), ensure_ascii=False)
-        query = f"""
-        CREATE (n:{TARGET_LABEL} {{
-            id: $id,
-            label: $label,
-            category: $category,
-            type: $type,
-            level: $level,
-            description: $description,
-            properties: $properties
-        }})
-        """
-        conn.execute_write(query, {
-            "id": node["id"],
-            "label": node["label"],
-            "category": node.get("category", ""),
-            "type": node.get("type", ""),
-            "level": node.get("level", 1),
-            "description": node.get("description", ""),
-            "properties": properties_json
-        })
-    
-    # 创建关系
-    for rel in json_data.get("relationships", []):
-        query = f"""
-        MATCH (a:{TARGET_LABEL} {{id: $source}})
-        MATCH (b:{TARGET_LABEL} {{id: $target}})
-        CREATE (a)-[r:RELATES {{type: $type, description: $description}}]->(b)
-        """
-        conn.execute_write(query, {
-            "source": rel["source"],
-            "target": rel["target"],
-            "type": rel.get("type", "关联"),
-            "description": rel.get("description", "")
-        })
+    # 知识点搜索使用的全文索引
+    try:
+        Neo4jFullTextSearch(conn, course.label, course.search_index_name).ensure_index()
+    except Exception:
+        # 不支持全文索引时搜索继续使用内存索引
+        pass
     
     return True
 
-def init_interaction_table(conn):
-    """初始化交互记录表（在Neo4j中创建约束）"""
+def init_interaction_table(conn, course):
+    """初始化课程的交互记录表（在Neo4j中创建约束）"""
     if not conn.driver:
         return
+    label = f"Interaction_{course.label}"
     try:
         # 创建唯一性约束
-        conn.execute_write(f"CREATE CONSTRAINT IF NOT EXISTS FOR (i:Interaction_{TARGET_LABEL}) REQUIRE i.id IS UNIQUE")
-    except:
+        conn.execute_write(f"CREATE CONSTRAINT IF NOT EXISTS FOR (i:{label}) REQUIRE i.id IS UNIQUE")
+        # 同步时间索引，供管理端按水位增量拉取
+        conn.execute_write(f"CREATE INDEX IF NOT EXISTS FOR (i:{label}) ON (i.synced_at)")
+        # 时间索引，供按时间范围导出
+        conn.execute_write(f"CREATE INDEX IF NOT EXISTS FOR (i:{label}) ON (i.timestamp)")
+    except Exception:
+        # 失败原因已记录在查询日志中，可在管理端“慢查询”中查看
         pass
 
-def record_interaction(conn, student_id, node_id, node_label, action_type="view", duration=0):
-    """记录学生交互行为（支持Neo4j和本地文件双模式）"""
+@st.cache_resource
+def get_interaction_spool(course_key):
+    """课程的交互记录缓冲区（进程内共享）"""
+    course = get_course_registry().get(course_key)
+    return InteractionSpool(course.interactions_file, legacy_path=course.legacy_interactions_file)
+
+@st.cache_resource
+def get_spool_replayer(course_key):
+    """每门课程一个后台同步线程，负责把缓冲区中的记录补写到Neo4j（使用共享驱动）"""
+    course = get_course_registry().get(course_key)
+    replayer = SpoolReplayer(
+        get_interaction_spool(course_key),
+        get_neo4j_pool().connection,
+        course.label,
+        on_connect=lambda conn: init_interaction_table(conn, course)
+    )
+    return replayer.start()
+
+@st.cache_resource
+def get_interaction_coalescer(course_key):
+    """课程的交互记录合并器（进程内共享）"""
+    return InteractionCoalescer(COALESCE_WINDOW_SECONDS, retain_seconds=COALESCE_WINDOW_SECONDS + MAX_DWELL_SECONDS)
+
+@st.cache_resource(max_entries=MAX_ACTIVE_COURSES)
+def get_covisit_index(course_key):
+    """
+    课程的"同学们还浏览了"推荐索引，首次使用时用本地缓冲区中的记录初始化；
+    不活跃的课程被淘汰后，再次使用时重新从缓冲区初始化
+    """
+    return CoVisitIndex().bootstrap(get_interaction_spool(course_key).read_all())
+
+def record_interaction(conn, student_id, node_id, node_label, action_type="view", duration=0, count=1):
+    """记录学生交互行为：合并重复查看后写入本地缓冲区，再由后台线程异步同步到Neo4j"""
+    course_key = current_course().key
     timestamp = datetime.now()
+    interaction_id = f"{student_id}_{node_id}_{timestamp.strftime('%Y%m%d%H%M%S%f')}"
+    event = {
+        "id": interaction_id,
+        "student_id": student_id,
+        "node_id": node_id,
+        "node_label": node_label,
+        "action_type": action_type,
+        "count": count,
+        "duration": round(min(max(duration, 0), MAX_DWELL_SECONDS * max(count, 1)), 1),
+        "timestamp": timestamp.isoformat()
+    }
     
-    # 尝试记录到Neo4j
-    if conn.driver:
-        try:
-            query = f"""
-            CREATE (i:Interaction_{TARGET_LABEL} {{
-                id: $id,
-                student_id: $student_id,
-                node_id: $node_id,
-                node_label: $node_label,
-                action_type: $action_type,
-                duration: $duration,
-                timestamp: datetime($timestamp)
-            }})
-            """
-            interaction_id = f"{student_id}_{node_id}_{timestamp.strftime('%Y%m%d%H%M%S%f')}"
-            conn.execute_write(query, {
-                "id": interaction_id,
-                "student_id": student_id,
-                "node_id": node_id,
-                "node_label": node_label,
-                "action_type": action_type,
-                "duration": duration,
-                "timestamp": timestamp.isoformat()
-            })
-        except Exception as e:
-            st.warning(f"Neo4j记录失败: {e}")
-    
-    # 同时记录到本地文件（作为备份或在无Neo4j时使用）
     try:
-        interactions = []
-        if os.path.exists(INTERACTIONS_FILE):
-            with open(INTERACTIONS_FILE, "r", encoding="utf-8") as f:
-                interactions = json.load(f)
-        
-        interactions.append({
-            "student_id": student_id,
-            "node_id": node_id,
-            "node_label": node_label,
-            "action_type": action_type,
-            "duration": duration,
-            "timestamp": timestamp.strftime("%Y-%m-%d %H:%M:%S")
-        })
-        
-        with open(INTERACTIONS_FILE, "w", encoding="utf-8") as f:
-            json.dump(interactions, f, ensure_ascii=False, indent=2)
+        stored = get_interaction_coalescer(course_key).merge(event)
+        get_interaction_spool(course_key).append(stored)
+        perf_metrics.increment("interactions_recorded_total", backend="local")
+        # 只有新的访问才计入跳转，合并更新（同 id）不重复计数
+        if stored["id"] == interaction_id and count > 0:
+            get_covisit_index(course_key).observe(student_id, node_id, timestamp.timestamp())
     except Exception as e:
-        st.warning(f"本地文件记录失败: {e}")
+        perf_metrics.increment("interactions_failed_total", backend="local")
+        st.warning(f"本地缓冲区记录失败: {e}")
+        return
+    
+    # 数据库当前可用时立即唤醒同步线程，否则由同步线程按退避间隔重试
+    if conn.driver:
+        get_spool_replayer(course_key).wake()
 
 def get_all_interactions(conn):
-    """获取所有交互记录（优先从Neo4j，否则从本地文件）"""
-    # 尝试从Neo4j获取
+    """获取所有交互记录（优先从Neo4j，否则从本地缓冲区）"""
+    return fetch_interactions(conn)[0]
+
+def fetch_interactions(conn, watermark=None):
+    """
+    按水位拉取交互记录（优先从Neo4j，否则从本地缓冲区）
+    Neo4j 以同步时间（毫秒）为水位，本地缓冲区以文件字节偏移为水位；watermark 为 None 时全量拉取
+    返回 (记录列表, 新水位, 是否为增量结果)
+    """
+    course = current_course()
     if conn.driver:
         try:
+            since = watermark[1] if watermark and watermark[0] == "neo4j" else None
+            # 水位只精确到毫秒：与上次最大同步时间同一毫秒写入的记录也要取回，重复取回的记录按 id 合并
+            where = "WHERE i.synced_at >= datetime({epochMillis: $since})" if since is not None else ""
             query = f"""
-            MATCH (i:Interaction_{TARGET_LABEL})
-            RETURN i.student_id as student_id,
+            MATCH (i:Interaction_{course.label})
+            {where}
+            WITH i, coalesce(i.synced_at, i.timestamp) AS synced
+            RETURN i.id as id,
+                   i.student_id as student_id,
                    i.node_id as node_id,
                    i.node_label as node_label,
                    i.action_type as action_type,
+                   coalesce(i.count, 1) as count,
                    i.duration as duration,
-                   toString(i.timestamp) as timestamp
+                   toString(i.timestamp) as timestamp,
+                   synced.epochMillis as synced_ms
             ORDER BY i.timestamp DESC
             """
-            return conn.execute_query(query)
-        except:
+            records = conn.execute_query(query, {"since": since})
+            new_since = max((r["synced_ms"] for r in records if r["synced_ms"] is not None), default=since or 0)
+            return records, ("neo4j", new_since), since is not None
+        except Exception:
+            # 失败原因已记录在查询日志中，退回本地缓冲区
             pass
     
-    # 从本地文件获取
-    try:
-        if os.path.exists(INTERACTIONS_FILE):
-            with open(INTERACTIONS_FILE, "r", encoding="utf-8") as f:
-                return json.load(f)
-    except:
-        pass
+    # 从本地缓冲区获取
+    spool = get_interaction_spool(course.key)
+    offset = watermark[1] if watermark and watermark[0] == "local" else None
+    if offset is None or offset > spool.size():
+        records, end_offset = spool.read_since(0)
+        return records, ("local", end_offset), False
+    records, end_offset = spool.read_since(offset)
+    return records, ("local", end_offset), True
+
+def iter_interactions_for_export(conn, start=None, end=None, student_ids=None):
+    """按时间范围和学生逐条产出交互记录（Neo4j 游标或本地缓冲文件流式读取）"""
+    course = current_course()
+    if conn.driver:
+        query = f"""
+        MATCH (i:Interaction_{course.label})
+        WHERE ($start IS NULL OR i.timestamp >= datetime($start))
+          AND ($end IS NULL OR i.timestamp < datetime($end))
+          AND ($students IS NULL OR i.student_id IN $students)
+        RETURN i.id as id,
+               i.student_id as student_id,
+               i.node_id as node_id,
+               i.node_label as node_label,
+               i.action_type as action_type,
+               coalesce(i.count, 1) as count,
+               i.duration as duration,
+               toString(i.timestamp) as timestamp
+        ORDER BY i.timestamp
+        """
+        yield from conn.iter_query(query, {"start": start, "end": end, "students": student_ids or None},
+                                   fetch_size=interaction_export.EXPORT_CHUNK_SIZE)
+        return
     
-    return []
+    events = get_interaction_spool(course.key).iter_events(COALESCE_WINDOW_SECONDS + MAX_DWELL_SECONDS)
+    yield from interaction_export.filter_events(events, start, end, student_ids)
+
+@st.cache_resource(max_entries=MAX_ACTIVE_COURSES)
+def get_dashboard_cache(course_key):
+    """课程的管理端数据缓存（进程内共享，不活跃的课程被淘汰后重新全量拉取）"""
+    from dashboard_cache import DashboardCache
+    return DashboardCache(DASHBOARD_CACHE_TTL)
+
+@st.cache_resource
+def get_render_cache():
+    """多进程共享的磁盘渲染缓存（第15项配置），未配置目录或目录不可写时返回 None"""
+    if not RENDER_CACHE_DIR:
+        return None
+    try:
+        return RenderCache(RENDER_CACHE_DIR, RENDER_CACHE_MAX_MB * 1024 * 1024)
+    except OSError as e:
+        print(f"磁盘渲染缓存不可用: {e}")
+        return None
+
+def cached_on_disk(name, key_parts, compute):
+    """
+    先查磁盘渲染缓存（其他进程生成的结果也能直接使用），没有时生成并写入；
+    同一个键同时只有一个进程在生成。缓存不可用或读写失败时直接生成
+    """
+    cache = get_render_cache()
+    if cache is None:
+        return compute()
+    perf_metrics.increment("cache_requests_total", cache=name)
+    try:
+        value, hit = cache.get_or_compute(cache.key(name, RENDER_CODE_HASH, STYLE_HASH, *key_parts), compute)
+    except OSError as e:
+        print(f"磁盘渲染缓存读写失败: {e}")
+        return compute()
+    if not hit:
+        perf_metrics.increment("cache_misses_total", cache=name)
+    return value
+
+@st.cache_resource
+def get_metrics_exporter():
+    """按配置启动 Prometheus 指标导出（进程内只启动一次），返回导出方式说明"""
+    spools = [get_interaction_spool(course.key) for course in get_course_registry()]
+    metrics_exporter.register_gauge("spool_pending_bytes",
+                                    lambda: sum(spool.pending_bytes() for spool in spools),
+                                    "本地缓冲区中尚未同步到Neo4j的字节数（所有课程合计）")
+    render_cache = get_render_cache()
+    if render_cache is not None:
+        metrics_exporter.register_gauge("render_cache_bytes", render_cache.size, "磁盘渲染缓存占用的字节数")
+    
+    targets = []
+    if METRICS_PORT:
+        try:
+            metrics_exporter.start_http_server(METRICS_PORT)
+            targets.append(f"http://<本机>:{METRICS_PORT}/metrics")
+        except OSError as e:
+            targets.append(f"端口 {METRICS_PORT} 启动失败: {e}")
+    if METRICS_FILE:
+        metrics_exporter.start_file_writer(METRICS_FILE, METRICS_FILE_INTERVAL)
+        targets.append(f"{METRICS_FILE}（每 {METRICS_FILE_INTERVAL} 秒更新）")
+    return targets
 
 # ==================== 加载JSON数据 ====================
-@st.cache_data
+@st.cache_resource(max_entries=MAX_ACTIVE_COURSES)
+def get_graph_store(course_key):
+    """
+    课程的知识图谱（编译快照，进程内所有会话共享同一个对象，约定只读），源文件修改后由后台线程重新编译并原子替换；
+    只保留最近使用的 MAX_ACTIVE_COURSES 门课程，被淘汰的课程再次访问时从快照文件重新加载
+    """
+    course = get_course_registry().get(course_key)
+    return GraphStore(course.json_path, node_style, STYLE_HASH, course.snapshot_path,
+                      check_interval=GRAPH_RELOAD_INTERVAL, on_reload=warm_up_graph if GRAPH_WARMUP else None,
+                      thread_hook=add_script_run_ctx)
+
 def load_json_data():
-    try:
-        with open(JSON_FILE_PATH, "r", encoding="utf-8") as f:
-            return json.load(f)
-    except Exception as e:
-        st.error(f"❌ 无法加载知识图谱数据: {e}")
-        return {"nodes": [], "relationships": []}
+    """
+    当前课程当前版本的知识图谱快照（包含 nodes / relationships 及预先建好的索引）
+    返回进程内共享的快照，所有会话读取同一份，不再像 st.cache_data 那样每次重跑复制一份；外层字典和列表为
+    MappingProxyType / tuple，但节点对象、序号数组等仍可被修改，修改会影响所有会话，调用方不得修改（需要时用 thaw 复制）；
+    子图模式下返回从 Neo4j 查询的当前视图（结构相同），查询失败或 Neo4j 中尚未导入时回退到内存图谱
+    """
+    course = current_course()
+    if subgraph_mode_enabled():
+        try:
+            view = fetch_graph_view(course.key, st.session_state.get("question_choice"))
+            if view["nodes"]:
+                return view
+        except Exception:
+            pass
+    return get_graph_store(course.key).get()
+
+# ==================== Neo4j 子图模式 ====================
+def subgraph_mode_enabled():
+    """GRAPH_BACKEND=neo4j 且 Neo4j 可用"""
+    return GRAPH_BACKEND == "neo4j" and get_neo4j_pool().get_driver() is not None
+
+def is_graph_view(json_data):
+    """json_data 是否为从 Neo4j 查询的视图（而不是整张图谱）"""
+    return json_data.get("source") == "neo4j"
+
+def get_graph_source(course_key):
+    course = get_course_registry().get(course_key)
+    return Neo4jGraphSource(get_neo4j_pool().connection(), course.label)
+
+@st.cache_resource(max_entries=SUBGRAPH_CACHE_SIZE, ttl=SUBGRAPH_CACHE_TTL, show_spinner=False)
+def fetch_graph_view(course_key, question_id):
+    """概览 + 核心问题 question_id 的2级邻域（为 None 时只有概览），按（课程, 核心问题）缓存，所有会话共享"""
+    with perf_metrics.timed("neo4j.graph_view"):
+        return get_graph_source(course_key).view(node_style, STYLE_HASH, question_id, SUBGRAPH_NODE_LIMIT)
+
+@st.cache_resource(max_entries=SUBGRAPH_CACHE_SIZE, ttl=SUBGRAPH_CACHE_TTL, show_spinner=False)
+def fetch_node_detail(course_key, node_id):
+    """节点及其全部关系（不限于当前视图），点开时才查询"""
+    with perf_metrics.timed("neo4j.node_detail"):
+        return get_graph_source(course_key).node_detail(node_id)
+
+@st.cache_resource(max_entries=SUBGRAPH_CACHE_SIZE, ttl=SUBGRAPH_CACHE_TTL, show_spinner=False)
+def fetch_home_question(course_key, node_id):
+    """包含该节点的核心问题（搜索结果不在当前视图中时切换过去）"""
+    return get_graph_source(course_key).home_question(node_id)
+
+def clear_subgraph_caches():
+    fetch_graph_view.clear()
+    fetch_node_detail.clear()
+    fetch_home_question.clear()
+
+def lookup_node(json_data, node_id):
+    """节点 id 对应的节点：先在当前图谱中查找，子图模式下不在当前视图中的节点从 Neo4j 查询；不存在时返回 None"""
+    index = json_data["node_index"].get(node_id)
+    if index is not None:
+        return json_data["nodes"][index]
+    if is_graph_view(json_data):
+        detail = fetch_node_detail(current_course().key, node_id)
+        return detail["node"] if detail else None
+    return None
 
 # ==================== 创建知识图谱可视化 ====================
-def create_knowledge_graph(json_data, selected_question=None, selected_node=None):
-    """创建交互式知识图谱，支持按问题筛选"""
+def view_node_ids(json_data, question_id=None, paths=()):
+    """视图中显示的节点 id（核心问题的子图加上路径上的节点）；全图时直接返回节点索引（字典，可按 id 判断）"""
+    subgraph = json_data["question_subgraphs"].get(question_id) if question_id else None
+    if not subgraph:
+        return json_data["node_index"]
+    node_ids = {json_data["nodes"][index]["id"] for index in subgraph["nodes"]}
+    for path_node_ids, _ in paths:
+        node_ids.update(path_node_ids)
+    return node_ids
+
+def create_knowledge_graph(json_data, selected_question=None, selected_node=None, paths=()):
+    """创建交互式知识图谱，支持按问题筛选；paths 为知识点路径（graph_paths 的路径元组），在图谱上高亮显示"""
+    from pyvis.network import Network
     net = Network(height="1350px", width="100%", bgcolor="#ffffff", font_color="#333333")
     net.barnes_hut(gravity=-2500, central_gravity=0.2, spring_length=250)
     
-    # 如果选定了问题，只显示该问题及其2级子节点
-    if selected_question:
-        question_id = selected_question["id"]
-        # 找出所有与该问题相关的节点（最多2级深度）
-        filtered_nodes = {question_id}  # 先加入问题本身
-        visited = set()  # 记录已访问的节点，避免重复遍历
-        
-        # 递归找出2级子节点（双向遍历）
-        def add_children_limited(node_id, relationships, depth=1, max_depth=2):
-            if depth > max_depth or node_id in visited:
-                return
-            visited.add(node_id)
-            
-            for rel in relationships:
-                other_node_id = None
-                # 双向处理：既看source->target，也看target->source
-                if rel["source"] == node_id:
-                    other_node_id = rel["target"]
-                elif rel["target"] == node_id:
-                    other_node_id = rel["source"]
-                
-                if other_node_id and other_node_id not in filtered_nodes:
-                    filtered_nodes.add(other_node_id)
-                    add_children_limited(other_node_id, relationships, depth + 1, max_depth)
-        
-        add_children_limited(question_id, json_data.get("relationships", []))
-        
-        # 过滤节点和边
-        display_nodes = [n for n in json_data.get("nodes", []) if n["id"] in filtered_nodes]
-        display_relationships = [r for r in json_data.get("relationships", []) 
-                                if r["source"] in filtered_nodes and r["target"] in filtered_nodes]
+    # 如果选定了问题，只显示该问题及其2级子节点（子图在编译快照时已预先算好）
+    filter_start = time.perf_counter()
+    subgraph = json_data["question_subgraphs"].get(selected_question["id"]) if selected_question else None
+    if subgraph:
+        node_indices = list(subgraph["nodes"])
+        relationship_indices = list(subgraph["relationships"])
+        node_children = subgraph["node_children"]
     else:
         # 显示所有节点
-        display_nodes = json_data.get("nodes", [])
-        display_relationships = json_data.get("relationships", [])
-    
-    # 添加节点
+        node_indices = range(len(json_data["nodes"]))
+        relationship_indices = range(len(json_data["relationships"]))
+        node_children = json_data["node_children"]
+    
+    # 路径上的节点和关系：不在当前视图中的一并显示；关系序号 -> 所在路径的最小名次（0 为最短路径）
+    path_nodes = set()
+    path_rank = {}
+    for rank, (path_node_ids, path_relationships) in enumerate(paths):
+        path_nodes.update(path_node_ids)
+        for index in path_relationships:
+            path_rank.setdefault(index, rank)
+    if subgraph and paths:
+        shown_nodes = set(node_indices)
+        node_indices += sorted({json_data["node_index"][node_id] for node_id in path_nodes} - shown_nodes)
+        shown_relationships = set(relationship_indices)
+        relationship_indices += sorted(set(path_rank) - shown_relationships)
+    display_nodes = [json_data["nodes"][index] for index in node_indices]
+    perf_metrics.observe("create_knowledge_graph.filter", time.perf_counter() - filter_start)
+    
+    # 添加节点（颜色和大小在编译快照时已解析，保存在节点的 style 字段上）
     for node in display_nodes:
-        # 根节点（level=0）使用最特殊的颜色和大小
-        if node.get("level") == 0:
-            color = ROOT_NODE_COLOR
-            size = ROOT_NODE_SIZE
-        # 核心问题（level=1）使用特殊颜色和大小
-        elif node.get("level") == 1 and node.get("category") == "核心问题":
-            color = CORE_QUESTION_COLOR
-            size = CORE_QUESTION_SIZE
-        else:
-            # 其他节点根据type字段映射到分类，然后获取颜色
-            node_type = node.get("type", "Unknown")
-            mapped_category = TYPE_TO_CATEGORY.get(node_type, "理论基础")  # 默认映射到理论基础
-            color = CATEGORY_COLORS.get(mapped_category, "#888888")
-            size = (40 - (node.get("level", 1) - 1) * 5) * 2
+        color, size = node.style
         
         # 如果是选中的节点，增加边框
         border_width = 5 if selected_node == node["id"] else 3 if node.get("level") == 1 else 2
+        # 路径上的节点使用醒目的边框
+        if node["id"] in path_nodes:
+            color = {"background": color, "border": PATH_COLOR}
+            border_width = 6
         
         net.add_node(
             node["id"],
@@ -375,17 +771,20 @@ def create_knowledge_graph(json_data, selected_question=None, selected_node=None
             font={"size": 160, "color": "#222222", "face": "Microsoft YaHei, SimHei, sans-serif", "bold": True}
         )
     
-    # 添加边
-    for rel in display_relationships:
+    # 添加边（路径上的边加粗高亮：最短路径为实线，其余路径为虚线）
+    for index in relationship_indices:
+        rel = json_data["relationships"][index]
+        rank = path_rank.get(index)
         net.add_edge(
             rel["source"],
             rel["target"],
             title=rel.get("type", "关联"),
             label=rel.get("type", ""),
-            color="#999999",
-            width=1,
+            color="#999999" if rank is None else PATH_COLOR,
+            width=1 if rank is None else 6 if rank == 0 else 4,
+            dashes=rank is not None and rank > 0,
             arrows={"to": {"enabled": True, "scaleFactor": 0.3}},
-            font={"size": 20, "color": "#555"}
+            font={"size": 20, "color": "#555" if rank is None else PATH_COLOR}
         )
     
     # 配置交互选项 - 稳定后禁用物理引擎，节点可自由拖动
@@ -429,20 +828,13 @@ def create_knowledge_graph(json_data, selected_question=None, selected_node=None
     """)
     
     # 为图谱添加拖动事件监听：当拖动核心问题节点时，其子节点跟随移动
-    # 构建节点关系映射：每个节点 -> 其所有子节点
-    node_children = {}
-    for rel in display_relationships:
-        source = rel["source"]
-        target = rel["target"]
-        if source not in node_children:
-            node_children[source] = []
-        node_children[source].append(target)
+    # 节点关系映射（每个节点 -> 其所有子节点）在编译快照时已建好
     
     # 在HTML中添加JavaScript代码，处理拖动事件
     drag_script = f"""
     <script type="text/javascript">
     // 构建节点关系映射
-    var nodeChildren = {json.dumps(node_children)};
+    var nodeChildren = {json.dumps(graph_snapshot.thaw(node_children))};
     var draggedNode = null;
     var dragOffset = {{}};
     
@@ -533,6 +925,155 @@ def create_knowledge_graph(json_data, selected_question=None, selected_node=None
     
     return net, drag_script
 
+@st.cache_resource(max_entries=64, show_spinner=False)
+def render_graph_html(graph_version, _json_data, question_id=None, selected_node=None, paths=()):
+    """
+    按（图谱版本, 核心问题, 选中节点, 高亮路径）缓存 pyvis 生成的图谱 HTML
+    图谱更新后版本变化，旧的渲染结果自然失效；同一个键只会有一个会话在生成，其余会话等待结果
+    进程内没有时再查磁盘渲染缓存，同一台机器上的其他进程生成过的直接读取
+    """
+    def render():
+        question = None
+        if question_id in _json_data["node_index"]:
+            question = _json_data["nodes"][_json_data["node_index"][question_id]]
+        net, drag_script = create_knowledge_graph(_json_data, question, selected_node, paths)
+        with perf_metrics.timed("pyvis.generate_html"):
+            html_content = net.generate_html()
+        return html_content, drag_script
+
+    return cached_on_disk("render_html", [_json_data.get("content_hash", graph_version), question_id,
+                                          selected_node, paths], render)
+
+@st.cache_resource(max_entries=2 * MAX_ACTIVE_COURSES, show_spinner=False)
+def graph_data_json(graph_version, _json_data):
+    """按图谱版本缓存注入页面的节点和关系 JSON（节点 id -> 节点，关系列表），每次重跑不再重新序列化整张图"""
+    def serialize():
+        nodes_json = json.dumps({node["id"]: graph_snapshot.thaw(node) for node in _json_data["nodes"]},
+                                ensure_ascii=False)
+        edges_json = json.dumps(graph_snapshot.thaw(_json_data["relationships"]), ensure_ascii=False)
+        return nodes_json, edges_json
+
+    return cached_on_disk("graph_data", [_json_data.get("content_hash", graph_version)], serialize)
+
+def node_label(json_data, node_id):
+    """按节点索引查找节点名称，找不到时返回 id"""
+    index = json_data["node_index"].get(node_id)
+    return json_data["nodes"][index]["label"] if index is not None else node_id
+
+# ==================== 知识点搜索 ====================
+@st.cache_resource(max_entries=2 * MAX_ACTIVE_COURSES, show_spinner=False)
+def get_search_index(graph_version, _json_data):
+    """按图谱版本建立的全文检索倒排索引（进程内共享，每门活跃课程保留当前和上一版本）"""
+    with perf_metrics.timed("search.build_index"):
+        return SearchIndex(_json_data["nodes"])
+
+def search_nodes(conn, json_data, query, limit=SEARCH_RESULT_LIMIT):
+    """搜索知识点，返回按得分降序的 [(节点id, 得分)]"""
+    graph_view = is_graph_view(json_data)
+    # 子图模式下内存中只有当前视图，搜索整张图谱需要使用 Neo4j 全文索引
+    if (SEARCH_BACKEND == "neo4j" or graph_view) and conn.driver:
+        try:
+            with perf_metrics.timed("search.neo4j"):
+                course = current_course()
+                results = Neo4jFullTextSearch(conn, course.label, course.search_index_name).search(query, limit)
+            if graph_view:
+                return results
+            # 只保留当前图谱中存在的节点（Neo4j 中的数据可能尚未重新初始化）
+            return [(node_id, score) for node_id, score in results if node_id in json_data["node_index"]]
+        except Exception:
+            pass
+    with perf_metrics.timed("search.memory"):
+        return get_search_index(graph_snapshot.version_of(json_data), json_data).search(query, limit)
+
+def focus_search_result(node_id):
+    """点击搜索结果：在图谱中定位并高亮该节点；节点不在当前核心问题的子图中时切换到全图"""
+    st.session_state.search_focus = node_id
+    json_data = load_json_data()
+    question = st.session_state.get("selected_question")
+    if is_graph_view(json_data):
+        # 子图模式：节点不在当前视图中时，切换到包含它的核心问题（没有时为概览）
+        index = json_data["node_index"].get(node_id)
+        subgraph = json_data["question_subgraphs"].get(question["id"]) if question else None
+        if index is None or (subgraph and index not in subgraph["nodes"]):
+            st.session_state.question_choice = fetch_home_question(current_course().key, node_id)
+        return
+    if question and node_id in json_data["node_index"]:
+        subgraph = json_data["question_subgraphs"].get(question["id"])
+        if not subgraph or json_data["node_index"][node_id] not in subgraph["nodes"]:
+            st.session_state.question_choice = None
+
+# ==================== 知识点路径 ====================
+@st.cache_resource(max_entries=2 * MAX_ACTIVE_COURSES, show_spinner=False)
+def get_path_index(graph_version, _json_data):
+    """按图谱版本建立的路径查询邻接索引（进程内共享，每门活跃课程保留当前和上一版本）"""
+    with perf_metrics.timed("paths.build_index"):
+        return PathIndex(_json_data)
+
+@st.cache_resource(max_entries=256, show_spinner=False)
+def find_knowledge_paths(graph_version, _json_data, source, target, rel_types=(), directed=False):
+    """两个知识点之间最短的 PATH_RESULT_LIMIT 条路径，按（图谱版本, 起点, 终点, 关系类型, 方向）缓存"""
+    with perf_metrics.timed("paths.query"):
+        return tuple(get_path_index(graph_version, _json_data).k_shortest_paths(
+            source, target, PATH_RESULT_LIMIT, rel_types, directed))
+
+def describe_path(json_data, path):
+    """路径的文字说明：A -[包含]→ B -[案例]← C（箭头表示关系的方向）"""
+    node_ids, relationship_indices = path
+    parts = [node_label(json_data, node_ids[0])]
+    for position, index in enumerate(relationship_indices):
+        rel = json_data["relationships"][index]
+        arrow = "→" if rel["source"] == node_ids[position] else "←"
+        parts.append(f" -[{rel.get('type', '')}]{arrow} {node_label(json_data, node_ids[position + 1])}")
+    return "".join(parts)
+
+def pick_path_node(conn, json_data, title, key):
+    """
+    路径起点或终点的选择框：先按关键词搜索（知识点搜索的倒排索引），选项只有搜索结果和已选的节点，
+    不把整张图谱的节点都发送到浏览器。返回选中的节点 id（未选择时为 None）
+    """
+    query = st.text_input(title, key=f"{key}_query", placeholder=f"输入关键词查找{title}")
+    current = st.session_state.get(key)
+    options = [None] + ([current] if current in json_data["node_index"] else [])
+    if query.strip():
+        # 子图模式下搜索整张图谱，路径只能在当前视图中查找
+        options += [node_id for node_id, _ in search_nodes(conn, json_data, query)
+                    if node_id in json_data["node_index"] and node_id != current]
+    return st.selectbox(title, options=options, key=key, label_visibility="collapsed",
+                        format_func=lambda x: f"选择{title}" if x is None else node_label(json_data, x))
+
+def warm_up_graph(graph):
+    """预先生成默认视图（全图）和各核心问题视图的图谱HTML以及注入页面的节点数据，写入渲染缓存"""
+    version = graph_snapshot.version_of(graph)
+    with perf_metrics.timed("warmup.graph"):
+        get_search_index(version, graph)
+        get_path_index(version, graph)
+        graph_data_json(version, graph)
+        for question_id in [None] + list(graph["core_questions"]):
+            render_graph_html(version, graph, question_id, None, ())
+
+@st.cache_resource(max_entries=MAX_ACTIVE_COURSES)
+def start_warmup(course_key):
+    """每门课程只执行一次（课程被淘汰后再次访问时重新执行）：在后台线程中预热该课程的渲染缓存，不阻塞页面运行"""
+    store = get_graph_store(course_key)
+
+    def run():
+        try:
+            warm_up_graph(store.get())
+        except Exception:
+            # 预热失败不影响使用，页面运行时会按需生成
+            pass
+
+    # 附加当前会话的运行上下文，后台线程中调用 st.cache_resource 函数时不再告警
+    # （预热用到的缓存函数都关闭了 show_spinner，不会向该会话输出任何元素）
+    thread = add_script_run_ctx(threading.Thread(target=run, name="graph-warmup", daemon=True))
+    thread.start()
+    return thread
+
+def st_javascript(js_code, key=None):
+    """在浏览器中执行 JavaScript 并返回结果（用到时才导入 streamlit_javascript）"""
+    from streamlit_javascript import st_javascript as run_javascript
+    return run_javascript(js_code, key=key)
+
 # ==================== 信息卡片组件 ====================
 def render_info_card(node_data):
     """渲染节点信息卡片"""
@@ -591,14 +1132,23 @@ def render_info_card(node_data):
     else:
         st.info("暂无详细属性信息")
 
+def render_node_detail(detail):
+    """子图模式的节点详情：信息卡片和该节点的全部关系（fetch_node_detail 的结果）"""
+    render_info_card(detail["node"])
+    relations = detail["relations"]
+    if relations:
+        st.markdown(f"🔗 **相关知识点（{len(relations)}）**")
+        for rel in relations:
+            arrow = "→" if rel["direction"] == "out" else "←"
+            st.markdown(f"- {arrow} [{rel.get('type') or '关联'}] {rel.get('label') or rel['id']}")
+
 # ==================== 学生端页面 ====================
 def student_page(conn, json_data):
-    """学生端：浏览知识图谱"""
+    """学生端：浏览当前课程的知识图谱"""
+    course = current_course()
     
-    # 获取所有8个核心问题（level=1）
-    core_questions = [node for node in json_data.get("nodes", []) 
-                     if node.get("level") == 1 and node.get("category") == "核心问题"]
-    core_questions = sorted(core_questions, key=lambda x: x.get("id"))
+    # 获取所有8个核心问题（level=1，编译快照时已按 id 排好序）
+    nodes, node_index = json_data["nodes"], json_data["node_index"]
     
     # ========== 左侧侧边栏：问题菜单、知识分类和节点详情 ==========
     with st.sidebar:
@@ -634,19 +1184,79 @@ def student_page(conn, json_data):
         
         st.markdown("---")
         
+        # 知识点搜索（名称、描述和属性）
+        st.markdown("### 🔍 搜索知识点")
+        search_query = st.text_input("搜索知识点", key="search_query", placeholder="输入关键词，如：条约、外交豁免",
+                                     label_visibility="collapsed")
+        if search_query.strip():
+            search_start = time.perf_counter()
+            search_results = search_nodes(conn, json_data, search_query)
+            search_ms = (time.perf_counter() - search_start) * 1000
+            if search_results:
+                st.caption(f"找到 {len(search_results)} 个相关知识点（{search_ms:.2f} ms），点击在图谱中定位")
+                for node_id, _ in search_results:
+                    node = lookup_node(json_data, node_id)
+                    if node is None:
+                        continue
+                    st.button(f"{node['label']} · {node.get('category', '')}", key=f"search_hit_{node_id}",
+                              on_click=focus_search_result, args=(node_id,), use_container_width=True)
+            else:
+                st.caption("没有找到相关知识点")
+            # 子图模式：定位的节点可能不在当前视图中，详情和全部关系从 Neo4j 查询
+            focus = st.session_state.get("search_focus")
+            if focus and is_graph_view(json_data):
+                detail = fetch_node_detail(current_course().key, focus)
+                if detail:
+                    with st.expander("📍 节点详情", expanded=True):
+                        render_node_detail(detail)
+        else:
+            st.session_state.pop("search_focus", None)
+        
+        st.markdown("---")
+        
         # 8大核心问题菜单
         st.markdown("### 📚 8大核心问题")
         
-        selected_question = st.radio(
+        # 选项使用问题 id（st.radio 会复制选项，不直接传共享的只读节点）
+        selected_question_id = st.radio(
             "选择问题",
-            options=[None] + core_questions,
-            format_func=lambda x: "📖 查看全图" if x is None else x.get("label", ""),
-            label_visibility="collapsed"
+            options=[None] + list(json_data["core_questions"]),
+            format_func=lambda x: (("📖 查看概览" if is_graph_view(json_data) else "📖 查看全图") if x is None
+                                   else nodes[node_index[x]].get("label", "")),
+            label_visibility="collapsed",
+            key="question_choice"
         )
         
+        selected_question = nodes[node_index[selected_question_id]] if selected_question_id else None
         st.session_state.selected_question = selected_question
         if selected_question:
             st.markdown(f"#### 📌 {selected_question['label']}")
+        if json_data.get("truncated"):
+            st.caption(f"⚠️ 当前视图超过 {SUBGRAPH_NODE_LIMIT} 个节点，只显示了其中一部分")
+        
+        st.markdown("---")
+        
+        # 知识点路径：两个知识点之间如何关联（最短路径在图谱上高亮）
+        st.markdown("### 🧭 知识点路径")
+        path_source = pick_path_node(conn, json_data, "起点", "path_source")
+        path_target = pick_path_node(conn, json_data, "终点", "path_target")
+        graph_version = graph_snapshot.version_of(json_data)
+        path_types = st.multiselect("只经过这些关系（不选表示全部）",
+                                    options=get_path_index(graph_version, json_data).relationship_types, key="path_types")
+        path_directed = st.checkbox("沿关系方向查找（前置路径）", key="path_directed")
+        paths = ()
+        if path_source and path_target:
+            path_start = time.perf_counter()
+            paths = find_knowledge_paths(graph_version, json_data, path_source, path_target,
+                                         tuple(sorted(path_types)), path_directed)
+            path_ms = (time.perf_counter() - path_start) * 1000
+            if paths:
+                st.caption(f"找到 {len(paths)} 条路径（{path_ms:.2f} ms），已在图谱中高亮，最短路径为实线")
+                for rank, path in enumerate(paths, 1):
+                    st.markdown(f"{rank}. {describe_path(json_data, path)}（{len(path[1])} 步）")
+            else:
+                st.caption("两个知识点之间没有符合条件的路径")
+        st.session_state.path_overlay = paths
         
         st.markdown("---")
         st.markdown("💡 **提示**: 点击图谱中的节点查看详情")
@@ -654,18 +1264,19 @@ def student_page(conn, json_data):
         # 读取并处理localStorage中的交互记录
         if st.session_state.get("student_id"):
             try:
-                interactions_js = st_javascript("""
-                    var interactions = localStorage.getItem('pending_interactions');
-                    if (interactions) {
-                        localStorage.removeItem('pending_interactions');
+                interactions_js = st_javascript(f"""
+                    var interactions = localStorage.getItem({json.dumps(course.pending_storage_key)});
+                    if (interactions) {{
+                        localStorage.removeItem({json.dumps(course.pending_storage_key)});
                         interactions;
-                    } else {
+                    }} else {{
                         null;
-                    }
+                    }}
                 """, key=f"read_interactions_{int(time.time())}")
                 
                 if interactions_js:
                     import json as json_lib
+                    drain_start = time.perf_counter()
                     try:
                         interactions_list = json_lib.loads(interactions_js)
                         for interaction in interactions_list:
@@ -675,13 +1286,25 @@ def student_page(conn, json_data):
                                 interaction.get('node_id', ''),
                                 interaction.get('node_label', ''),
                                 'view',
-                                0
+                                float(interaction.get('duration', 0) or 0),
+                                int(interaction.get('count', 1))
                             )
                     except:
                         pass
+                    perf_metrics.observe("student_page.drain_interactions", time.perf_counter() - drain_start)
             except:
                 pass
         
+            # 根据最近访问的节点推荐下一步学习内容
+            covisit = get_covisit_index(course.key)
+            last_node_id = covisit.last_node(st.session_state.student_id)
+            suggestions = covisit.suggest(last_node_id) if last_node_id else []
+            if suggestions:
+                st.markdown("---")
+                st.markdown(f"### 👥 看过「{node_label(json_data, last_node_id)}」的同学接下来还看了")
+                for target, count in suggestions:
+                    st.markdown(f"- {node_label(json_data, target)}（{count}次）")
+            
             # 显示选中节点的详情
             if st.session_state.get("selected_node"):
                 st.markdown("---")
@@ -689,8 +1312,9 @@ def student_page(conn, json_data):
                 render_info_card(st.session_state.selected_node)
     
     # ========== 主区域 ==========
-    st.title("⚖️ 国际法知识图谱")
-    st.markdown("基于8大核心问题的国际法知识体系重构")
+    st.title(f"{course.icon} {course.title}知识图谱")
+    if course.subtitle:
+        st.markdown(course.subtitle)
     
     st.markdown("---")
     
@@ -700,27 +1324,43 @@ def student_page(conn, json_data):
     query_params = st.query_params
     url_selected = query_params.get("selected_node", None)
     
-    # 创建并显示图谱（传入选定的问题）
-    net, drag_script = create_knowledge_graph(json_data, st.session_state.get("selected_question"), url_selected)
-    
-    # 保存并显示HTML
-    graph_path = os.path.join(current_dir, "temp_graph.html")
-    net.save_graph(graph_path)
-    
-    # 读取并嵌入HTML
-    with open(graph_path, "r", encoding="utf-8") as f:
-        html_content = f.read()
+    # 创建图谱HTML（传入选定的问题；按图谱版本缓存，相同视图不重复生成）
+    selected_question = st.session_state.get("selected_question")
+    html_content, drag_script = render_graph_html(
+        graph_snapshot.version_of(json_data), json_data,
+        selected_question["id"] if selected_question else None, url_selected,
+        st.session_state.get("path_overlay", ())
+    )
     
-    # 准备节点数据供 JavaScript 使用
-    nodes_data = {node["id"]: node for node in json_data.get("nodes", [])}
-    nodes_json = json.dumps(nodes_data, ensure_ascii=False)
+    inject_start = time.perf_counter()
+    # 准备节点数据供 JavaScript 使用，以及边的数据供高亮使用（按图谱版本缓存）
+    nodes_json, edges_json = graph_data_json(graph_snapshot.version_of(json_data), json_data)
     
-    # 准备边的数据供高亮使用
-    edges_data = json_data.get("relationships", [])
-    edges_json = json.dumps(edges_data, ensure_ascii=False)
+    # 当前视图中各节点的"同学们还浏览了"推荐（每个节点 O(K) 查表，只注入视图中显示的节点）
+    suggestions_data = get_covisit_index(course.key).suggest_many(
+        view_node_ids(json_data, selected_question["id"] if selected_question else None,
+                      st.session_state.get("path_overlay", ())))
+    suggestions_json = json.dumps(suggestions_data, ensure_ascii=False)
     
     # 注入点击事件处理
-    click_handler = f"""
+    click_handler = build_click_handler(nodes_json, edges_json, suggestions_json, st.session_state.get("search_focus"),
+                                        course.pending_storage_key, course.view_storage_key)
+    html_content = html_content.replace("</body>", click_handler + drag_script + "</body>")
+    perf_metrics.observe("student_page.inject_html", time.perf_counter() - inject_start)
+    html_bytes = len(html_content.encode("utf-8"))
+    perf_metrics.increment("rendered_html_bytes_total", html_bytes)
+    perf_metrics.set_gauge("rendered_html_bytes", html_bytes)
+    
+    components.html(html_content, height=1000, scrolling=False)
+
+def build_click_handler(nodes_json, edges_json, suggestions_json="{}", focus_node_id=None, pending_key=None,
+                        view_key=None):
+    """
+    注入图谱页面的点击处理：节点详情面板、2级关联高亮、搜索结果定位和浏览记录（学生端和静态站点共用）
+    nodes_json / edges_json / suggestions_json 为 JavaScript 表达式（JSON 文本，或外部脚本中定义的变量名）；
+    pending_key 为 None 时不在 localStorage 中记录浏览
+    """
+    return f"""
     <style>
     html, body {{
         margin: 0 !important;
@@ -815,12 +1455,84 @@ def student_page(conn, json_data):
     // 数据初始化
     var nodesData = {nodes_json};
     var edgesData = {edges_json};
+    var suggestionsData = {suggestions_json};
+    // 搜索结果中选中的节点：图谱加载后定位并高亮
+    var focusNodeId = {json.dumps(focus_node_id)};
     
     var originalColors = {{}};
     var networkRef = null;
     
+    // 重复点击合并：窗口期内重复查看同一节点只累加次数，停留时长在下一次点击时结算
+    var COALESCE_WINDOW_MS = {COALESCE_WINDOW_SECONDS * 1000};
+    // 暂存键按课程区分，切换课程后不会把上一门课程的记录提交到这门课程；为 null 时不记录（静态站点）
+    var PENDING_KEY = {json.dumps(pending_key)};
+    var VIEW_KEY = {json.dumps(view_key)};
+    var MAX_DWELL_MS = {MAX_DWELL_SECONDS * 1000};
+    
+    function settleDwell(interactions, now) {{
+        var current = JSON.parse(localStorage.getItem(VIEW_KEY) || 'null');
+        localStorage.removeItem(VIEW_KEY);
+        if (!current) return;
+        var dwell = Math.min(Math.max(now - current.since, 0), MAX_DWELL_MS) / 1000;
+        var entry = null;
+        for (var i = interactions.length - 1; i >= 0; i--) {{
+            if (interactions[i].node_id === current.node_id) {{ entry = interactions[i]; break; }}
+        }}
+        if (entry) {{
+            entry.duration = Math.round(((entry.duration || 0) + dwell) * 10) / 10;
+        }} else {{
+            // 对应记录已被服务端取走，只上报停留时长，由服务端并入
+            interactions.push({{node_id: current.node_id, node_label: current.node_label, count: 0,
+                                duration: Math.round(dwell * 10) / 10, timestamp: new Date(now).toISOString()}});
+        }}
+    }}
+    
+    function recordView(nodeId, nodeLabel) {{
+        if (!PENDING_KEY) return;
+        try {{
+            var now = Date.now();
+            var pending = localStorage.getItem(PENDING_KEY);
+            var interactions = pending ? JSON.parse(pending) : [];
+            settleDwell(interactions, now);
+            var entry = null;
+            for (var i = interactions.length - 1; i >= 0; i--) {{
+                var item = interactions[i];
+                if (item.node_id === nodeId && item.count > 0 && now - Date.parse(item.timestamp) <= COALESCE_WINDOW_MS) {{
+                    entry = item;
+                    break;
+                }}
+            }}
+            if (entry) {{
+                entry.count += 1;
+            }} else {{
+                interactions.push({{
+                    node_id: nodeId,
+                    node_label: nodeLabel,
+                    count: 1,
+                    duration: 0,
+                    timestamp: new Date(now).toISOString()
+                }});
+            }}
+            localStorage.setItem(PENDING_KEY, JSON.stringify(interactions));
+            localStorage.setItem(VIEW_KEY, JSON.stringify({{node_id: nodeId, node_label: nodeLabel, since: now}}));
+        }} catch(e) {{}}
+    }}
+    
+    function endView() {{
+        if (!PENDING_KEY) return;
+        try {{
+            var pending = localStorage.getItem(PENDING_KEY);
+            var interactions = pending ? JSON.parse(pending) : [];
+            settleDwell(interactions, Date.now());
+            if (interactions.length > 0) {{
+                localStorage.setItem(PENDING_KEY, JSON.stringify(interactions));
+            }}
+        }} catch(e) {{}}
+    }}
+    
     function closeDetailPanel() {{
         document.getElementById('node-detail-panel').style.display = 'none';
+        endView();
         if (networkRef) {{
             restoreAllColors();
         }}
@@ -835,7 +1547,8 @@ def student_page(conn, json_data):
             nodeUpdates.push({{id: nodeId, color: originalColors.nodes[nodeId], font: {{color: '#333333'}}}});
         }}
         for (var edgeId in originalColors.edges) {{
-            edgeUpdates.push({{id: edgeId, color: '#999999', font: {{color: '#555'}}}});
+            var original = originalColors.edges[edgeId];
+            edgeUpdates.push({{id: edgeId, color: original.color, width: original.width, font: {{color: original.fontColor}}}});
         }}
         
         if (nodeUpdates.length > 0) {{
@@ -909,7 +1622,8 @@ def student_page(conn, json_data):
         }});
         
         allEdges.forEach(function(edge) {{
-            originalColors.edges[edge.id] = edge.color;
+            // 路径上的边有自己的颜色和宽度，取消高亮时恢复
+            originalColors.edges[edge.id] = {{color: edge.color, width: edge.width, fontColor: (edge.font && edge.font.color) || '#555'}};
             if (connectedEdgeIds.has(edge.id)) {{
                 edgeUpdates.push({{id: edge.id, color: '#2196F3', width: 3, font: {{color: '#2196F3'}}}});
             }} else {{
@@ -949,22 +1663,27 @@ def student_page(conn, json_data):
                         if (node) {{
                             showNodeDetail(node, nodeId);
                             highlightConnected(nodeId);
-                            
-                            try {{
-                                var pending = localStorage.getItem('pending_interactions');
-                                var interactions = pending ? JSON.parse(pending) : [];
-                                interactions.push({{
-                                    node_id: nodeId,
-                                    node_label: node.label || nodeId,
-                                    timestamp: new Date().toISOString()
-                                }});
-                                localStorage.setItem('pending_interactions', JSON.stringify(interactions));
-                            }} catch(e) {{}}
+                            recordView(nodeId, node.label || nodeId);
                         }}
                     }} else {{
                         closeDetailPanel();
                     }}
                 }});
+                
+                if (focusNodeId && nodesData[focusNodeId] && networkObj.body.data.nodes.get(focusNodeId)) {{
+                    var focused = false;
+                    function focusSearchResult() {{
+                        if (focused) return;
+                        focused = true;
+                        networkObj.selectNodes([focusNodeId]);
+                        networkObj.focus(focusNodeId, {{scale: 0.8, animation: {{duration: 800, easingFunction: 'easeInOutQuad'}}}});
+                        showNodeDetail(nodesData[focusNodeId], focusNodeId);
+                        highlightConnected(focusNodeId);
+                    }}
+                    // 布局稳定后再定位；已经稳定或迟迟不稳定时稍后直接定位
+                    networkObj.once('stabilized', focusSearchResult);
+                    setTimeout(focusSearchResult, 1500);
+                }}
             }} else if (attempts < maxAttempts) {{
                 setTimeout(tryBindEvents, 300);
             }}
@@ -1051,7 +1770,17 @@ def student_page(conn, json_data):
             
             relHtml += '</div>';
             
-            relationsContent.innerHTML = hasRelations ? relHtml : '';
+            // 同学们接下来还看了
+            var suggestHtml = '';
+            (suggestionsData[nodeId] || []).forEach(function(item) {{
+                var target = nodesData[item[0]];
+                suggestHtml += '<div class="relation-item">👉 ' + (target ? target.label : item[0]) + '（' + item[1] + '次）</div>';
+            }});
+            if (suggestHtml) {{
+                suggestHtml = '<div class="relations-section"><h4>👥 同学们接下来还看了</h4>' + suggestHtml + '</div>';
+            }}
+            
+            relationsContent.innerHTML = (hasRelations ? relHtml : '') + suggestHtml;
             panel.style.display = 'block';
         }}
         
@@ -1059,71 +1788,120 @@ def student_page(conn, json_data):
     }};
     </script>
     """
-    html_content = html_content.replace("</body>", click_handler + drag_script + "</body>")
-    
-    components.html(html_content, height=1000, scrolling=False)
 
 # ==================== 管理端页面 ====================
+@st.cache_resource(max_entries=2 * MAX_ACTIVE_COURSES)
+def get_learning_analytics(data_version, graph_version, _df, _json_data):
+    """按交互数据版本和图谱版本缓存学习行为分析结果（会话、跳转、覆盖率），都未变化时直接复用"""
+    perf_metrics.increment("cache_misses_total", cache="learning_analytics")
+    import learning_analytics
+    with perf_metrics.timed("admin.learning_analytics"):
+        return learning_analytics.analyze(_df, _json_data)
+
+@st.cache_resource(max_entries=2 * MAX_ACTIVE_COURSES)
+@perf_metrics.timed_function("admin.aggregates")
+def get_dashboard_aggregates(data_version, graph_version, _df, _json_data):
+    """按交互数据版本和图谱版本缓存整体统计结果，切换学生等重跑时不再重新聚合"""
+    perf_metrics.increment("cache_misses_total", cache="dashboard_aggregates")
+    df = _df
+    node_categories = {node["id"]: node["category"] for node in _json_data.get("nodes", [])}
+    node_counts = df.groupby(["node_id", "node_label"])["count"].sum().reset_index(name="访问次数")
+    student_counts = df.groupby("student_id")["count"].sum().reset_index(name="访问次数")
+    category_counts = df.groupby(df["node_id"].map(node_categories).rename("category"))["count"].sum()
+    return {
+        "total_visits": int(df["count"].sum()),
+        "unique_students": df["student_id"].nunique(),
+        "unique_nodes": df["node_id"].nunique(),
+        "avg_duration": df[df["duration"] > 0]["duration"].mean(),
+        "node_counts": node_counts.sort_values("访问次数", ascending=False).head(10),
+        "student_counts": student_counts.sort_values("访问次数", ascending=False).head(10),
+        "category_counts": category_counts.rename("访问次数"),
+        "all_students": sorted(df["student_id"].unique().tolist())
+    }
+
 def admin_page(conn, json_data):
-    """管理端：查看学生访问数据"""
-    st.title("📊 管理端 - 学生学习数据分析")
+    """管理端：查看当前课程的学生访问数据"""
+    import pandas as pd
+    import learning_analytics
+    course = current_course()
+    st.title("📊 管理端 - 学生学习数据分析" + (f"（{course.title}）" if len(get_course_registry()) > 1 else ""))
+    
+    # 获取交互数据（TTL 内复用缓存，过期后增量拉取）
+    cache = get_dashboard_cache(course.key)
+    col_info, col_refresh = st.columns([5, 1])
+    with col_refresh:
+        force_refresh = st.button("🔄 刷新数据", use_container_width=True)
+    with perf_metrics.timed("admin.fetch_interactions"):
+        df = cache.get(lambda watermark: fetch_interactions(conn, watermark), force=force_refresh)
     
     # 显示数据来源信息
-    if conn.driver:
-        st.info("📡 数据来源: Neo4j 数据库")
-    else:
-        st.info("📁 数据来源: 本地文件 (interactions_log.json)")
-    
-    # 获取所有交互数据
-    interactions = get_all_interactions(conn)
+    with col_info:
+        if cache.watermark and cache.watermark[0] == "neo4j":
+            st.info("📡 数据来源: Neo4j 数据库")
+        else:
+            st.info(f"📁 数据来源: 本地文件 ({os.path.basename(course.interactions_file)})")
+    st.caption(f"🕒 缓存数据更新于 {cache.age:.0f} 秒前（有效期 {cache.ttl} 秒），"
+               f"最近一次刷新获取 {cache.last_new_records} 条新增或更新记录")
+    
+    # 缓冲区同步状态（只比较文件大小和高水位，不解析记录；未连接Neo4j时无需同步）
+    spool = get_interaction_spool(course.key)
+    replayer = get_spool_replayer(course.key)
+    pending = spool.pending_bytes() if conn.driver else 0
+    if pending:
+        st.warning(f"⏳ 本地缓冲区中有 {pending / 1024:.1f} KB 记录尚未同步到Neo4j")
+        if replayer.last_error:
+            st.caption(f"最近一次同步失败: {replayer.last_error}")
+        if st.button("⏫ 立即同步到Neo4j"):
+            try:
+                synced = replayer.sync_once()
+                st.success(f"✅ 已同步 {synced} 条记录")
+            except Exception as e:
+                st.error(f"❌ 同步失败: {e}")
     
     # 调试信息
-    st.caption(f"共获取到 {len(interactions)} 条记录")
+    st.caption(f"共获取到 {len(df)} 条记录")
     
-    if not interactions:
+    if df.empty:
         st.warning("暂无学生访问数据。请先在学生端浏览知识图谱，数据会自动记录。")
         
         # 显示本地文件状态
-        if os.path.exists(INTERACTIONS_FILE):
-            st.info(f"✅ 本地记录文件存在: {INTERACTIONS_FILE}")
+        if os.path.exists(course.interactions_file):
+            st.info(f"✅ 本地记录文件存在: {course.interactions_file}")
             try:
-                with open(INTERACTIONS_FILE, 'r', encoding='utf-8') as f:
-                    local_data = json.load(f)
-                    st.write(f"本地文件中有 {len(local_data)} 条记录")
-                    if local_data:
-                        st.dataframe(pd.DataFrame(local_data), use_container_width=True)
+                local_data = spool.read_all()
+                st.write(f"本地文件中有 {len(local_data)} 条记录")
+                if local_data:
+                    st.dataframe(pd.DataFrame(local_data), use_container_width=True)
             except Exception as e:
                 st.error(f"读取本地文件失败: {e}")
         else:
-            st.warning(f"❌ 本地记录文件不存在: {INTERACTIONS_FILE}")
+            st.warning(f"❌ 本地记录文件不存在: {course.interactions_file}")
         
         # 提供初始化数据选项
         if conn.driver and st.button("🔄 初始化知识图谱数据到Neo4j"):
             with st.spinner("正在导入数据..."):
                 if init_neo4j_data(conn, json_data):
-                    init_interaction_table(conn)
+                    init_interaction_table(conn, course)
                     st.success("✅ 数据初始化成功！")
                 else:
                     st.error("❌ 数据初始化失败")
         return
     
-    df = pd.DataFrame(interactions)
+    perf_metrics.increment("cache_requests_total", cache="dashboard_aggregates")
+    aggregates = get_dashboard_aggregates(cache.version, graph_snapshot.version_of(json_data), df, json_data)
     
     # 整体统计
     st.markdown("## 📈 整体数据统计")
     
     col1, col2, col3, col4 = st.columns(4)
     with col1:
-        total_visits = len(df)
-        st.metric("总访问次数", total_visits)
+        st.metric("总访问次数", aggregates["total_visits"])
     with col2:
-        unique_students = df["student_id"].nunique()
-        st.metric("学习学生数", unique_students)
+        st.metric("学习学生数", aggregates["unique_students"])
     with col3:
-        unique_nodes = df["node_id"].nunique()
-        st.metric("被访问节点数", unique_nodes)
+        st.metric("被访问节点数", aggregates["unique_nodes"])
     with col4:
-        avg_duration = df[df["duration"] > 0]["duration"].mean()
+        avg_duration = aggregates["avg_duration"]
         st.metric("平均浏览时长(秒)", f"{avg_duration:.1f}" if pd.notna(avg_duration) else "N/A")
     
     st.divider()
@@ -1133,8 +1911,7 @@ def admin_page(conn, json_data):
     
     with col_left:
         st.markdown("### 🔥 节点访问热度排行")
-        node_counts = df.groupby(["node_id", "node_label"]).size().reset_index(name="访问次数")
-        node_counts = node_counts.sort_values("访问次数", ascending=False).head(10)
+        node_counts = aggregates["node_counts"]
         
         st.dataframe(
             node_counts[["node_label", "访问次数"]].rename(columns={"node_label": "节点名称"}),
@@ -1144,8 +1921,7 @@ def admin_page(conn, json_data):
     
     with col_right:
         st.markdown("### 👥 学生活跃度排行")
-        student_counts = df.groupby("student_id").size().reset_index(name="访问次数")
-        student_counts = student_counts.sort_values("访问次数", ascending=False).head(10)
+        student_counts = aggregates["student_counts"]
         
         st.dataframe(
             student_counts.rename(columns={"student_id": "学号"}),
@@ -1158,20 +1934,52 @@ def admin_page(conn, json_data):
     # 类别分布
     st.markdown("### 📊 知识类别访问分布")
     
-    # 合并节点类别信息
-    node_categories = {node["id"]: node["category"] for node in json_data.get("nodes", [])}
-    df["category"] = df["node_id"].map(node_categories)
+    st.bar_chart(aggregates["category_counts"])
+    
+    st.divider()
+    
+    # 学习会话、节点跳转与核心问题覆盖率
+    perf_metrics.increment("cache_requests_total", cache="learning_analytics")
+    analytics = get_learning_analytics(cache.version, graph_snapshot.version_of(json_data), df, json_data)
+    node_labels = {node["id"]: node["label"] for node in json_data.get("nodes", [])}
     
-    category_counts = df.groupby("category").size().reset_index(name="访问次数")
-    st.bar_chart(category_counts.set_index("category")["访问次数"])
+    st.markdown("### 🔀 学习跳转与核心问题覆盖")
+    st.caption(f"共切分 {len(analytics['session_summary'])} 个学习会话"
+               f"（同一学生间隔超过 {learning_analytics.SESSION_GAP_MINUTES} 分钟视为新会话）")
+    
+    col_left, col_right = st.columns(2)
+    with col_left:
+        st.markdown("#### 常见跳转 Top 15")
+        transitions = analytics["transitions"].head(15)
+        if len(transitions):
+            st.dataframe(
+                pd.DataFrame({
+                    "从": transitions["source"].astype(str).map(node_labels).fillna(transitions["source"].astype(str)),
+                    "到": transitions["target"].astype(str).map(node_labels).fillna(transitions["target"].astype(str)),
+                    "次数": transitions["次数"]
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+        else:
+            st.info("暂无跳转数据")
+    
+    with col_right:
+        st.markdown("#### 各核心问题平均覆盖率")
+        coverage = analytics["coverage"]
+        if len(coverage):
+            avg_coverage = (coverage.mean() * 100).round(1)
+            avg_coverage.index = [node_labels.get(q, q) for q in avg_coverage.index]
+            st.bar_chart(avg_coverage)
+        else:
+            st.info("暂无覆盖率数据")
     
     st.divider()
     
     # 个人数据查询
     st.markdown("## 👤 个人学习数据查询")
     
-    all_students = sorted(df["student_id"].unique().tolist())
-    selected_student = st.selectbox("选择学生学号", options=all_students)
+    selected_student = st.selectbox("选择学生学号", options=aggregates["all_students"])
     
     if selected_student:
         student_data = df[df["student_id"] == selected_student]
@@ -1180,16 +1988,17 @@ def admin_page(conn, json_data):
         with col1:
             st.metric("访问节点数", student_data["node_id"].nunique())
         with col2:
-            st.metric("总访问次数", len(student_data))
+            st.metric("总访问次数", int(student_data["count"].sum()))
         with col3:
             total_duration = student_data[student_data["duration"] > 0]["duration"].sum()
             st.metric("总学习时长(秒)", int(total_duration))
         
         st.markdown("#### 📜 访问记录")
         st.dataframe(
-            student_data[["node_label", "action_type", "duration", "timestamp"]].rename(columns={
+            student_data[["node_label", "action_type", "count", "duration", "timestamp"]].rename(columns={
                 "node_label": "节点名称",
                 "action_type": "操作类型",
+                "count": "访问次数",
                 "duration": "浏览时长(秒)",
                 "timestamp": "时间"
             }),
@@ -1197,22 +2006,193 @@ def admin_page(conn, json_data):
             hide_index=True
         )
         
-        # 学习路径可视化
+        # 学习路径可视化（按会话切分，显示最近5个会话）
         st.markdown("#### 🛤️ 学习路径")
-        path_nodes = student_data["node_label"].tolist()
-        if len(path_nodes) > 1:
-            path_str = " → ".join(path_nodes[:20])  # 最多显示20个
-            if len(path_nodes) > 20:
-                path_str += " → ..."
-            st.markdown(f"```\n{path_str}\n```")
+        paths = learning_analytics.session_paths(analytics["sessions"], selected_student)
+        if paths and any(len(labels) > 1 for _, labels, _ in paths):
+            summary = analytics["session_summary"].set_index("session_id")
+            for session_id, labels, truncated in paths[-5:]:
+                path_str = " → ".join(labels) + (" → ..." if truncated else "")
+                st.caption(f"会话开始于 {summary.at[session_id, 'start']:%Y-%m-%d %H:%M}")
+                st.markdown(f"```\n{path_str}\n```")
         else:
             st.info("学习路径数据不足")
+        
+        # 核心问题子树覆盖率
+        coverage = analytics["coverage"]
+        if selected_student in coverage.index:
+            st.markdown("#### 🎯 核心问题覆盖率")
+            student_coverage = (coverage.loc[selected_student] * 100).round(1)
+            st.dataframe(
+                pd.DataFrame({
+                    "核心问题": [node_labels.get(q, q) for q in student_coverage.index],
+                    "覆盖率(%)": student_coverage.to_numpy()
+                }),
+                use_container_width=True,
+                hide_index=True
+            )
+    
+    st.divider()
+    
+    # 性能统计
+    st.markdown("## ⏱️ 性能")
+    with st.expander("各阶段耗时分布（本进程启动以来）", expanded=False):
+        perf_rows = perf_metrics.snapshot()
+        if perf_rows:
+            st.dataframe(pd.DataFrame(perf_rows), use_container_width=True, hide_index=True)
+        else:
+            st.info("暂无计时数据")
+        exporter_targets = get_metrics_exporter()
+        if exporter_targets:
+            st.caption("📈 Prometheus 指标：" + "；".join(exporter_targets))
+        else:
+            st.caption("📈 设置环境变量 METRICS_PORT 或 METRICS_FILE 可导出 Prometheus 指标")
+        if st.button("🧹 重置性能统计"):
+            perf_metrics.reset()
+            st.rerun()
+    
+    with st.expander("🔬 按需性能剖析（cProfile）", expanded=False):
+        st.session_state.profile_armed = st.toggle(
+            "剖析本会话接下来的每次重跑",
+            value=st.session_state.get("profile_armed", False),
+            help="开启后切换到学生端，复现较慢的视图（如选中某个节点的“📖 查看全图”），每次重跑都会保存一份剖析结果；"
+                 "也可以在地址后加 ?profile=1 只剖析带该参数的重跑"
+        )
+        
+        profiles = profile_capture.list_profiles(PROFILE_DIR)
+        if profiles:
+            profile_df = pd.DataFrame(profiles)[["time", "page", "question", "node", "duration_ms"]]
+            profile_df.columns = ["时间", "页面", "核心问题", "选中节点", "耗时(ms)"]
+            st.dataframe(profile_df, use_container_width=True, hide_index=True)
+            
+            selected_profile = st.selectbox(
+                "查看剖析结果",
+                options=profiles,
+                format_func=lambda meta: f"{meta['time']} · {meta.get('page') or ''} · {meta.get('question') or ''} · {meta['duration_ms']} ms"
+            )
+            st.dataframe(pd.DataFrame(profile_capture.top_functions(PROFILE_DIR, selected_profile["name"])),
+                         use_container_width=True, hide_index=True)
+            
+            col_download, col_clear = st.columns(2)
+            with col_download:
+                with open(profile_capture.stats_path(PROFILE_DIR, selected_profile["name"]), "rb") as f:
+                    st.download_button(
+                        "📥 下载 .pstats",
+                        data=f.read(),
+                        file_name=f"profile_{selected_profile['name']}.pstats",
+                        mime="application/octet-stream",
+                        use_container_width=True
+                    )
+            with col_clear:
+                if st.button("🗑️ 删除全部剖析结果", use_container_width=True):
+                    for meta in profiles:
+                        profile_capture.remove_profile(PROFILE_DIR, meta["name"])
+                    st.rerun()
+        else:
+            st.info("暂无剖析结果")
+    
+    st.divider()
+    
+    # 慢查询
+    with st.expander(f"🐢 Neo4j 查询统计与慢查询（阈值 {query_log.threshold_ms:.0f} ms）", expanded=False):
+        statement_rows = query_log.statement_rows()
+        if statement_rows:
+            st.markdown("#### 语句统计")
+            st.dataframe(pd.DataFrame(statement_rows), use_container_width=True, hide_index=True)
+        else:
+            st.info("暂无查询记录")
+        
+        if query_log.slow_entries:
+            st.markdown("#### 慢查询与失败语句（参数已脱敏）")
+            slow_df = pd.DataFrame(list(query_log.slow_entries)[::-1])
+            slow_df["counters"] = slow_df["counters"].map(lambda c: ", ".join(f"{k}={v}" for k, v in c.items()))
+            slow_df["parameters"] = slow_df["parameters"].map(lambda p: json.dumps(p, ensure_ascii=False))
+            st.dataframe(slow_df, use_container_width=True, hide_index=True)
+            
+            if conn.driver and st.button("📋 抓取最慢语句的执行计划"):
+                with st.spinner("正在抓取执行计划..."):
+                    captured = query_log.capture_plans(conn)
+                st.success(f"✅ 已抓取 {captured} 条语句的执行计划")
+        
+        for statement, (mode, plan_text) in query_log.plans.items():
+            st.markdown(f"**{mode}** `{statement[:120]}`")
+            st.code(plan_text, language="text")
+        
+        if st.button("🧹 清空查询日志"):
+            query_log.reset()
+            st.rerun()
+    
+    st.divider()
+    
+    # 数据导出
+    st.markdown("## 📤 数据导出")
+    interaction_export.cleanup_exports(EXPORT_DIR)
+    with st.expander("导出交互记录（CSV / JSONL，可选 gzip 压缩）", expanded=False):
+        col1, col2 = st.columns(2)
+        with col1:
+            use_date_range = st.checkbox("按日期筛选")
+            date_range = st.date_input("日期范围", value=[], disabled=not use_date_range)
+            export_format = st.selectbox("文件格式", options=list(interaction_export.EXPORT_FORMATS))
+        with col2:
+            export_students = st.multiselect("指定学生（留空表示全部）", options=aggregates["all_students"])
+        
+        if st.button("📦 生成导出文件"):
+            start = end = None
+            if use_date_range and len(date_range) == 2:
+                start = date_range[0].isoformat()
+                end = (date_range[1] + timedelta(days=1)).isoformat()
+            with st.spinner("正在导出..."):
+                try:
+                    rows = iter_interactions_for_export(conn, start, end, export_students)
+                    file_name, row_count = interaction_export.export_interactions(rows, EXPORT_DIR, export_format)
+                    # 同一会话只保留最近一次的导出文件
+                    if st.session_state.get("last_export"):
+                        interaction_export.remove_export(EXPORT_DIR, st.session_state.last_export[0])
+                    st.session_state.last_export = (file_name, row_count)
+                except Exception as e:
+                    st.error(f"❌ 导出失败: {e}")
+        
+        if st.session_state.get("last_export"):
+            file_name, row_count = st.session_state.last_export
+            export_path = os.path.join(EXPORT_DIR, file_name)
+            if os.path.exists(export_path):
+                st.success(f"✅ 已导出 {row_count} 条记录")
+                max_bytes = EXPORT_DOWNLOAD_MAX_MB * 1024 * 1024
+                if os.path.getsize(export_path) <= max_bytes:
+                    # 点击时才从磁盘读取文件，下载地址只对当前会话有效
+                    st.download_button(f"⬇️ 下载 {file_name}", data=functools.partial(
+                        interaction_export.read_export, EXPORT_DIR, file_name, max_bytes),
+                        file_name=file_name, mime=interaction_export.export_mime_type(file_name))
+                else:
+                    st.warning(f"导出文件大小为 {os.path.getsize(export_path) / (1024 * 1024):.1f} MB，"
+                               f"超过下载按钮的上限 {EXPORT_DOWNLOAD_MAX_MB} MB（EXPORT_DOWNLOAD_MAX_MB）。"
+                               f"请选择 gzip 格式或缩小筛选范围，或直接从服务器获取文件：{export_path}")
+                st.caption(f"导出文件保留 {interaction_export.EXPORT_TTL_SECONDS // 60} 分钟后自动删除")
     
     st.divider()
     
     # 数据管理
     st.markdown("## ⚙️ 数据管理")
     
+    # 知识图谱校验结果（编译快照时生成）
+    issues = json_data.get("issues", [])
+    if is_graph_view(json_data):
+        # 子图模式：不加载整张图谱，下面的统计只针对当前视图（概览）
+        st.caption(f"🧩 知识图谱：Neo4j 子图模式，当前视图 {len(json_data['nodes'])} 个节点，"
+                   f"{len(json_data['relationships'])} 条关系（查询结果缓存 {SUBGRAPH_CACHE_TTL} 秒）")
+    else:
+        graph_store = get_graph_store(course.key)
+        st.caption(f"🧩 知识图谱：{len(json_data['nodes'])} 个节点，{len(json_data['relationships'])} 条关系，"
+                   f"版本 {graph_snapshot.version_of(json_data)}"
+                   + (f"，{datetime.fromtimestamp(graph_store.reloaded_at):%H:%M:%S} 自动重新加载" if graph_store.reloaded_at else "")
+                   + f"（修改JSON文件后约 {GRAPH_RELOAD_INTERVAL:g} 秒内自动生效）")
+        if graph_store.last_error:
+            st.error(f"❌ 知识图谱重新加载失败，仍在使用上一版本：{graph_store.last_error}")
+    if issues:
+        with st.expander(f"⚠️ 知识图谱数据校验发现 {len(issues)} 个问题（有问题的节点和关系未导入）", expanded=False):
+            for issue in issues:
+                (st.error if issue["level"] == "error" else st.warning)(issue["message"])
+    
     col1, col2, col3 = st.columns(3)
     with col1:
         if st.button("🔄 重新初始化知识图谱"):
@@ -1225,7 +2205,8 @@ def admin_page(conn, json_data):
     with col2:
         if st.button("🗑️ 清除所有访问记录", type="secondary"):
             if conn.driver:
-                conn.execute_write(f"MATCH (n:Interaction_{TARGET_LABEL}) DELETE n")
+                conn.execute_write(f"MATCH (n:Interaction_{course.label}) DELETE n")
+                cache.reset()
                 st.success("✅ 访问记录已清除")
                 st.rerun()
     
@@ -1241,6 +2222,7 @@ def admin_page(conn, json_data):
                     # 清除本地文件
                     if clear_local_files():
                         st.success("✅ 本地文件已清除")
+                    cache.reset()
                     
                     # 创建新的空白数据仓库
                     new_data = create_new_data_warehouse()
@@ -1252,10 +2234,34 @@ def admin_page(conn, json_data):
                         st.error("❌ 创建新数据仓库失败")
 
 # ==================== 主程序入口 ====================
+def describe_rerun():
+    """本次重跑的页面、核心问题和选中节点，随剖析结果一起保存"""
+    page = st.session_state.get("nav_page")
+    if page != "🎓 学生端":
+        return {"page": page, "question": None, "node": None}
+    question = st.session_state.get("selected_question")
+    node = st.session_state.get("selected_node")
+    return {
+        "page": page,
+        "question": question.get("label") if question else "📖 查看全图",
+        "node": node.get("label") if isinstance(node, Mapping) else None,
+    }
+
 def main():
+    # 管理员在管理端开启剖析，或在地址后加 ?profile=1 时，用 cProfile 包裹本次重跑；未开启时直接运行
+    profiling = st.session_state.get("is_admin") and (
+        st.session_state.get("profile_armed") or st.query_params.get("profile") == "1")
+    if profiling:
+        profile_capture.capture(render_app, PROFILE_DIR, describe_rerun)
+    else:
+        render_app()
+
+def render_app():
+    # 本次会话的课程（地址参数 ?course= 或侧边栏选择）
+    course = select_course()
     st.set_page_config(
-        page_title="国际法知识图谱",
-        page_icon="⚖️",
+        page_title=f"{course.title}知识图谱",
+        page_icon=course.icon,
         layout="wide",
         initial_sidebar_state="expanded"
     )
@@ -1292,49 +2298,80 @@ def main():
     </style>
     """, unsafe_allow_html=True)
     
-    # 加载JSON数据
-    json_data = load_json_data()
+    # 启动预热（每门课程只启动一次；子图模式不加载整张图谱，不预热）
+    if GRAPH_WARMUP and GRAPH_BACKEND != "neo4j":
+        start_warmup(course.key)
+    
+    # 加载当前课程的知识图谱（进程内共享的快照，不得修改）
+    with perf_metrics.timed("load_json_data"):
+        json_data = load_json_data()
     if not json_data:
         st.error("无法加载知识图谱数据，请检查JSON文件")
         return
     
-    # 连接Neo4j
-    conn = Neo4jConnection(NEO4J_URI, NEO4J_USER, NEO4J_PASSWORD)
+    # 连接Neo4j（所有课程和会话共用一个驱动）
+    conn = get_neo4j_pool().connection()
+    
+    # 启动各课程的后台同步线程（进程内只启动一次），补写Neo4j不可用期间的交互记录
+    for hosted in get_course_registry():
+        get_spool_replayer(hosted.key)
+    
+    # 指标导出（进程内只启动一次）及活跃会话统计
+    get_metrics_exporter()
+    if "metrics_session_id" not in st.session_state:
+        st.session_state.metrics_session_id = secrets.token_hex(8)
+    perf_metrics.touch_session(st.session_state.metrics_session_id)
     
     # 侧边栏导航
     st.sidebar.title("🧭 导航")
+    registry = get_course_registry()
+    if len(registry) > 1:
+        st.session_state.course_choice = course.key
+        st.sidebar.selectbox(
+            "📚 课程",
+            options=[hosted.key for hosted in registry],
+            format_func=lambda key: registry.get(key).title,
+            key="course_choice",
+            on_change=switch_course
+        )
     
     page = st.sidebar.radio(
         "选择页面",
         options=["🎓 学生端", "🔐 管理端"],
-        index=0
+        index=0,
+        key="nav_page"
     )
     
+    perf_metrics.increment("reruns_total", page="student" if page == "🎓 学生端" else "admin")
     if page == "🎓 学生端":
-        student_page(conn, json_data)
+        with perf_metrics.timed("rerun.student_page"):
+            student_page(conn, json_data)
     else:
         # 管理端需要密码验证
         st.sidebar.markdown("---")
         password = st.sidebar.text_input("🔑 管理员密码", type="password")
         
         if password == ADMIN_PASSWORD:
+            st.session_state.is_admin = True
             st.sidebar.success("✅ 验证成功")
-            admin_page(conn, json_data)
+            with perf_metrics.timed("rerun.admin_page"):
+                admin_page(conn, json_data)
         elif password:
+            st.session_state.is_admin = False
             st.sidebar.error("❌ 密码错误")
             st.warning("请输入正确的管理员密码")
         else:
             st.info("👈 请在侧边栏输入管理员密码")
     
-    # 关闭数据库连接
+    # 释放连接（共享驱动不会被关闭）
     conn.close()
     
     # 页脚
     st.sidebar.markdown("---")
-    st.sidebar.markdown("""
+    st.sidebar.markdown(f"""
     <div style='text-align: center; color: #666; font-size: 12px;'>
-        <p>国际法知识图谱</p>
-        <p>《国际法》课程教学资源</p>
+        <p>{course.title}知识图谱</p>
+        <p>《{course.title}》课程教学资源</p>
         <p>© 2026</p>
     </div>
     """, unsafe_allow_html=True)
@@ -0,0 +1,382 @@
+"""
+紧凑的图谱节点与关系表示，以及大文件的流式加载
+节点和关系不再是一个个字典（每个节点都重复保存 category、type、level 等键名和各自的哈希表），
+而是 __slots__ 对象：字段按位置存放，相同的字符串（类别、类型、属性名和重复出现的属性值）全图只保存一份，
+节点带有整数序号（index），子图、邻接等索引用整数序号的数组保存。
+Node / Relationship 实现 Mapping 接口（不提供按键赋值），现有代码仍可按 node["label"]、node.get("level") 访问；
+编译完成后的节点和关系由所有会话共享，属性、extra 字典和序号数组本身仍可修改，只是约定只读，
+需要修改时先用 graph_snapshot.thaw 复制一份
+
+流式加载：按块读取 JSON 文件，逐个解析 nodes / relationships 数组中的元素并立即转换为紧凑对象，
+不需要把整个文件读成字符串、也不会同时存在整张图的字典形式；同时计算文件内容的 SHA-256
+"""
+import codecs
+import hashlib
+import json
+import sys
+from collections.abc import Mapping
+from types import MappingProxyType
+
+# 流式读取时每次读入的字节数
+STREAM_CHUNK_SIZE = 1 << 20
+
+# 节点的标准字段（按此顺序输出），其余字段保存在 extra 字典中
+NODE_FIELDS = ("id", "label", "category", "type", "level", "description", "properties")
+RELATIONSHIP_FIELDS = ("source", "target", "type", "description")
+_NODE_FIELD_SET = frozenset(NODE_FIELDS)
+_RELATIONSHIP_FIELD_SET = frozenset(RELATIONSHIP_FIELDS)
+
+
+# ==================== 节点与关系 ====================
+class Node(Mapping):
+    """
+    知识点节点：index 为整数序号，style 为编译时解析好的 (颜色, 大小)；
+    值为 None 的字段视为不存在（get 返回默认值），properties 以 (键, 值, 键, 值, ...) 元组保存，访问时返回只读字典；
+    属性和 extra 字典仍可赋值修改，编译后的节点被所有会话共享，约定不修改
+    """
+    __slots__ = ("index", "id", "label", "category", "type", "level", "description", "_properties", "extra", "style")
+
+    def __init__(self, index, node_id, label, category, node_type, level, description, properties, extra=None,
+                 style=None):
+        self.index = index
+        self.id = node_id
+        self.label = label
+        self.category = category
+        self.type = node_type
+        self.level = level
+        self.description = description
+        self._properties = properties
+        self.extra = extra
+        self.style = style
+
+    @property
+    def properties(self):
+        value = self._properties
+        if isinstance(value, tuple):
+            return MappingProxyType(dict(zip(value[::2], value[1::2])))
+        return value
+
+    def _field(self, key):
+        return self.properties if key == "properties" else getattr(self, key)
+
+    def __getitem__(self, key):
+        if key in _NODE_FIELD_SET:
+            value = self._field(key)
+            if value is not None:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        # 比 Mapping.get 的 try/except 更快：字段不存在时不抛出异常
+        if key in _NODE_FIELD_SET:
+            value = self._field(key)
+            return default if value is None else value
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None if key in _NODE_FIELD_SET else bool(self.extra) and key in self.extra
+
+    def __iter__(self):
+        for key in NODE_FIELDS:
+            if self._field(key) is not None:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Node({self.id!r}, {self.label!r})"
+
+    def __reduce__(self):
+        return Node, (self.index, self.id, self.label, self.category, self.type, self.level, self.description,
+                      self._properties, self.extra, self.style)
+
+
+class Relationship(Mapping):
+    """关系：source / target 为节点 id（与节点共用同一个字符串对象），同样按 Mapping 接口访问，编译后约定不修改"""
+    __slots__ = ("source", "target", "type", "description", "extra")
+
+    def __init__(self, source, target, rel_type, description, extra=None):
+        self.source = source
+        self.target = target
+        self.type = rel_type
+        self.description = description
+        self.extra = extra
+
+    def __getitem__(self, key):
+        if key in _RELATIONSHIP_FIELD_SET:
+            value = getattr(self, key)
+            if value is not None:
+                return value
+        elif self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def get(self, key, default=None):
+        if key in _RELATIONSHIP_FIELD_SET:
+            value = getattr(self, key)
+            return default if value is None else value
+        if self.extra:
+            return self.extra.get(key, default)
+        return default
+
+    def __contains__(self, key):
+        return self.get(key) is not None if key in _RELATIONSHIP_FIELD_SET else bool(self.extra) and key in self.extra
+
+    def __iter__(self):
+        for key in RELATIONSHIP_FIELDS:
+            if getattr(self, key) is not None:
+                yield key
+        if self.extra:
+            yield from self.extra
+
+    def __len__(self):
+        return sum(1 for _ in self)
+
+    def __repr__(self):
+        return f"Relationship({self.source!r} -[{self.type!r}]-> {self.target!r})"
+
+    def __reduce__(self):
+        return Relationship, (self.source, self.target, self.type, self.description, self.extra)
+
+
+# ==================== 校验与构建 ====================
+class GraphBuilder:
+    """
+    逐个接收节点和关系字典，校验后转换为紧凑对象：
+    无法使用的节点和关系被剔除，问题列表说明原因；关系的端点在 finish() 时统一检查，节点和关系的先后顺序不限
+    """
+
+    def __init__(self):
+        self.metadata = {}
+        self.nodes = []
+        self.node_index = {}
+        self.issues = []
+        self._relationships = []
+        # 源文件中的位置编号，用于问题说明
+        self._node_count = 0
+        self._relationship_count = 0
+        # 同一字符串只保留一个对象（局部去重，图谱重新加载后旧字符串可被回收）
+        self._strings = {}
+
+    def _report(self, level, message):
+        self.issues.append({"level": level, "message": message})
+
+    def _share(self, value):
+        if isinstance(value, str):
+            return self._strings.setdefault(value, value)
+        return value
+
+    def add_node(self, node):
+        self._node_count += 1
+        node_id = node.get("id") if isinstance(node, dict) else None
+        if not node_id or not isinstance(node_id, str):
+            self._report("error", f"第 {self._node_count} 个节点缺少 id，已忽略")
+            return
+        if node_id in self.node_index:
+            self._report("error", f"节点 id 重复：{node_id}，只保留第一个")
+            return
+        label = node.get("label")
+        if not label:
+            self._report("warning", f"节点 {node_id} 缺少 label，使用 id 代替")
+            label = node_id
+        category = node.get("category")
+        if "category" not in node:
+            self._report("warning", f"节点 {node_id} 缺少 category")
+            category = ""
+        properties = node.get("properties")
+        if isinstance(properties, dict):
+            properties = tuple(self._share(item) for pair in properties.items() for item in pair)
+        extra = {self._share(key): value for key, value in node.items() if key not in _NODE_FIELD_SET} or None
+        node_id = sys.intern(node_id)
+        self.node_index[node_id] = len(self.nodes)
+        self.nodes.append(Node(
+            len(self.nodes), node_id, self._share(label), self._share(category), self._share(node.get("type")),
+            node.get("level"), self._share(node.get("description")), self._share(properties), extra,
+        ))
+
+    def add_relationship(self, rel):
+        self._relationship_count += 1
+        if not isinstance(rel, dict):
+            rel = {}
+        extra = {self._share(key): value for key, value in rel.items() if key not in _RELATIONSHIP_FIELD_SET} or None
+        self._relationships.append((self._relationship_count, Relationship(
+            rel.get("source"), rel.get("target"), self._share(rel.get("type")), self._share(rel.get("description")),
+            extra,
+        )))
+
+    def feed(self, key, value):
+        """流式解析产生的 (键, 值)：nodes / relationships 为单个元素，其余为顶层字段"""
+        if key == "nodes":
+            self.add_node(value)
+        elif key == "relationships":
+            self.add_relationship(value)
+        elif key == "metadata":
+            self.metadata = value
+
+    def feed_dict(self, data):
+        """从已解析的图谱字典构建"""
+        self.metadata = data.get("metadata", {})
+        for node in data.get("nodes", []):
+            self.feed("nodes", node)
+        for rel in data.get("relationships", []):
+            self.feed("relationships", rel)
+        return self
+
+    def finish(self):
+        """检查关系端点和重复关系，返回 (节点列表, 关系列表, 问题列表)"""
+        relationships = []
+        seen_edges = set()
+        index = self.node_index
+        for position, rel in self._relationships:
+            source, target = rel.source, rel.target
+            if not source or not target:
+                self._report("error", f"第 {position} 条关系缺少 source 或 target，已忽略")
+                continue
+            missing = [endpoint for endpoint in (source, target) if endpoint not in index]
+            if missing:
+                self._report("error", f"关系 {source} -> {target} 的端点不存在：{', '.join(missing)}，已忽略")
+                continue
+            edge_key = (source, target, rel.type or "")
+            if edge_key in seen_edges:
+                self._report("warning", f"重复关系 {source} -[{rel.type or ''}]-> {target}，只保留第一条")
+                continue
+            seen_edges.add(edge_key)
+            # 端点使用节点自己的 id 字符串对象
+            rel.source = self.nodes[index[source]].id
+            rel.target = self.nodes[index[target]].id
+            relationships.append(rel)
+        self._relationships = []
+        self._strings = {}
+        if not any(node.level == 1 and node.category == "核心问题" for node in self.nodes):
+            self._report("warning", "图谱中没有核心问题节点（level=1 且 category=核心问题）")
+        return self.nodes, relationships, self.issues
+
+
+# ==================== 流式解析 ====================
+class _JsonStream:
+    """按块读取 UTF-8 JSON 文件：缓冲区中只保留尚未解析的部分，用 raw_decode 逐个解析值"""
+
+    _WHITESPACE = " \t\r\n"
+
+    def __init__(self, f, chunk_size=STREAM_CHUNK_SIZE):
+        self.f = f
+        self.chunk_size = chunk_size
+        self.sha256 = hashlib.sha256()
+        self._decoder = codecs.getincrementaldecoder("utf-8")()
+        self._json = json.JSONDecoder()
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+
+    def _fill(self):
+        data = self.f.read(self.chunk_size)
+        self.sha256.update(data)
+        if not data:
+            self.eof = True
+        text = self._decoder.decode(data, final=not data)
+        if self.pos == 0 and not self.buffer and text.startswith("﻿"):
+            text = text[1:]
+        self.buffer = self.buffer[self.pos:] + text
+        self.pos = 0
+
+    def peek(self):
+        """跳过空白，返回下一个字符（文件结束时为空字符串）"""
+        while True:
+            buffer, pos = self.buffer, self.pos
+            while pos < len(buffer) and buffer[pos] in self._WHITESPACE:
+                pos += 1
+            self.pos = pos
+            if pos < len(buffer) or self.eof:
+                return buffer[pos] if pos < len(buffer) else ""
+            self._fill()
+
+    def expect(self, chars):
+        char = self.peek()
+        if not char or char not in chars:
+            raise ValueError(f"JSON 格式错误：位置 {self.pos} 处应为 {' 或 '.join(chars)}，实际为 {char or '文件结尾'}")
+        self.pos += 1
+        return char
+
+    def value(self):
+        """解析下一个完整的值；缓冲区中的内容不完整时读入下一块再试"""
+        self.peek()
+        while True:
+            try:
+                value, end = self._json.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if self.eof:
+                    raise
+                self._fill()
+                continue
+            # 值恰好在缓冲区末尾结束时（如数字）可能被截断，读入更多内容后重新解析
+            if end == len(self.buffer) and not self.eof:
+                self._fill()
+                continue
+            self.pos = end
+            return value
+
+
+def iter_graph_file(f, chunk_size=STREAM_CHUNK_SIZE):
+    """
+    流式解析图谱 JSON（二进制文件对象），逐个产出 (键, 值)：
+    nodes 和 relationships 数组中的每个元素各产出一次，其余顶层字段（如 metadata）整体产出一次；
+    全部产出后 stream.sha256 为文件内容的哈希。返回生成器和 stream
+    """
+    stream = _JsonStream(f, chunk_size)
+
+    def generate():
+        stream.expect("{")
+        if stream.peek() == "}":
+            stream.pos += 1
+            return
+        while True:
+            key = stream.value()
+            if not isinstance(key, str):
+                raise ValueError("JSON 格式错误：对象的键应为字符串")
+            stream.expect(":")
+            if key in ("nodes", "relationships") and stream.peek() == "[":
+                stream.pos += 1
+                if stream.peek() == "]":
+                    stream.pos += 1
+                else:
+                    while True:
+                        yield key, stream.value()
+                        if stream.expect(",]") == "]":
+                            break
+            else:
+                yield key, stream.value()
+            if stream.expect(",}") == "}":
+                break
+        if stream.peek():
+            raise ValueError("JSON 格式错误：顶层对象之后还有多余内容")
+        # 读完剩余内容，哈希覆盖整个文件
+        while not stream.eof:
+            stream._fill()
+
+    return generate(), stream
+
+
+def load_graph_file(json_path, chunk_size=STREAM_CHUNK_SIZE):
+    """流式读取图谱文件，返回 (GraphBuilder, 内容哈希)"""
+    builder = GraphBuilder()
+    with open(json_path, "rb") as f:
+        items, stream = iter_graph_file(f, chunk_size)
+        for key, value in items:
+            builder.feed(key, value)
+    return builder, stream.sha256.hexdigest()
+
+
+def file_hash(path, chunk_size=STREAM_CHUNK_SIZE):
+    """按块计算文件内容的 SHA-256，不把整个文件读入内存"""
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
@@ -0,0 +1,67 @@
+"""
+图谱布局预计算：Fruchterman-Reingold 力导向布局（节点互相排斥，关系两端相互吸引，逐轮降温）
+在服务端一次算好节点坐标，浏览器打开页面时直接按坐标绘制，不再运行物理模拟
+结果只由节点、关系和参数决定（初始位置由节点 id 的哈希确定），同一份图谱每次导出的布局相同
+"""
+import hashlib
+import math
+
+# 节点数超过此值时不预先计算（排斥力为 O(n²)），交给浏览器的物理模拟
+LAYOUT_MAX_NODES = 500
+LAYOUT_ITERATIONS = 200
+
+
+def _seed(node_ids):
+    digest = hashlib.sha256("\n".join(node_ids).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big")
+
+
+def force_layout(node_ids, edges, spring_length=400, iterations=LAYOUT_ITERATIONS, gravity=0.02):
+    """
+    node_ids 为节点 id 列表，edges 为 (起点id, 终点id) 列表（端点不在 node_ids 中的忽略）；
+    spring_length 为理想的关系长度（与 vis-network 的 springLength 对应）。
+    返回 {节点id: (x, y)}，坐标以原点为中心；节点数超过 LAYOUT_MAX_NODES 时抛出 ValueError
+    """
+    import numpy as np
+
+    count = len(node_ids)
+    if count > LAYOUT_MAX_NODES:
+        raise ValueError(f"节点数 {count} 超过 {LAYOUT_MAX_NODES}，不预先计算布局")
+    if count == 0:
+        return {}
+    if count == 1:
+        return {node_ids[0]: (0.0, 0.0)}
+
+    index = {node_id: position for position, node_id in enumerate(node_ids)}
+    pairs = np.array([(index[source], index[target]) for source, target in edges
+                      if source in index and target in index and source != target], dtype=np.int64).reshape(-1, 2)
+
+    rng = np.random.default_rng(_seed(node_ids))
+    # 排斥力作用于所有节点对，平衡时的平均边长明显大于 k，k 取理想边长的 0.6 倍
+    k = spring_length * 0.6
+    radius = k * math.sqrt(count) / 2
+    positions = rng.uniform(-radius, radius, size=(count, 2))
+    temperature = radius / 2
+    cooling = 0.01 ** (1 / max(iterations, 1))
+
+    for _ in range(iterations):
+        # 排斥力：k² / 距离，所有节点两两之间
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance = np.maximum(np.hypot(delta[..., 0], delta[..., 1]), 0.01)
+        displacement = (delta * (k * k / distance ** 2)[..., None]).sum(axis=1)
+        # 吸引力：距离² / k，沿关系方向
+        if len(pairs):
+            edge_delta = positions[pairs[:, 0]] - positions[pairs[:, 1]]
+            edge_distance = np.maximum(np.hypot(edge_delta[:, 0], edge_delta[:, 1]), 0.01)
+            force = edge_delta * (edge_distance / k)[:, None]
+            np.subtract.at(displacement, pairs[:, 0], force)
+            np.add.at(displacement, pairs[:, 1], force)
+        # 向中心的引力，避免不连通的部分飘远
+        displacement -= positions * gravity
+        # 每轮移动不超过当前温度
+        length = np.maximum(np.hypot(displacement[:, 0], displacement[:, 1]), 0.01)
+        positions += displacement * (np.minimum(length, temperature) / length)[:, None]
+        temperature *= cooling
+
+    positions -= positions.mean(axis=0)
+    return {node_id: (round(float(x), 1), round(float(y), 1)) for node_id, (x, y) in zip(node_ids, positions)}
@@ -0,0 +1,225 @@
+"""
+Neo4j 子图查询：图谱大到无法整张装入内存时，由 Neo4j 保存完整图谱，应用只按需查询当前视图需要的部分
+- 概览：根节点和核心问题（level <= 1）及它们之间的关系
+- 核心问题视图：概览 + 所选核心问题的2级邻域（变长模式 -[:RELATES*0..2]-，与快照编译的邻域一致）
+- 节点详情：单个节点及其全部关系，点开时才查询
+查询结果编译为与 graph_snapshot 相同结构的小快照（视图），页面的渲染、搜索和路径代码无需区分数据来源；
+所有查询都从 id 索引查找起点，进程内存只与视图大小有关，与图谱总规模无关
+
+导入时按 UNWIND 分批写入（每批一个事务），节点和关系保存源文件中的顺序（ord），视图按原顺序输出
+"""
+import hashlib
+import json
+from collections.abc import Mapping
+
+import graph_snapshot
+from graph_compact import GraphBuilder, iter_graph_file
+
+# 每批写入的节点或关系数
+IMPORT_BATCH_SIZE = 1000
+# 视图最多包含的节点数（超出时截断，视图标记 truncated）
+SUBGRAPH_NODE_LIMIT = 2000
+
+
+def _node_row(node, position):
+    """节点在 Neo4j 中的存储格式（与 graph_patch.push_delta 一致：properties 为 JSON 字符串）"""
+    return {
+        "id": node["id"],
+        "ord": position,
+        "label": node.get("label") or node["id"],
+        "category": node.get("category", ""),
+        "type": node.get("type", ""),
+        "level": node.get("level", 1),
+        "description": node.get("description", ""),
+        "properties": json.dumps(graph_snapshot.thaw(node.get("properties") or {}), ensure_ascii=False),
+    }
+
+
+def _relationship_row(rel, position):
+    return {
+        "source": rel.get("source"),
+        "target": rel.get("target"),
+        "ord": position,
+        "type": rel.get("type", "关联"),
+        "description": rel.get("description", ""),
+    }
+
+
+def _source_order(node):
+    """按导入时记录的源文件顺序排序；graph_patch 后来补上的节点没有 ord，排在最后"""
+    return node.get("ord") is None, node.get("ord") or 0
+
+
+def _from_record(record):
+    """查询结果中的节点还原为图谱 JSON 格式（properties 解析回字典）"""
+    node = dict(record)
+    try:
+        node["properties"] = json.loads(node.get("properties") or "{}")
+    except ValueError:
+        node["properties"] = {}
+    return node
+
+
+class Neo4jGraphSource:
+    """按需从 Neo4j 查询一门课程的知识图谱（节点标签 node_label，关系 RELATES）"""
+
+    NODE_FIELDS = "n.ord AS ord, n.id AS id, n.label AS label, n.category AS category, n.type AS type, " \
+                  "n.level AS level, n.description AS description, n.properties AS properties"
+
+    def __init__(self, conn, node_label):
+        self.conn = conn
+        self.node_label = node_label
+
+    def ensure_indexes(self):
+        """id 索引供所有查询查找起点，level 索引供概览查询（已存在时跳过）"""
+        self.conn.execute_write(f"CREATE INDEX IF NOT EXISTS FOR (n:{self.node_label}) ON (n.id)")
+        self.conn.execute_write(f"CREATE INDEX IF NOT EXISTS FOR (n:{self.node_label}) ON (n.level)")
+
+    # ==================== 导入 ====================
+    def clear(self, batch_size=IMPORT_BATCH_SIZE * 10):
+        """分批删除全部知识节点，大图谱不会在一个事务中删除"""
+        while True:
+            rows = self.conn.execute_query(
+                f"MATCH (n:{self.node_label}) WITH n LIMIT $limit DETACH DELETE n RETURN count(*) AS deleted",
+                {"limit": batch_size})
+            if not rows or not rows[0]["deleted"]:
+                return
+
+    def write_nodes(self, nodes, batch_size=IMPORT_BATCH_SIZE):
+        """分批写入节点（可迭代，不需要一次装入内存）；id 重复时保留第一个，与快照校验一致。返回写入的节点数"""
+        count, batch = 0, []
+        for node in nodes:
+            node_id = node.get("id") if isinstance(node, Mapping) else None
+            if not node_id or not isinstance(node_id, str):
+                continue
+            batch.append(_node_row(node, count))
+            count += 1
+            if len(batch) >= batch_size:
+                self._write_node_batch(batch)
+                batch = []
+        if batch:
+            self._write_node_batch(batch)
+        return count
+
+    def _write_node_batch(self, rows):
+        self.conn.execute_write(
+            f"UNWIND $rows AS row MERGE (n:{self.node_label} {{id: row.id}}) "
+            f"ON CREATE SET n.ord = row.ord, n.label = row.label, n.category = row.category, n.type = row.type, "
+            f"n.level = row.level, n.description = row.description, n.properties = row.properties",
+            {"rows": rows})
+
+    def write_relationships(self, relationships, batch_size=IMPORT_BATCH_SIZE):
+        """
+        分批写入关系，端点不存在的关系被 MATCH 丢弃；(起点, 终点, 类型) 重复的关系保留第一个，
+        与内存中的快照（GraphBuilder 去重）一致。返回提交的关系数
+        """
+        count, batch = 0, []
+        for rel in relationships:
+            batch.append(_relationship_row(rel, count))
+            count += 1
+            if len(batch) >= batch_size:
+                self._write_relationship_batch(batch)
+                batch = []
+        if batch:
+            self._write_relationship_batch(batch)
+        return count
+
+    def _write_relationship_batch(self, rows):
+        self.conn.execute_write(
+            f"UNWIND $rows AS row "
+            f"MATCH (a:{self.node_label} {{id: row.source}}) MATCH (b:{self.node_label} {{id: row.target}}) "
+            f"MERGE (a)-[r:RELATES {{type: row.type}}]->(b) "
+            f"ON CREATE SET r.ord = row.ord, r.description = row.description",
+            {"rows": rows})
+
+    def import_graph(self, nodes, relationships, batch_size=IMPORT_BATCH_SIZE):
+        """清除旧数据后导入节点和关系（节点全部写入后再写关系），返回 (节点数, 关系数)"""
+        self.ensure_indexes()
+        self.clear()
+        return self.write_nodes(nodes, batch_size), self.write_relationships(relationships, batch_size)
+
+    def import_file(self, json_path, batch_size=IMPORT_BATCH_SIZE):
+        """流式导入图谱文件：第一遍只写节点，第二遍只写关系，内存中只保留一批数据"""
+
+        def iter_items(wanted):
+            with open(json_path, "rb") as f:
+                items, _ = iter_graph_file(f)
+                for key, value in items:
+                    if key == wanted and isinstance(value, dict):
+                        yield value
+
+        return self.import_graph(iter_items("nodes"), iter_items("relationships"), batch_size)
+
+    # ==================== 查询 ====================
+    def _fetch_nodes(self, query, parameters):
+        return [_from_record(row) for row in self.conn.execute_query(query, parameters)]
+
+    def _fetch_relationships(self, node_ids):
+        """两端都在 node_ids 中的关系（按 id 索引逐个查找起点），按源文件顺序"""
+        return self.conn.execute_query(
+            f"UNWIND $ids AS id MATCH (a:{self.node_label} {{id: id}})-[r:RELATES]->(b:{self.node_label}) "
+            f"WHERE b.id IN $ids "
+            f"RETURN a.id AS source, b.id AS target, r.type AS type, r.description AS description "
+            f"ORDER BY r.ord",
+            {"ids": node_ids})
+
+    def overview_nodes(self, limit=SUBGRAPH_NODE_LIMIT):
+        """根节点和核心问题（level <= 1），按源文件顺序"""
+        return self._fetch_nodes(
+            f"MATCH (n:{self.node_label}) WHERE n.level <= 1 "
+            f"RETURN {self.NODE_FIELDS} ORDER BY n.ord LIMIT $limit", {"limit": limit})
+
+    def neighborhood_nodes(self, node_id, depth=2, limit=SUBGRAPH_NODE_LIMIT):
+        """节点的 depth 级邻域（双向，包含节点本身），按源文件顺序；超过 limit 时保留源文件中靠前的节点，每次结果相同"""
+        depth = int(depth)
+        return self._fetch_nodes(
+            f"MATCH (:{self.node_label} {{id: $id}})-[:RELATES*0..{depth}]-(n:{self.node_label}) "
+            f"WITH DISTINCT n ORDER BY n.ord LIMIT $limit "
+            f"RETURN {self.NODE_FIELDS}", {"id": node_id, "limit": limit})
+
+    def view(self, resolve_style, style_hash="", question_id=None, limit=SUBGRAPH_NODE_LIMIT):
+        """
+        视图快照：概览，加上 question_id 的2级邻域（question_id 为 None 时只有概览）
+        结构与 graph_snapshot 的快照相同；content_hash 为视图内容的哈希，渲染缓存按它区分不同的视图
+        """
+        nodes = self.overview_nodes(limit)
+        truncated = len(nodes) >= limit
+        if question_id:
+            seen = {node["id"] for node in nodes}
+            neighborhood = self.neighborhood_nodes(question_id, limit=limit)
+            truncated = truncated or len(neighborhood) >= limit
+            nodes += [node for node in neighborhood if node["id"] not in seen]
+        nodes.sort(key=_source_order)
+        for node in nodes:
+            node.pop("ord", None)
+        relationships = self._fetch_relationships([node["id"] for node in nodes]) if nodes else []
+        data = {"metadata": {"source": "neo4j", "question": question_id}, "nodes": nodes,
+                "relationships": relationships}
+        content_hash = hashlib.sha256(json.dumps(data, ensure_ascii=False, sort_keys=True).encode("utf-8")).hexdigest()
+        snapshot = graph_snapshot.compile_builder(GraphBuilder().feed_dict(data), resolve_style, content_hash,
+                                                  style_hash)
+        snapshot["source"] = "neo4j"
+        snapshot["truncated"] = truncated
+        return snapshot
+
+    def node_detail(self, node_id):
+        """单个节点及其全部关系：{"node": 节点, "relations": [{direction, type, description, id, label}]}，不存在时返回 None"""
+        nodes = self._fetch_nodes(
+            f"MATCH (n:{self.node_label} {{id: $id}}) RETURN {self.NODE_FIELDS}", {"id": node_id})
+        if not nodes:
+            return None
+        nodes[0].pop("ord", None)
+        relations = self.conn.execute_query(
+            f"MATCH (:{self.node_label} {{id: $id}})-[r:RELATES]-(m:{self.node_label}) "
+            f"RETURN CASE WHEN startNode(r).id = $id THEN 'out' ELSE 'in' END AS direction, "
+            f"r.type AS type, r.description AS description, m.id AS id, m.label AS label ORDER BY r.ord",
+            {"id": node_id})
+        return {"node": nodes[0], "relations": relations}
+
+    def home_question(self, node_id):
+        """包含该节点的核心问题（节点在其2级邻域内），有多个时取 id 最小的，没有时返回 None"""
+        rows = self.conn.execute_query(
+            f"MATCH (:{self.node_label} {{id: $id}})-[:RELATES*0..2]-(q:{self.node_label}) "
+            f"WHERE q.level = 1 AND q.category = '核心问题' RETURN DISTINCT q.id AS id ORDER BY id LIMIT 1",
+            {"id": node_id})
+        return rows[0]["id"] if rows else None
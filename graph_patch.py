@@ -0,0 +1,386 @@
+"""
+知识图谱批量修改（补丁）
+用声明式的补丁文件（JSON）批量增删改节点和关系、把子树移到新的父节点下，一次性应用到 国际法知识图谱.json：
+节点按 id、关系按 (source, target, type) 建索引，每个操作 O(1) 完成（按条件选择节点时遍历一次节点），
+同一补丁重复应用不会产生重复节点或关系（第二次应用没有任何变化，文件也不会改写）；
+结果先写临时文件再改名，写入过程中应用不会读到半个文件；可选只把变化的部分分批写入 Neo4j
+
+补丁文件格式：
+{
+  "description": "补丁说明",
+  "operations": [
+    {"op": "upsert_node", "node": {"id": "root", "label": "国际法知识图谱", ...}},       # 新增或整体替换节点
+    {"op": "update_node", "id": "q1_source", "set": {"label": "..."}, "unset": ["x"],
+     "properties": {"课时": "2学时", "旧属性": null}},                                   # 修改字段，properties 按键合并（null 删除）
+    {"op": "remove_node", "id": "q1_old"},                                              # 删除节点及其所有关系
+    {"op": "upsert_edge", "source": "root", "target": {"level": 1, "category": "核心问题"},
+     "type": "包含", "description": "..."},                                              # 新增或修改关系；端点可以是 id 或按字段匹配的条件
+    {"op": "remove_edge", "source": "a", "target": "b", "type": "包含"},                 # 删除关系，不写 type 时删除两点间所有关系
+    {"op": "relink", "id": "q3_eez", "parent": "core_q7", "type": "包含"}                # 子树移到新的父节点下，子树各节点的 level 随之调整
+  ]
+}
+
+命令行：
+    python graph_patch.py 补丁.json [--course 课程标识] [--graph 图谱.json] [--dry-run] [--neo4j]
+"""
+import argparse
+import copy
+import json
+import os
+import sys
+import time
+
+# 写入 Neo4j 时每个事务包含的节点或关系数
+NEO4J_BATCH_SIZE = 500
+
+
+def _edge_key(rel):
+    return rel["source"], rel["target"], rel.get("type", "")
+
+
+# ==================== 应用补丁 ====================
+class GraphPatch:
+    """在内存中的图谱数据上应用补丁操作，并记录每个被修改的节点和关系修改前的内容，用于计算变化"""
+
+    def __init__(self, data):
+        self.metadata = data.get("metadata")
+        self.extra = {key: value for key, value in data.items() if key not in ("metadata", "nodes", "relationships")}
+        # id -> 节点（字典保持插入顺序，写回文件时节点顺序不变，新节点追加在末尾）
+        self.nodes = {node["id"]: node for node in data.get("nodes", [])}
+        # (source, target, type) -> 关系
+        self.edges = {}
+        # 节点 id -> 与之相连的关系键集合（删除节点时找到它的所有关系）
+        self.incident = {node_id: set() for node_id in self.nodes}
+        for rel in data.get("relationships", []):
+            key = _edge_key(rel)
+            self.edges[key] = rel
+            for endpoint in key[:2]:
+                self.incident.setdefault(endpoint, set()).add(key)
+        # 第一次修改前的内容（不存在时为 None）
+        self._original_nodes = {}
+        self._original_edges = {}
+
+    # ---------- 记录修改前的内容 ----------
+    def _touch_node(self, node_id):
+        if node_id not in self._original_nodes:
+            self._original_nodes[node_id] = copy.deepcopy(self.nodes.get(node_id))
+
+    def _touch_edge(self, key):
+        if key not in self._original_edges:
+            self._original_edges[key] = copy.deepcopy(self.edges.get(key))
+
+    def _require_node(self, node_id, op):
+        if node_id not in self.nodes:
+            raise ValueError(f"{op}: 节点不存在: {node_id}")
+
+    def _select(self, selector, op):
+        """端点：字符串为节点 id；字典为条件，选出各字段都相等的所有节点"""
+        if isinstance(selector, str):
+            self._require_node(selector, op)
+            return [selector]
+        if isinstance(selector, dict) and selector:
+            return [node_id for node_id, node in self.nodes.items()
+                    if all(node.get(field) == value for field, value in selector.items())]
+        raise ValueError(f"{op}: 无效的端点: {selector!r}")
+
+    # ---------- 节点 ----------
+    def upsert_node(self, node):
+        node_id = node.get("id") if isinstance(node, dict) else None
+        if not node_id:
+            raise ValueError("upsert_node: 节点缺少 id")
+        if self.nodes.get(node_id) == node:
+            return
+        self._touch_node(node_id)
+        self.nodes[node_id] = copy.deepcopy(node)
+        self.incident.setdefault(node_id, set())
+
+    def update_node(self, node_id, set_fields=None, unset=None, properties=None):
+        self._require_node(node_id, "update_node")
+        updated = copy.deepcopy(self.nodes[node_id])
+        updated.update(copy.deepcopy(set_fields or {}))
+        for field in unset or []:
+            updated.pop(field, None)
+        if properties:
+            merged = dict(updated.get("properties") or {})
+            for key, value in properties.items():
+                if value is None:
+                    merged.pop(key, None)
+                else:
+                    merged[key] = value
+            updated["properties"] = merged
+        if updated.get("id") != node_id:
+            raise ValueError(f"update_node: 不能修改节点 id: {node_id}")
+        if updated != self.nodes[node_id]:
+            self._touch_node(node_id)
+            self.nodes[node_id] = updated
+
+    def remove_node(self, node_id):
+        if node_id not in self.nodes:
+            return
+        for key in list(self.incident.get(node_id, ())):
+            self._remove_edge_key(key)
+        self._touch_node(node_id)
+        del self.nodes[node_id]
+        self.incident.pop(node_id, None)
+
+    # ---------- 关系 ----------
+    def upsert_edge(self, source, target, rel_type, fields=None):
+        for source_id in self._select(source, "upsert_edge"):
+            for target_id in self._select(target, "upsert_edge"):
+                if source_id == target_id:
+                    continue
+                rel = {"source": source_id, "target": target_id, "type": rel_type}
+                rel.update(copy.deepcopy(fields or {}))
+                key = (source_id, target_id, rel_type)
+                if self.edges.get(key) == rel:
+                    continue
+                self._touch_edge(key)
+                self.edges[key] = rel
+                self.incident[source_id].add(key)
+                self.incident[target_id].add(key)
+
+    def _remove_edge_key(self, key):
+        if key not in self.edges:
+            return
+        self._touch_edge(key)
+        del self.edges[key]
+        for endpoint in key[:2]:
+            self.incident.get(endpoint, set()).discard(key)
+
+    def remove_edge(self, source, target, rel_type=None):
+        keys = [key for key in self.incident.get(source, ())
+                if key[0] == source and key[1] == target and (rel_type is None or key[2] == rel_type)]
+        for key in keys:
+            self._remove_edge_key(key)
+
+    def relink(self, node_id, parent_id, rel_type="包含", fields=None, update_levels=True):
+        """把 node_id 及其子树移到 parent_id 下：删除其他父节点指向它的 rel_type 关系，再建立 parent_id -> node_id"""
+        self._require_node(node_id, "relink")
+        self._require_node(parent_id, "relink")
+        for key in list(self.incident[node_id]):
+            if key[1] == node_id and key[2] == rel_type and key[0] != parent_id:
+                self._remove_edge_key(key)
+        if fields or (parent_id, node_id, rel_type) not in self.edges:
+            # 已经在 parent_id 下且没有指定新的关系属性时保留原关系
+            self.upsert_edge(parent_id, node_id, rel_type, fields)
+        if update_levels and isinstance(self.nodes[parent_id].get("level"), int):
+            # 沿 rel_type 关系向下调整子树的层级（广度优先，每个节点只处理一次）
+            level = self.nodes[parent_id]["level"] + 1
+            frontier = [node_id]
+            visited = {parent_id, node_id}
+            while frontier:
+                next_frontier = []
+                for member in frontier:
+                    if self.nodes[member].get("level") != level:
+                        self.update_node(member, {"level": level})
+                    for key in self.incident[member]:
+                        if key[0] == member and key[2] == rel_type and key[1] not in visited:
+                            visited.add(key[1])
+                            next_frontier.append(key[1])
+                frontier = next_frontier
+                level += 1
+
+    # ---------- 批量应用 ----------
+    def apply(self, operations):
+        for number, operation in enumerate(operations, 1):
+            op = operation.get("op")
+            try:
+                if op == "upsert_node":
+                    self.upsert_node(operation.get("node"))
+                elif op == "update_node":
+                    self.update_node(operation["id"], operation.get("set"), operation.get("unset"),
+                                     operation.get("properties"))
+                elif op == "remove_node":
+                    self.remove_node(operation["id"])
+                elif op == "upsert_edge":
+                    fields = {key: value for key, value in operation.items()
+                              if key not in ("op", "source", "target", "type")}
+                    self.upsert_edge(operation["source"], operation["target"], operation.get("type", ""), fields)
+                elif op == "remove_edge":
+                    self.remove_edge(operation["source"], operation["target"], operation.get("type"))
+                elif op == "relink":
+                    fields = {key: value for key, value in operation.items()
+                              if key not in ("op", "id", "parent", "type", "update_levels")}
+                    self.relink(operation["id"], operation["parent"], operation.get("type", "包含"), fields,
+                                operation.get("update_levels", True))
+                else:
+                    raise ValueError(f"未知操作: {op!r}")
+            except KeyError as e:
+                raise ValueError(f"第 {number} 个操作（{op}）缺少字段 {e}") from None
+            except ValueError as e:
+                raise ValueError(f"第 {number} 个操作失败：{e}") from None
+
+    def delta(self):
+        """与应用前相比的变化：新增或修改的节点和关系、删除的节点 id 和关系键"""
+        upserted_nodes, removed_nodes, added_nodes = [], [], 0
+        for node_id, before in self._original_nodes.items():
+            after = self.nodes.get(node_id)
+            if after == before:
+                continue
+            if after is None:
+                removed_nodes.append(node_id)
+            else:
+                upserted_nodes.append(after)
+                added_nodes += before is None
+        upserted_edges, removed_edges, added_edges = [], [], 0
+        for key, before in self._original_edges.items():
+            after = self.edges.get(key)
+            if after == before:
+                continue
+            if after is None:
+                removed_edges.append(key)
+            else:
+                upserted_edges.append(after)
+                added_edges += before is None
+        # 节点在补丁后文件中的位置（Neo4j 中的 ord）；加上删除的节点数，新节点排在所有原有节点之后
+        positions = {node_id: position + len(removed_nodes) for position, node_id in enumerate(self.nodes)}
+        return {
+            "upserted_nodes": upserted_nodes,
+            "node_positions": {node["id"]: positions[node["id"]] for node in upserted_nodes},
+            "removed_nodes": removed_nodes,
+            "added_nodes": added_nodes,
+            "upserted_edges": upserted_edges,
+            "removed_edges": removed_edges,
+            "added_edges": added_edges,
+        }
+
+    def result(self):
+        data = dict(self.extra)
+        if self.metadata is not None:
+            data["metadata"] = self.metadata
+        data["nodes"] = list(self.nodes.values())
+        data["relationships"] = list(self.edges.values())
+        return data
+
+
+def has_changes(delta):
+    return any(delta[key] for key in ("upserted_nodes", "removed_nodes", "upserted_edges", "removed_edges"))
+
+
+def apply_patch(data, patch):
+    """在图谱数据上应用补丁，返回 (新的图谱数据, 变化)"""
+    patcher = GraphPatch(data)
+    patcher.apply(patch.get("operations", []))
+    return patcher.result(), patcher.delta()
+
+
+def write_graph(data, json_path):
+    """原子写入图谱文件（先写临时文件再改名）"""
+    tmp_path = f"{json_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False, indent=2)
+    os.replace(tmp_path, json_path)
+
+
+def patch_file(json_path, patch, dry_run=False):
+    """对图谱文件应用补丁；有变化且不是 dry_run 时写回文件。返回变化"""
+    with open(json_path, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    result, delta = apply_patch(data, patch)
+    if has_changes(delta) and not dry_run:
+        write_graph(result, json_path)
+    return delta
+
+
+# ==================== 同步到 Neo4j ====================
+def _batches(items, size=NEO4J_BATCH_SIZE):
+    for start in range(0, len(items), size):
+        yield items[start:start + size]
+
+
+def push_delta(conn, node_label, delta, batch_size=NEO4J_BATCH_SIZE):
+    """
+    只把变化的节点和关系写入 Neo4j，每批一个事务（UNWIND）；
+    节点和关系的存储格式与 graph_neo4j 导入时一致（properties 为 JSON 字符串，关系为 RELATES，节点带源文件顺序 ord）
+    """
+    conn.execute_write(f"CREATE INDEX IF NOT EXISTS FOR (n:{node_label}) ON (n.id)")
+    for batch in _batches([{"source": s, "target": t, "type": rel_type} for s, t, rel_type in delta["removed_edges"]],
+                          batch_size):
+        conn.execute_write(
+            f"UNWIND $rows AS row "
+            f"MATCH (:{node_label} {{id: row.source}})-[r:RELATES {{type: row.type}}]->(:{node_label} {{id: row.target}}) "
+            f"DELETE r", {"rows": batch})
+    for batch in _batches(delta["removed_nodes"], batch_size):
+        conn.execute_write(f"UNWIND $ids AS id MATCH (n:{node_label} {{id: id}}) DETACH DELETE n", {"ids": batch})
+    # 存储格式与 graph_neo4j 导入时相同；已有节点保留原来的 ord（源文件顺序），新节点按补丁后的位置
+    from graph_neo4j import _node_row
+    node_rows = [_node_row(node, delta["node_positions"][node["id"]]) for node in delta["upserted_nodes"]]
+    for batch in _batches(node_rows, batch_size):
+        conn.execute_write(
+            f"UNWIND $rows AS row MERGE (n:{node_label} {{id: row.id}}) "
+            f"SET n.ord = coalesce(n.ord, row.ord), n.label = row.label, n.category = row.category, "
+            f"n.type = row.type, n.level = row.level, n.description = row.description, "
+            f"n.properties = row.properties", {"rows": batch})
+    edge_rows = [{"source": rel["source"], "target": rel["target"], "type": rel.get("type", "关联"),
+                  "description": rel.get("description", "")} for rel in delta["upserted_edges"]]
+    for batch in _batches(edge_rows, batch_size):
+        conn.execute_write(
+            f"UNWIND $rows AS row "
+            f"MATCH (a:{node_label} {{id: row.source}}) MATCH (b:{node_label} {{id: row.target}}) "
+            f"MERGE (a)-[r:RELATES {{type: row.type}}]->(b) SET r.description = row.description", {"rows": batch})
+
+
+# ==================== 命令行 ====================
+def print_delta(delta):
+    updated_nodes = len(delta["upserted_nodes"]) - delta["added_nodes"]
+    updated_edges = len(delta["upserted_edges"]) - delta["added_edges"]
+    print(f"节点：新增 {delta['added_nodes']}，修改 {updated_nodes}，删除 {len(delta['removed_nodes'])}")
+    print(f"关系：新增 {delta['added_edges']}，修改 {updated_edges}，删除 {len(delta['removed_edges'])}")
+
+
+def main(argv=None, patch=None):
+    """命令行入口；patch 不为空时直接使用该补丁（供 add_root_node.py 等脚本调用），不读取补丁文件"""
+    parser = argparse.ArgumentParser(description="对知识图谱应用补丁")
+    if patch is None:
+        parser.add_argument("patch_path", help="补丁文件（JSON）")
+    parser.add_argument("--course", help="课程标识（默认为课程列表中的第一门课程）")
+    parser.add_argument("--graph", help="知识图谱JSON文件（默认使用该课程的图谱文件）")
+    parser.add_argument("--dry-run", action="store_true", help="只显示变化，不写文件")
+    parser.add_argument("--neo4j", action="store_true", help="同时把变化写入 Neo4j（使用主程序的连接配置）")
+    args = parser.parse_args(argv)
+
+    if patch is None:
+        with open(args.patch_path, "r", encoding="utf-8") as f:
+            patch = json.load(f)
+    # 课程的图谱文件、Neo4j 标签和连接配置以主程序为准
+    import gjf_graph_main as app
+    registry = app.get_course_registry()
+    course = registry.get(args.course) if args.course else registry.default
+    if course is None:
+        print(f"未知的课程：{args.course}（可选：{', '.join(hosted.key for hosted in registry)}）", file=sys.stderr)
+        sys.exit(2)
+    json_path = args.graph or course.json_path
+
+    start = time.perf_counter()
+    try:
+        delta = patch_file(json_path, patch, args.dry_run)
+    except ValueError as e:
+        print(f"❌ 补丁未应用：{e}")
+        sys.exit(1)
+    elapsed = time.perf_counter() - start
+
+    if patch.get("description"):
+        print(patch["description"])
+    print_delta(delta)
+    if not has_changes(delta):
+        print(f"✅ 没有变化（补丁已应用过），{json_path} 未改写")
+        return
+    if args.dry_run:
+        print("ℹ️ dry-run：未写入文件")
+        return
+    print(f"✅ 已写入 {json_path}（耗时 {elapsed * 1000:.1f} ms），运行中的应用会自动加载新版本")
+
+    if args.neo4j:
+        conn = app.Neo4jConnection(app.NEO4J_URI, app.NEO4J_USER, app.NEO4J_PASSWORD)
+        if not conn.driver:
+            print("⚠️ 无法连接 Neo4j，未同步；可稍后在管理端重新初始化知识图谱")
+            return
+        try:
+            push_delta(conn, course.label, delta)
+            print(f"✅ 已把变化同步到 Neo4j（{course.label}）")
+        finally:
+            conn.close()
+
+
+if __name__ == "__main__":
+    main()
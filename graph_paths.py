@@ -0,0 +1,163 @@
+"""
+知识点之间的路径查询
+在编译快照的关系上建立按节点序号存储的邻接表（每条边记录对端节点、关系序号和关系类型），
+用双向广度优先搜索求两个知识点之间的最短路径，再用 Yen 算法依次求出前 k 条最短的简单路径。
+可限定只经过某些类型的关系（包含、案例说明……），也可只沿关系方向（source -> target）查找前置路径
+
+路径表示为 (节点id元组, 关系序号元组)：关系序号指向快照 relationships 中的关系，
+节点元组比关系元组多一个元素，相邻两个节点之间是对应的关系
+"""
+import heapq
+
+# 默认返回的路径条数
+DEFAULT_PATH_COUNT = 3
+
+
+# ==================== 路径索引 ====================
+class PathIndex:
+    """关系图的邻接索引，建好后只读，可在多个会话间共享"""
+
+    def __init__(self, snapshot):
+        self._ids = [node["id"] for node in snapshot["nodes"]]
+        self._index = dict(snapshot["node_index"])
+        type_ids = {}
+        type_counts = {}
+        # 节点序号 -> [(对端节点序号, 关系序号, 关系类型序号), ...]；出边和入边分开保存，按方向查找时只用出边
+        self._out = [[] for _ in self._ids]
+        self._in = [[] for _ in self._ids]
+        for rel_index, rel in enumerate(snapshot["relationships"]):
+            rel_type = rel.get("type", "")
+            type_id = type_ids.setdefault(rel_type, len(type_ids))
+            type_counts[rel_type] = type_counts.get(rel_type, 0) + 1
+            source, target = self._index[rel["source"]], self._index[rel["target"]]
+            self._out[source].append((target, rel_index, type_id))
+            self._in[target].append((source, rel_index, type_id))
+        self._type_ids = type_ids
+        # 不限方向时的邻接表：出边和入边合并
+        self._both = [out + incoming for out, incoming in zip(self._out, self._in)]
+        # 关系类型按出现次数降序，供界面列出筛选项
+        self.relationship_types = sorted(type_counts, key=lambda name: (-type_counts[name], name))
+
+    def __len__(self):
+        return len(self._ids)
+
+    def _allowed_types(self, rel_types):
+        """关系类型名称 -> 类型序号集合；None 表示不限类型"""
+        if not rel_types:
+            return None
+        return {self._type_ids[name] for name in rel_types if name in self._type_ids}
+
+    def shortest_path(self, source, target, rel_types=None, directed=False):
+        """两个节点之间的一条最短路径，不连通时返回 None"""
+        paths = self.k_shortest_paths(source, target, 1, rel_types, directed)
+        return paths[0] if paths else None
+
+    def k_shortest_paths(self, source, target, k=DEFAULT_PATH_COUNT, rel_types=None, directed=False):
+        """
+        按长度从短到长返回最多 k 条不重复经过节点的路径（Yen 算法）：
+        第 i 条路径的每个节点都作为分岔点，禁止走前面已有路径在该处的下一步，再从分岔点搜索到终点的最短路径
+        """
+        if source not in self._index or target not in self._index or k <= 0:
+            return []
+        start, goal = self._index[source], self._index[target]
+        if start == goal:
+            return [((source,), ())]
+        allowed = self._allowed_types(rel_types)
+        if allowed is not None and not allowed:
+            return []
+        forward, backward = (self._out, self._in) if directed else (self._both, self._both)
+
+        first = self._bidirectional_bfs(start, goal, forward, backward, allowed, frozenset(), frozenset())
+        if first is None:
+            return []
+        found = [first]
+        seen = {first[0]}
+        candidates = []   # 最小堆 (路径长度, 序号, 路径)，序号保证长度相同时按生成顺序
+        counter = 0
+        while len(found) < k:
+            nodes, rels = found[-1]
+            for spur_position in range(len(nodes) - 1):
+                root_nodes = nodes[:spur_position + 1]
+                # 与当前路径有相同前缀的已有路径，在分岔点的下一步都不能再走
+                banned_next = frozenset(path_nodes[spur_position + 1] for path_nodes, _ in found
+                                        if path_nodes[:spur_position + 1] == root_nodes)
+                spur = self._bidirectional_bfs(nodes[spur_position], goal, forward, backward, allowed,
+                                               frozenset(root_nodes[:-1]), banned_next)
+                if spur is None:
+                    continue
+                candidate = (root_nodes[:-1] + spur[0], rels[:spur_position] + spur[1])
+                if candidate[0] not in seen:
+                    seen.add(candidate[0])
+                    counter += 1
+                    heapq.heappush(candidates, (len(candidate[1]), counter, candidate))
+            if not candidates:
+                break
+            found.append(heapq.heappop(candidates)[2])
+
+        ids = self._ids
+        return [(tuple(ids[node] for node in nodes), rels) for nodes, rels in found]
+
+    def _bidirectional_bfs(self, start, goal, forward, backward, allowed, banned_nodes, banned_next):
+        """
+        双向广度优先搜索：每次扩展较小的一侧的一整层，两侧相遇后在本层所有相遇点中取总长度最短的；
+        banned_nodes 中的节点不可经过，banned_next 中的节点不可作为 start 的下一步。返回 (节点序号元组, 关系序号元组)
+        """
+        # 节点 -> (前一个节点, 关系序号, 距离)
+        forward_parent = {start: (None, None, 0)}
+        backward_parent = {goal: (None, None, 0)}
+        forward_frontier = [start]
+        backward_frontier = [goal]
+
+        while forward_frontier and backward_frontier:
+            expand_forward = len(forward_frontier) <= len(backward_frontier)
+            if expand_forward:
+                frontier, adjacency, parents, others = forward_frontier, forward, forward_parent, backward_parent
+            else:
+                frontier, adjacency, parents, others = backward_frontier, backward, backward_parent, forward_parent
+            next_frontier = []
+            best = None
+            for node in frontier:
+                depth = parents[node][2] + 1
+                for other, rel_index, type_id in adjacency[node]:
+                    if other in parents or other in banned_nodes:
+                        continue
+                    if allowed is not None and type_id not in allowed:
+                        continue
+                    # 分岔点的下一步限制：正向时是从 start 出发的边，反向时是到达 start 的边
+                    if (node == start and other in banned_next) or (other == start and node in banned_next):
+                        continue
+                    parents[other] = (node, rel_index, depth)
+                    if other in others:
+                        total = depth + others[other][2]
+                        if best is None or total < best[0]:
+                            best = (total, other)
+                    else:
+                        next_frontier.append(other)
+            if best is not None:
+                return self._join(best[1], forward_parent, backward_parent)
+            if expand_forward:
+                forward_frontier = next_frontier
+            else:
+                backward_frontier = next_frontier
+        return None
+
+    @staticmethod
+    def _join(meeting, forward_parent, backward_parent):
+        """由相遇点向两端回溯，拼出完整路径"""
+        nodes = [meeting]
+        rels = []
+        node = meeting
+        while forward_parent[node][0] is not None:
+            previous, rel_index, _ = forward_parent[node]
+            nodes.append(previous)
+            rels.append(rel_index)
+            node = previous
+        nodes.reverse()
+        rels.reverse()
+        node = meeting
+        while backward_parent[node][0] is not None:
+            following, rel_index, _ = backward_parent[node]
+            nodes.append(following)
+            rels.append(rel_index)
+            node = following
+        return tuple(nodes), tuple(rels)
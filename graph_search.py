@@ -0,0 +1,231 @@
+"""
+知识点全文检索
+在内存中为节点的 label、description 和 properties 中的所有值建立倒排索引：
+中文按相邻两字切分（bigram），单字也建索引以支持一个字的查询；英文和数字按整词（小写）切分。
+打分采用按字段加权的 BM25，名称完全匹配或包含查询词时额外加分。每个图谱版本只建一次索引；
+倒排表按得分降序保存，查询时用阈值算法取前 K 个结果，常见词也不必遍历完整的倒排表
+
+Neo4j 模式下可改用 Neo4jFullTextSearch：接口相同，由数据库的全文索引（cjk 分析器）完成检索
+"""
+import heapq
+import math
+import re
+
+# 各字段的权重：名称中出现的词比描述和属性中的更重要
+FIELD_WEIGHTS = {"label": 3.0, "description": 1.0, "properties": 1.0}
+# 名称与查询完全相同、名称包含查询时的额外得分
+LABEL_EXACT_BONUS = 10.0
+LABEL_CONTAINS_BONUS = 3.0
+# 名称包含查询词的节点不超过该数量时，在遍历倒排表之前先全部打分
+LABEL_PRESCORE_LIMIT = 256
+# 要求包含全部查询词时，最短的倒排表不超过该长度就直接逐个打分（结果很少时阈值算法无法提前结束）
+SHORT_POSTING_LIMIT = 1024
+# BM25 参数
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# 连续的中日韩文字，或连续的字母数字
+_TOKEN_RUN = re.compile(r"[\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff]+|[0-9a-zA-Z]+")
+
+
+def _is_cjk(run):
+    return not run[0].isascii()
+
+
+def tokenize(text, for_query=False):
+    """
+    切分文本：中文取相邻两字（bigram），英文数字取小写整词
+    建索引时中文同时保留单字；查询时只有单个汉字才按单字查询，两个字以上只用 bigram，结果更精确
+    """
+    tokens = []
+    for run in _TOKEN_RUN.findall(text or ""):
+        if not _is_cjk(run):
+            tokens.append(run.lower())
+            continue
+        if len(run) == 1 or not for_query:
+            tokens.extend(run)
+        tokens.extend(run[i:i + 2] for i in range(len(run) - 1))
+    return tokens
+
+
+def _property_text(properties):
+    """properties 可能是字典或 JSON 字符串，统一拼接为文本"""
+    if isinstance(properties, str):
+        return properties
+    return " ".join(str(value) for value in (properties or {}).values() if value)
+
+
+# ==================== 内存倒排索引 ====================
+class SearchIndex:
+    """节点全文检索的倒排索引，建好后只读，可在多个会话间共享"""
+
+    def __init__(self, nodes):
+        self._ids = []
+        self._labels = []
+        # 词 -> {节点序号: 该词在该节点中的 BM25 得分}（按节点查得分）
+        self._postings = {}
+        # 词 -> [(得分, 节点序号), ...]，按得分降序（查询时从高分开始遍历，凑够结果后提前结束）
+        self._ordered = {}
+        # 名称中的单字和相邻两字 -> 含有它的节点序号集合（找出名称包含查询词、需要加分的节点）
+        self._label_grams = {}
+        # 出现过的小写名称
+        self._exact_labels = set()
+
+        documents = []
+        for doc, node in enumerate(nodes):
+            fields = {
+                "label": node.get("label", ""),
+                "description": node.get("description", ""),
+                "properties": _property_text(node.get("properties")),
+            }
+            weighted_tf = {}
+            length = 0.0
+            for field, text in fields.items():
+                weight = FIELD_WEIGHTS[field]
+                for token in tokenize(text):
+                    weighted_tf[token] = weighted_tf.get(token, 0.0) + weight
+                    length += weight
+            label = fields["label"].lower()
+            for gram in set(label) | {label[i:i + 2] for i in range(len(label) - 1)}:
+                self._label_grams.setdefault(gram, set()).add(doc)
+            self._ids.append(node["id"])
+            self._labels.append(label)
+            self._exact_labels.add(label)
+            documents.append((weighted_tf, length))
+
+        n_docs = len(documents)
+        avg_length = sum(length for _, length in documents) / n_docs if n_docs else 0.0
+        document_frequency = {}
+        for weighted_tf, _ in documents:
+            for token in weighted_tf:
+                document_frequency[token] = document_frequency.get(token, 0) + 1
+
+        # 词项得分在建索引时算好，查询只做查表和求和
+        for doc, (weighted_tf, length) in enumerate(documents):
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * length / avg_length) if avg_length else BM25_K1
+            for token, tf in weighted_tf.items():
+                df = document_frequency[token]
+                idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                self._postings.setdefault(token, {})[doc] = idf * tf * (BM25_K1 + 1) / (tf + norm)
+        for token, posting in self._postings.items():
+            self._ordered[token] = sorted(((score, doc) for doc, score in posting.items()), reverse=True)
+
+    def __len__(self):
+        return len(self._ids)
+
+    @property
+    def vocabulary_size(self):
+        return len(self._postings)
+
+    def search(self, query, limit=10):
+        """返回 [(节点id, 得分), ...]：包含全部查询词的节点按得分降序排在前面，不足 limit 个时用只包含部分查询词的节点补足"""
+        tokens = list(dict.fromkeys(tokenize(query, for_query=True)))
+        if not tokens or limit <= 0:
+            return []
+        needle = query.strip().lower()
+        results = self._top_k(tokens, needle, limit, require_all=True)
+        if len(results) < limit and len(tokens) > 1:
+            found = {doc for _, doc in results}
+            partial = self._top_k(tokens, needle, limit, require_all=False)
+            results += [item for item in partial if item[1] not in found][:limit - len(results)]
+        return [(self._ids[doc], round(score, 4)) for score, doc in results]
+
+    def _label_matches(self, needle):
+        """名称包含 needle 的节点：先用 needle 中最少见的单字或相邻两字缩小范围，再逐个确认"""
+        grams = {needle[i:i + 2] for i in range(len(needle) - 1)} or set(needle)
+        candidates = min((self._label_grams.get(gram, ()) for gram in grams), key=len) if grams else ()
+        return [doc for doc in candidates if needle in self._labels[doc]]
+
+    def _top_k(self, tokens, needle, limit, require_all):
+        """
+        按得分取前 limit 个节点（阈值算法）：轮流按得分从高到低遍历各倒排表，对遇到的节点查表算出总分；
+        未遇到的节点得分不超过各表当前位置的得分之和，该上界不超过当前结果中的最低分时提前结束
+        """
+        terms = [token for token in tokens if token in self._postings]
+        if not terms or (require_all and len(terms) < len(tokens)):
+            return []
+        postings = [self._postings[token] for token in terms]
+        ordered = [self._ordered[token] for token in terms]
+        heap = []     # 最小堆 (得分, 节点序号)，保存当前的前 limit 个结果
+        seen = set()
+
+        def offer(doc):
+            seen.add(doc)
+            scores = [posting.get(doc) for posting in postings]
+            if require_all and None in scores:
+                return
+            total = sum(score for score in scores if score is not None)
+            if needle in self._labels[doc]:
+                total += LABEL_EXACT_BONUS if self._labels[doc] == needle else LABEL_CONTAINS_BONUS
+            item = (total, doc)
+            if len(heap) < limit:
+                heapq.heappush(heap, item)
+            elif item > heap[0]:
+                heapq.heapreplace(heap, item)
+
+        # 名称包含查询词的节点有额外加分：数量不多时先全部打分，上界就不必再计入加分
+        label_matches = self._label_matches(needle)
+        bonus_bound = 0.0
+        if len(label_matches) <= LABEL_PRESCORE_LIMIT:
+            for doc in label_matches:
+                offer(doc)
+        else:
+            bonus_bound = LABEL_EXACT_BONUS if needle in self._exact_labels else LABEL_CONTAINS_BONUS
+
+        shortest = min(ordered, key=len)
+        if require_all and len(shortest) <= SHORT_POSTING_LIMIT:
+            # 符合条件的节点一定在最短的倒排表中，表不长时直接逐个打分
+            for _, doc in shortest:
+                if doc not in seen:
+                    offer(doc)
+            return sorted(heap, reverse=True)
+
+        position = 0
+        while True:
+            bound = bonus_bound
+            exhausted = True
+            for entries in ordered:
+                if position < len(entries):
+                    exhausted = False
+                    score, doc = entries[position]
+                    bound += score
+                    if doc not in seen:
+                        offer(doc)
+            if exhausted or (len(heap) == limit and bound <= heap[0][0]):
+                break
+            position += 1
+
+        return sorted(heap, reverse=True)
+
+
+# ==================== Neo4j 全文索引 ====================
+# Lucene 查询语法中的特殊字符，查询前转义，用户输入按普通文本处理
+_LUCENE_SPECIAL = re.compile(r'([+\-!(){}\[\]^"~*?:\\/]|&&|\|\|)')
+
+
+class Neo4jFullTextSearch:
+    """与 SearchIndex 接口相同的检索，由 Neo4j 全文索引完成（节点的 label、description、properties）"""
+
+    def __init__(self, conn, node_label, index_name):
+        self.conn = conn
+        self.node_label = node_label
+        self.index_name = index_name
+
+    def ensure_index(self):
+        """创建全文索引（已存在时跳过），使用 cjk 分析器按中文 bigram 切分"""
+        self.conn.execute_write(
+            f"CREATE FULLTEXT INDEX {self.index_name} IF NOT EXISTS "
+            f"FOR (n:{self.node_label}) ON EACH [n.label, n.description, n.properties] "
+            "OPTIONS {indexConfig: {`fulltext.analyzer`: 'cjk'}}"
+        )
+
+    def search(self, query, limit=10):
+        query = _LUCENE_SPECIAL.sub(r"\\\1", query.strip())
+        if not query:
+            return []
+        rows = self.conn.execute_query(
+            "CALL db.index.fulltext.queryNodes($index, $query) YIELD node, score "
+            "RETURN node.id AS id, score ORDER BY score DESC LIMIT $limit",
+            {"index": self.index_name, "query": query, "limit": limit},
+        )
+        return [(row["id"], round(row["score"], 4)) for row in rows]
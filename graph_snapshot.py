@@ -0,0 +1,225 @@
+"""
+知识图谱编译快照
+流式读取并校验 国际法知识图谱.json（缺字段、重复节点、端点不存在的关系等），并编译为二进制快照（pickle）：
+紧凑的节点和关系对象（graph_compact，字符串全图共享）、每个核心问题的2级邻域子图（整数序号数组）、
+解析好的节点样式和内容哈希。
+应用启动时直接加载快照（毫秒级）；源文件的修改时间、大小或样式配置变化时自动重新编译
+
+命令行：python graph_snapshot.py [JSON文件] [--check]
+"""
+import argparse
+import os
+import pickle
+import sys
+import time
+from array import array
+from collections.abc import Mapping
+from types import MappingProxyType
+
+from graph_compact import GraphBuilder, load_graph_file
+
+# 快照格式版本，编译逻辑变化时递增，旧快照自动失效
+SNAPSHOT_FORMAT = 2
+
+
+def snapshot_path_for(json_path):
+    """快照文件与源文件放在同一目录：xxx.json -> xxx.snapshot.pkl"""
+    return os.path.splitext(json_path)[0] + ".snapshot.pkl"
+
+
+def version_of(snapshot):
+    """图谱版本：内容哈希前12位"""
+    return snapshot.get("content_hash", "")[:12]
+
+
+def freeze(value):
+    """
+    递归转换 dict -> MappingProxyType、list -> tuple，进程内所有会话共享同一份图谱而不复制；
+    紧凑节点、关系和序号数组（array）原样保留，它们仍可被修改，只是约定只读
+    """
+    if isinstance(value, (dict, MappingProxyType)):
+        return MappingProxyType({key: freeze(item) for key, item in value.items()})
+    if isinstance(value, (list, tuple)):
+        return tuple(freeze(item) for item in value)
+    return value
+
+
+def thaw(value):
+    """freeze 的逆操作：转换为普通 dict / list（紧凑节点、关系和序号数组也一样），用于 JSON 序列化或写入数据库"""
+    if isinstance(value, Mapping):
+        return {key: thaw(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple, array)):
+        return [thaw(item) for item in value]
+    return value
+
+
+# ==================== 校验 ====================
+def validate_graph(data):
+    """
+    校验图谱数据，返回 (节点列表, 关系列表, 问题列表)，节点和关系为 graph_compact 的紧凑对象
+    无法使用的节点和关系会被剔除（而不是留给 Neo4j MATCH 静默丢弃或让 pyvis 报错），问题列表说明原因
+    """
+    return GraphBuilder().feed_dict(data).finish()
+
+
+# ==================== 编译 ====================
+def _neighborhood(question_index, neighbors, max_depth=2):
+    """核心问题的 max_depth 级邻域（双向，按层广度优先），节点序号集合"""
+    members = {question_index}
+    frontier = [question_index]
+    for _ in range(max_depth):
+        next_frontier = []
+        for node in frontier:
+            for other in neighbors[node]:
+                if other not in members:
+                    members.add(other)
+                    next_frontier.append(other)
+        frontier = next_frontier
+    return members
+
+
+def _children_map(relationships):
+    """source -> [target, ...]，供拖动核心问题时子节点跟随移动"""
+    children = {}
+    for rel in relationships:
+        children.setdefault(rel.source, []).append(rel.target)
+    return children
+
+
+def compile_graph(data, resolve_style, content_hash="", style_hash=""):
+    """
+    把图谱数据（已解析的字典）编译为快照字典
+    快照包含原有的 metadata / nodes / relationships 键，可直接当作图谱数据使用；
+    resolve_style(node) -> (颜色, 大小)
+    """
+    return compile_builder(GraphBuilder().feed_dict(data), resolve_style, content_hash, style_hash)
+
+
+def compile_builder(builder, resolve_style, content_hash="", style_hash=""):
+    """把已接收全部节点和关系的 GraphBuilder 编译为快照字典"""
+    nodes, relationships, issues = builder.finish()
+    node_index = builder.node_index
+
+    # 邻接只在编译时使用：节点序号 -> 相邻节点序号
+    neighbors = [array("I") for _ in nodes]
+    for rel in relationships:
+        source, target = node_index[rel.source], node_index[rel.target]
+        neighbors[source].append(target)
+        neighbors[target].append(source)
+
+    core_questions = sorted(node.id for node in nodes if node.level == 1 and node.category == "核心问题")
+
+    # 每个核心问题的2级邻域子图：节点和关系都保持源文件中的顺序，序号用紧凑的整数数组保存
+    question_subgraphs = {}
+    for question_id in core_questions:
+        members = _neighborhood(node_index[question_id], neighbors)
+        sub_relationships = array("I", (index for index, rel in enumerate(relationships)
+                                        if node_index[rel.source] in members and node_index[rel.target] in members))
+        question_subgraphs[question_id] = {
+            "nodes": array("I", sorted(members)),
+            "relationships": sub_relationships,
+            "node_children": _children_map(relationships[index] for index in sub_relationships),
+        }
+    del neighbors
+
+    # 样式保存在节点的 style 字段上，相同的 (颜色, 大小) 只保存一份
+    style_table = {}
+    for node in nodes:
+        style = resolve_style(node)
+        node.style = style_table.setdefault(style, style)
+
+    return {
+        "format": SNAPSHOT_FORMAT,
+        "content_hash": content_hash,
+        "style_hash": style_hash,
+        "compiled_at": time.time(),
+        "metadata": builder.metadata,
+        "nodes": nodes,
+        "relationships": relationships,
+        "node_index": node_index,
+        "core_questions": core_questions,
+        "question_subgraphs": question_subgraphs,
+        "node_children": _children_map(relationships),
+        "issues": issues,
+    }
+
+
+def write_snapshot(snapshot, snapshot_path):
+    """原子写入快照（先写临时文件再改名）"""
+    tmp_path = f"{snapshot_path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(snapshot, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, snapshot_path)
+
+
+def read_snapshot(snapshot_path):
+    try:
+        with open(snapshot_path, "rb") as f:
+            return pickle.load(f)
+    except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ValueError):
+        return None
+
+
+def build_snapshot(json_path, resolve_style, style_hash="", snapshot_path=None):
+    """流式读取源文件并编译、写入快照"""
+    snapshot_path = snapshot_path or snapshot_path_for(json_path)
+    stat = os.stat(json_path)
+    builder, content_hash = load_graph_file(json_path)
+    snapshot = compile_builder(builder, resolve_style, content_hash, style_hash)
+    snapshot["source_mtime_ns"] = stat.st_mtime_ns
+    snapshot["source_size"] = stat.st_size
+    try:
+        write_snapshot(snapshot, snapshot_path)
+    except OSError:
+        # 目录只读时仍然返回编译结果，只是下次启动需要重新编译
+        pass
+    return snapshot
+
+
+def load_snapshot(json_path, resolve_style, style_hash="", snapshot_path=None):
+    """加载快照；快照不存在、格式过期、源文件修改时间或大小变化、样式配置变化时重新编译"""
+    snapshot_path = snapshot_path or snapshot_path_for(json_path)
+    stat = os.stat(json_path)
+    snapshot = read_snapshot(snapshot_path)
+    if (snapshot
+            and snapshot.get("format") == SNAPSHOT_FORMAT
+            and snapshot.get("style_hash") == style_hash
+            and snapshot.get("source_mtime_ns") == stat.st_mtime_ns
+            and snapshot.get("source_size") == stat.st_size):
+        return snapshot
+    return build_snapshot(json_path, resolve_style, style_hash, snapshot_path)
+
+
+# ==================== 命令行 ====================
+def main():
+    parser = argparse.ArgumentParser(description="校验并编译知识图谱快照")
+    parser.add_argument("json_path", nargs="?", help="知识图谱JSON文件（默认使用主程序配置的文件）")
+    parser.add_argument("--check", action="store_true", help="只校验，不写快照；有错误时返回非零退出码")
+    args = parser.parse_args()
+
+    # 样式配置以主程序为准，快照中的样式与运行时完全一致
+    import gjf_graph_main as app
+    json_path = args.json_path or app.JSON_FILE_PATH
+
+    start = time.perf_counter()
+    if args.check:
+        builder, content_hash = load_graph_file(json_path)
+        snapshot = compile_builder(builder, app.node_style, content_hash, app.STYLE_HASH)
+    else:
+        snapshot = build_snapshot(json_path, app.node_style, app.STYLE_HASH)
+    elapsed = time.perf_counter() - start
+
+    for issue in snapshot["issues"]:
+        print(f"{'❌' if issue['level'] == 'error' else '⚠️'} {issue['message']}")
+    print(f"节点 {len(snapshot['nodes'])} 个，关系 {len(snapshot['relationships'])} 条，"
+          f"核心问题 {len(snapshot['core_questions'])} 个，内容哈希 {snapshot['content_hash'][:12]}，"
+          f"编译耗时 {elapsed * 1000:.1f} ms")
+    if not args.check:
+        print(f"✅ 快照已写入 {snapshot_path_for(json_path)}")
+
+    if args.check and any(issue["level"] == "error" for issue in snapshot["issues"]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
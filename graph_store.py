@@ -0,0 +1,101 @@
+"""
+知识图谱热更新
+进程内共享当前的图谱快照（graph_snapshot.freeze 后的结构，所有会话直接读取同一份，不复制，约定只读）；每次访问时按间隔检查源文件（修改时间和大小），变化后在后台线程中
+比对内容哈希、重新编译，完成后原子替换。重新编译期间所有会话继续使用旧图谱，同一时间只有一个编译线程，
+不会因为大量会话同时发现文件变化而重复编译；下游的渲染缓存以 version 为键，替换后自动失效，
+on_reload(新快照) 在替换前由同一后台线程调用，用于预热新版本的渲染缓存；
+thread_hook(线程) 在后台线程启动前调用（如 Streamlit 的 add_script_run_ctx，使线程中可以调用缓存函数）
+"""
+import os
+import threading
+import time
+
+import graph_snapshot
+from graph_compact import file_hash
+
+
+class GraphStore:
+    """当前图谱快照的持有者，version 为内容哈希前12位"""
+
+    def __init__(self, json_path, resolve_style, style_hash, snapshot_path=None, check_interval=2.0,
+                 on_reload=None, thread_hook=None):
+        self.json_path = json_path
+        self.resolve_style = resolve_style
+        self.style_hash = style_hash
+        self.snapshot_path = snapshot_path or graph_snapshot.snapshot_path_for(json_path)
+        self.check_interval = check_interval
+        self.on_reload = on_reload
+        self.thread_hook = thread_hook
+        self.last_error = None
+        self.reloaded_at = None
+        self._lock = threading.Lock()
+        self._rebuilding = False
+        self._last_check = 0.0
+
+        try:
+            self._snapshot = graph_snapshot.freeze(
+                graph_snapshot.load_snapshot(json_path, resolve_style, style_hash, self.snapshot_path))
+            self._stat = (self._snapshot["source_mtime_ns"], self._snapshot["source_size"])
+        except Exception as e:
+            # 启动时源文件不可用：先使用空图谱，下次检查时重新加载
+            self._snapshot = graph_snapshot.freeze(graph_snapshot.compile_graph({}, resolve_style, style_hash=style_hash))
+            self._stat = None
+            self.last_error = f"{type(e).__name__}: {e}"
+
+    @property
+    def version(self):
+        return graph_snapshot.version_of(self._snapshot)
+
+    def get(self):
+        """返回当前快照；到了检查间隔时顺带检查源文件是否变化（只做一次 stat，变化后在后台重新编译）"""
+        now = time.monotonic()
+        if now - self._last_check >= self.check_interval:
+            self._last_check = now
+            self._check()
+        return self._snapshot
+
+    def _check(self):
+        try:
+            stat = os.stat(self.json_path)
+        except OSError as e:
+            self.last_error = f"无法读取源文件: {e}"
+            return
+        current = (stat.st_mtime_ns, stat.st_size)
+        if current == self._stat:
+            return
+        with self._lock:
+            if self._rebuilding or current == self._stat:
+                return
+            self._rebuilding = True
+        thread = threading.Thread(target=self._rebuild, args=(current,), name="graph-reload", daemon=True)
+        if self.thread_hook:
+            self.thread_hook(thread)
+        thread.start()
+
+    def _rebuild(self, stat):
+        try:
+            content_hash = file_hash(self.json_path)
+            if content_hash == self._snapshot.get("content_hash"):
+                # 只是修改时间变化（如重新保存了相同内容），无需重新编译
+                self._stat = stat
+                return
+            snapshot = graph_snapshot.freeze(graph_snapshot.build_snapshot(
+                self.json_path, self.resolve_style, self.style_hash, self.snapshot_path))
+            if self.on_reload:
+                # 替换前先预热，切换到新版本后的第一次访问即可命中缓存；预热失败不影响替换
+                try:
+                    self.on_reload(snapshot)
+                except Exception:
+                    pass
+            # 引用赋值是原子的：正在渲染的会话继续使用旧快照，之后的访问拿到新快照
+            self._snapshot = snapshot
+            self._stat = (snapshot["source_mtime_ns"], snapshot["source_size"])
+            self.reloaded_at = time.time()
+            self.last_error = None
+        except Exception as e:
+            # 文件正在被编辑或内容有误时保留旧图谱；文件再次变化时会重新尝试
+            self._stat = stat
+            self.last_error = f"{type(e).__name__}: {e}"
+        finally:
+            with self._lock:
+                self._rebuilding = False
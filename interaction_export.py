@@ -0,0 +1,124 @@
+"""
+交互记录导出
+逐条读取（Neo4j 游标或本地缓冲文件）并分块写入 CSV / JSONL（可选 gzip）文件，
+内存占用与历史记录总量无关；生成的文件保存在服务器本地的导出目录（不经静态文件服务公开），
+只能在管理端通过下载按钮获取：点击下载时才从磁盘读取，下载地址只对当前会话有效。
+下载按钮需要把整个文件读入内存，超过大小上限的文件不提供下载按钮，需由管理员直接从导出目录获取
+"""
+import csv
+import gzip
+import json
+import os
+import secrets
+import time
+
+# 导出字段（固定顺序）
+EXPORT_FIELDS = ["id", "student_id", "node_id", "node_label", "action_type", "count", "duration", "timestamp"]
+
+# 可选导出格式：显示名称 -> (格式, 是否gzip压缩)
+EXPORT_FORMATS = {
+    "CSV": ("csv", False),
+    "CSV (gzip)": ("csv", True),
+    "JSONL": ("jsonl", False),
+    "JSONL (gzip)": ("jsonl", True),
+}
+
+# 导出文件的 MIME 类型
+EXPORT_MIME_TYPES = {"csv": "text/csv", "jsonl": "application/x-ndjson"}
+
+# 每写入多少条刷新一次缓冲区
+EXPORT_CHUNK_SIZE = 5000
+# 导出文件保留时长（秒），过期自动删除
+EXPORT_TTL_SECONDS = 3600
+
+
+def filter_events(events, start=None, end=None, student_ids=None):
+    """按时间范围 [start, end) 和学生过滤（start/end 为 ISO 格式字符串）"""
+    student_ids = set(student_ids) if student_ids else None
+    for event in events:
+        timestamp = str(event.get("timestamp", ""))
+        if start and timestamp < start:
+            continue
+        if end and timestamp >= end:
+            continue
+        if student_ids is not None and event.get("student_id") not in student_ids:
+            continue
+        yield event
+
+
+def export_interactions(rows, directory, format_name):
+    """把记录迭代器写入导出目录，返回 (文件名, 写入条数)；先写临时文件，完成后再改名"""
+    fmt, compress = EXPORT_FORMATS[format_name]
+    os.makedirs(directory, exist_ok=True)
+    file_name = f"interactions_{time.strftime('%Y%m%d_%H%M%S')}_{secrets.token_urlsafe(12)}.{fmt}"
+    if compress:
+        file_name += ".gz"
+    path = os.path.join(directory, file_name)
+    tmp_path = path + ".tmp"
+
+    # CSV 带 BOM，方便用 Excel 直接打开中文内容
+    encoding = "utf-8-sig" if fmt == "csv" else "utf-8"
+    if compress:
+        f = gzip.open(tmp_path, "wt", encoding=encoding, newline="")
+    else:
+        f = open(tmp_path, "w", encoding=encoding, newline="")
+
+    count = 0
+    try:
+        with f:
+            if fmt == "csv":
+                writer = csv.DictWriter(f, fieldnames=EXPORT_FIELDS, extrasaction="ignore")
+                writer.writeheader()
+                write_row = writer.writerow
+            else:
+                def write_row(row):
+                    f.write(json.dumps({k: row.get(k) for k in EXPORT_FIELDS}, ensure_ascii=False) + "\n")
+            for row in rows:
+                write_row(row)
+                count += 1
+                if count % EXPORT_CHUNK_SIZE == 0:
+                    f.flush()
+        os.replace(tmp_path, path)
+    except Exception:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return file_name, count
+
+
+def export_mime_type(file_name):
+    if file_name.endswith(".gz"):
+        return "application/gzip"
+    return EXPORT_MIME_TYPES.get(file_name.rsplit(".", 1)[-1], "application/octet-stream")
+
+
+def read_export(directory, file_name, max_bytes):
+    """读取导出文件的内容（下载按钮被点击时调用）；文件名只能是导出目录中的文件，超过 max_bytes 时拒绝读取"""
+    if os.path.basename(file_name) != file_name:
+        raise ValueError(f"无效的导出文件名：{file_name}")
+    with open(os.path.join(directory, file_name), "rb") as f:
+        data = f.read(max_bytes + 1)
+    if len(data) > max_bytes:
+        raise ValueError(f"导出文件超过 {max_bytes // (1024 * 1024)} MB，请直接从导出目录获取：{file_name}")
+    return data
+
+
+def remove_export(directory, file_name):
+    try:
+        os.remove(os.path.join(directory, file_name))
+    except OSError:
+        pass
+
+
+def cleanup_exports(directory, max_age_seconds=EXPORT_TTL_SECONDS):
+    """删除过期的导出文件"""
+    if not os.path.isdir(directory):
+        return
+    now = time.time()
+    for name in os.listdir(directory):
+        path = os.path.join(directory, name)
+        try:
+            if os.path.isfile(path) and now - os.path.getmtime(path) > max_age_seconds:
+                os.remove(path)
+        except OSError:
+            pass
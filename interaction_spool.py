@@ -0,0 +1,354 @@
+"""
+交互记录本地缓冲区（store-and-forward）
+所有交互先追加写入本地 JSONL 文件，再由后台线程按高水位标记批量同步到 Neo4j
+Neo4j 不可用期间产生的记录会在连接恢复后自动补写，重复补写不会产生重复数据
+同一条记录被合并更新时以相同 id 再次追加，读取和同步时以最后一次为准
+"""
+import json
+import os
+import threading
+import time
+from datetime import datetime, timedelta
+
+import perf_metrics
+
+# 每批同步到Neo4j的记录数
+SPOOL_BATCH_SIZE = 500
+# 后台同步间隔（秒），连接失败时按指数退避，最长 SPOOL_MAX_BACKOFF 秒
+SPOOL_SYNC_INTERVAL = 5.0
+SPOOL_MAX_BACKOFF = 60.0
+
+
+# ==================== 本地缓冲文件 ====================
+def _fold_by_id(events):
+    """同一 id 的多次更新折叠为最后一次，保留首次出现的顺序"""
+    latest = {}
+    for event in events:
+        latest[event.get("id")] = event
+    return list(latest.values())
+
+
+def _legacy_id(event, idx):
+    """旧版记录的 id：{学生}_{节点}_{%Y%m%d%H%M%S%f}，与旧版写入 Neo4j 时的格式相同；时间无法解析时按序号生成"""
+    try:
+        stamp = datetime.fromisoformat(event["timestamp"]).strftime("%Y%m%d%H%M%S%f")
+    except (KeyError, TypeError, ValueError):
+        stamp = f"legacy{idx}"
+    return f"{event.get('student_id', '')}_{event.get('node_id', '')}_{stamp}"
+
+
+class InteractionSpool:
+    """追加写入的交互记录文件，配合 .hwm 文件记录已同步到的字节偏移"""
+
+    def __init__(self, spool_path, legacy_path=None):
+        self.spool_path = spool_path
+        self.hwm_path = spool_path + ".hwm"
+        self._lock = threading.Lock()
+        if legacy_path:
+            self._migrate_legacy(legacy_path)
+
+    def _migrate_legacy(self, legacy_path):
+        """
+        将旧版 JSON 数组格式的记录导入缓冲文件，高水位保持在导入前的位置，由同步线程补写到 Neo4j：
+        Neo4j 中断期间只写入了本地文件的记录也能同步上去。
+        旧版本地文件的时间只精确到秒，而写入 Neo4j 的 id 带微秒，无法按 id 对上；导入的记录带 legacy_rank
+        （同一学生同一节点同一秒内的第几条），同步时按（学生，节点，秒）统计 Neo4j 中已有的记录数，
+        只补写超出部分，当时已写入 Neo4j 的记录不会重复
+        """
+        if os.path.exists(self.spool_path) or not os.path.exists(legacy_path):
+            return
+        try:
+            with open(legacy_path, "r", encoding="utf-8") as f:
+                legacy = json.load(f)
+        except Exception:
+            return
+        lines, seen, ranks = [], set(), {}
+        for idx, item in enumerate(legacy):
+            event = dict(item)
+            event["timestamp"] = str(event.get("timestamp", "")).replace(" ", "T")
+            key = (event.get("student_id"), event.get("node_id"), event["timestamp"])
+            event["legacy_rank"] = ranks.get(key, 0)
+            ranks[key] = event["legacy_rank"] + 1
+            if "id" not in event:
+                event["id"] = _legacy_id(event, idx)
+                # 同一秒内同一学生查看同一节点的多条记录，旧格式的 id 相同，按序号区分
+                if event["id"] in seen:
+                    event["id"] = f"{event['id']}_{idx}"
+            seen.add(event["id"])
+            lines.append(json.dumps(event, ensure_ascii=False) + "\n")
+        with self._lock:
+            with open(self.spool_path, "w", encoding="utf-8") as f:
+                f.writelines(lines)
+                f.flush()
+                os.fsync(f.fileno())
+            self._write_hwm(0)
+
+    def append(self, event):
+        """追加一条记录并落盘"""
+        line = (json.dumps(event, ensure_ascii=False) + "\n").encode("utf-8")
+        with self._lock:
+            with open(self.spool_path, "ab") as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+
+    def read_all(self):
+        """读取全部记录（已按 id 折叠）"""
+        events, _ = self._read_from(0)
+        return _fold_by_id(events)
+
+    def read_since(self, offset):
+        """读取字节偏移 offset 之后的记录（已按 id 折叠），返回 (记录列表, 读取结束处的字节偏移)"""
+        events, end_offset = self._read_from(offset)
+        return _fold_by_id(events), end_offset
+
+    def size(self):
+        """缓冲文件当前的字节数"""
+        return os.path.getsize(self.spool_path) if os.path.exists(self.spool_path) else 0
+
+    def read_unsynced(self, max_events=SPOOL_BATCH_SIZE):
+        """读取高水位之后的记录，返回 (记录列表, 读取结束处的字节偏移)"""
+        offset = self.get_hwm()
+        # 缓冲文件被外部替换或截断时，从头重新同步（MERGE 保证不会重复）
+        if os.path.exists(self.spool_path) and offset > os.path.getsize(self.spool_path):
+            offset = 0
+        return self._read_from(offset, max_events)
+
+    def pending_bytes(self):
+        """尚未同步到Neo4j的字节数，只比较文件大小和高水位，不读取记录（缓冲文件被截断时全部待同步）"""
+        size, offset = self.size(), self.get_hwm()
+        return size if offset > size else size - offset
+
+    def pending_count(self):
+        """尚未同步到Neo4j的记录数（需要解析高水位之后的全部记录）"""
+        events, _ = self.read_unsynced(max_events=None)
+        return len(events)
+
+    def iter_events(self, horizon_seconds):
+        """
+        逐行流式读取全部记录并按 id 折叠，内存中只保留最近 horizon_seconds 内仍可能被合并更新的记录
+        超出该时间才到达的更新会作为同 id 的另一行输出（下游按 id 取最后一行即可）
+        """
+        pending = {}
+        for event, _ in self._iter_from(0):
+            event_id = event.get("id")
+            if event_id in pending:
+                pending[event_id] = event
+                continue
+            pending[event_id] = event
+            # 新记录按时间顺序追加，比它早 horizon 以上的记录不会再被更新，可以先输出
+            try:
+                cutoff = (datetime.fromisoformat(event["timestamp"]) - timedelta(seconds=horizon_seconds)).isoformat()
+            except (KeyError, TypeError, ValueError):
+                continue
+            while pending:
+                first_id = next(iter(pending))
+                if str(pending[first_id].get("timestamp", "")) >= cutoff:
+                    break
+                yield pending.pop(first_id)
+        yield from pending.values()
+
+    def _iter_from(self, offset):
+        """从字节偏移 offset 开始逐行读取，产出 (记录, 该行之后的字节偏移)"""
+        if not os.path.exists(self.spool_path):
+            return
+        with open(self.spool_path, "rb") as f:
+            f.seek(offset)
+            for raw in f:
+                # 最后一行可能是写入中途的半行，留到下次读取
+                if not raw.endswith(b"\n"):
+                    break
+                offset += len(raw)
+                try:
+                    yield json.loads(raw), offset
+                except ValueError:
+                    continue
+
+    def _read_from(self, offset, max_events=None):
+        events = []
+        for event, end_offset in self._iter_from(offset):
+            events.append(event)
+            offset = end_offset
+            if max_events and len(events) >= max_events:
+                break
+        return events, offset
+
+    def get_hwm(self):
+        try:
+            with open(self.hwm_path, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except (OSError, ValueError):
+            return 0
+
+    def set_hwm(self, offset):
+        with self._lock:
+            self._write_hwm(offset)
+
+    def _write_hwm(self, offset):
+        # 先写临时文件再替换，避免中途崩溃留下损坏的高水位
+        tmp_path = self.hwm_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(str(offset))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.hwm_path)
+
+    def clear(self):
+        """删除缓冲文件及高水位，返回是否删除了文件"""
+        with self._lock:
+            existed = os.path.exists(self.spool_path)
+            for path in (self.spool_path, self.hwm_path):
+                if os.path.exists(path):
+                    os.remove(path)
+            return existed
+
+
+# ==================== 服务端合并 ====================
+class InteractionCoalescer:
+    """同一学生在窗口期内重复查看同一节点时，合并为一条记录并累加次数和停留时长"""
+
+    def __init__(self, window_seconds, retain_seconds=None):
+        self.window = window_seconds
+        # 停留时长在下一次点击时才上报，已关闭窗口的记录需要多保留一段时间以便补记时长
+        self.retain = max(retain_seconds or 0, window_seconds)
+        self._open = {}
+        self._last_sweep = 0.0
+        self._lock = threading.Lock()
+
+    def merge(self, event, now=None):
+        """返回需要写入缓冲区的记录：新记录原样返回，合并时返回更新后的同 id 记录"""
+        if self.window <= 0:
+            return event
+        now = time.time() if now is None else now
+        key = (event["student_id"], event["node_id"])
+        with self._lock:
+            self._sweep(now)
+            entry = self._open.get(key)
+            # count 为 0 的记录只携带停留时长，总是并入该节点最近一次的记录
+            if entry and (event["count"] == 0 or now - entry[1] <= self.window):
+                merged = entry[0]
+                merged["count"] += event["count"]
+                merged["duration"] = round(merged["duration"] + event["duration"], 1)
+                entry[2] = now
+                return dict(merged)
+            if event["count"] > 0:
+                self._open[key] = [dict(event), now, now]
+            return event
+
+    def _sweep(self, now):
+        if now - self._last_sweep < self.window:
+            return
+        self._last_sweep = now
+        expired = [key for key, entry in self._open.items() if now - entry[2] > self.retain]
+        for key in expired:
+            del self._open[key]
+
+
+# ==================== 后台同步线程 ====================
+class SpoolReplayer:
+    """后台线程：把缓冲区中未同步的记录以幂等的 UNWIND … MERGE 批量写入Neo4j"""
+
+    def __init__(self, spool, conn_factory, target_label, on_connect=None):
+        self.spool = spool
+        self.conn_factory = conn_factory
+        self.target_label = target_label
+        self.on_connect = on_connect
+        self.last_error = None
+        self.last_sync_time = None
+        self._conn = None
+        self._wake = threading.Event()
+        self._sync_lock = threading.Lock()
+        self._thread = threading.Thread(target=self._run, name="interaction-spool-replayer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+        return self
+
+    def wake(self):
+        """通知后台线程立即同步"""
+        self._wake.set()
+
+    def _run(self):
+        backoff = SPOOL_SYNC_INTERVAL
+        while True:
+            self._wake.wait(backoff)
+            self._wake.clear()
+            try:
+                self.sync_once()
+                backoff = SPOOL_SYNC_INTERVAL
+            except Exception as e:
+                self.last_error = str(e)
+                self._drop_connection()
+                backoff = min(backoff * 2, SPOOL_MAX_BACKOFF)
+
+    def _get_connection(self):
+        if self._conn is None:
+            conn = self.conn_factory()
+            if not conn.driver:
+                raise ConnectionError("Neo4j 不可用")
+            if self.on_connect:
+                self.on_connect(conn)
+            self._conn = conn
+        return self._conn
+
+    def _drop_connection(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def sync_once(self):
+        """同步全部未同步记录，返回本次写入的记录数"""
+        with self._sync_lock:
+            synced = 0
+            events, end_offset = self.spool.read_unsynced()
+            if not events and end_offset == self.spool.get_hwm():
+                return 0
+            try:
+                conn = self._get_connection()
+                while events or end_offset != self.spool.get_hwm():
+                    if events:
+                        legacy = [event for event in events if "legacy_rank" in event]
+                        current = [event for event in events if "legacy_rank" not in event]
+                        if legacy:
+                            conn.execute_write(self._legacy_merge_query(), {"events": legacy})
+                        if current:
+                            conn.execute_write(self._merge_query(), {"events": current})
+                        synced += len(events)
+                        perf_metrics.increment("interactions_recorded_total", len(events), backend="neo4j")
+                    self.spool.set_hwm(end_offset)
+                    events, end_offset = self.spool.read_unsynced()
+            except Exception:
+                # 本批记录仍留在缓冲区中，稍后重试
+                perf_metrics.increment("interactions_failed_total", len(events), backend="neo4j")
+                raise
+            self.last_error = None
+            self.last_sync_time = time.time()
+            return synced
+
+    def _merge_query(self):
+        return f"""
+        UNWIND $events AS e
+        {self._merge_clause()}
+        """
+
+    def _legacy_merge_query(self):
+        """旧版导入的记录：同一学生同一节点同一秒内 Neo4j 中已有的记录数超过 legacy_rank 时跳过"""
+        return f"""
+        UNWIND $events AS e
+        OPTIONAL MATCH (old:Interaction_{self.target_label} {{student_id: e.student_id, node_id: e.node_id}})
+        WHERE datetime.truncate('second', old.timestamp) = datetime(e.timestamp)
+        WITH e, count(old) AS existing
+        WHERE existing <= e.legacy_rank
+        {self._merge_clause()}
+        """
+
+    def _merge_clause(self):
+        return f"""MERGE (i:Interaction_{self.target_label} {{id: e.id}})
+        ON CREATE SET i.student_id = e.student_id,
+                      i.node_id = e.node_id,
+                      i.node_label = e.node_label,
+                      i.action_type = e.action_type,
+                      i.timestamp = datetime(e.timestamp)
+        SET i.count = coalesce(e.count, 1),
+            i.duration = e.duration,
+            i.synced_at = datetime()"""
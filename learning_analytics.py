@@ -0,0 +1,212 @@
+"""
+学习行为分析（向量化实现）
+对全部交互记录做会话切分、节点跳转统计和核心问题子树覆盖率统计
+所有计算都基于 pandas/NumPy 的整列运算，不逐条遍历交互记录
+"""
+import numpy as np
+import pandas as pd
+
+# 同一学生相邻两次访问间隔超过该值（分钟）即视为新的学习会话
+SESSION_GAP_MINUTES = 30
+
+
+# ==================== 数据整理 ====================
+def _unique_counts(values):
+    """排序去重并计数（整数数组上比 np.unique 的哈希实现更快）"""
+    values = np.sort(values)
+    if len(values) == 0:
+        return values, np.zeros(0, dtype=np.int64)
+    starts = np.flatnonzero(np.r_[True, values[1:] != values[:-1]])
+    return values[starts], np.diff(np.r_[starts, len(values)])
+
+
+def prepare_events(interactions):
+    """把交互记录整理为分析用的DataFrame：解析时间、类别编码，并按（学生, 时间）排序"""
+    df = interactions if isinstance(interactions, pd.DataFrame) else pd.DataFrame(interactions)
+    if df.empty:
+        return pd.DataFrame(columns=["student_id", "node_id", "node_label", "timestamp", "count", "duration"])
+
+    # 统一转换为 UTC 后去掉时区，排序和取数都按 datetime64[ns] 整数进行
+    timestamps = pd.to_datetime(df["timestamp"], format="ISO8601", utc=True, errors="coerce").dt.tz_localize(None)
+    events = pd.DataFrame({
+        "student_id": df["student_id"].astype("category"),
+        "node_id": df["node_id"].astype("category"),
+        "node_label": df["node_label"].astype("category"),
+        "timestamp": timestamps,
+        "count": df["count"].fillna(1).to_numpy(dtype=np.int64) if "count" in df.columns else 1,
+        "duration": pd.to_numeric(df["duration"], errors="coerce").fillna(0).to_numpy() if "duration" in df.columns else 0.0,
+    })
+    if timestamps.isna().any():
+        events = events[timestamps.notna().to_numpy()]
+
+    # 两次稳定排序：先按时间（记录本身基本有序，timsort 接近线性），再按学生编码（基数排序）
+    times = events["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    order = np.argsort(times, kind="stable")
+    order = order[np.argsort(events["student_id"].cat.codes.to_numpy()[order], kind="stable")]
+    return events.take(order).reset_index(drop=True)
+
+
+# ==================== 会话切分 ====================
+def sessionize(events, gap_minutes=SESSION_GAP_MINUTES):
+    """按时间间隔切分学习会话，返回带 session_id 列的记录（输入需为 prepare_events 的结果）"""
+    events = events.copy()
+    if events.empty:
+        events["session_id"] = pd.Series(dtype=np.int64)
+        return events
+
+    students = events["student_id"].cat.codes.to_numpy()
+    times = events["timestamp"].to_numpy(dtype="datetime64[ns]").view(np.int64)
+    gap_ns = int(gap_minutes * 60 * 1e9)
+
+    new_session = np.empty(len(events), dtype=bool)
+    new_session[0] = True
+    new_session[1:] = (students[1:] != students[:-1]) | (np.diff(times) > gap_ns)
+    events["session_id"] = np.cumsum(new_session) - 1
+    return events
+
+
+def session_summary(sessions):
+    """每个会话的学生、起止时间、访问次数、访问节点数和时长（分钟）"""
+    columns = ["session_id", "student_id", "start", "end", "访问次数", "节点数", "时长(分钟)"]
+    if sessions.empty:
+        return pd.DataFrame(columns=columns)
+
+    # 会话在排序后的记录中是连续区间，直接按区间起点做分段归约
+    session_ids = sessions["session_id"].to_numpy()
+    starts = np.flatnonzero(np.r_[True, session_ids[1:] != session_ids[:-1]])
+    ends = np.r_[starts[1:], len(session_ids)] - 1
+    times = sessions["timestamp"].to_numpy(dtype="datetime64[ns]")
+
+    n_categories = max(len(sessions["node_id"].cat.categories), 1)
+    node_codes = sessions["node_id"].cat.codes.to_numpy().astype(np.int64)
+    distinct, _ = _unique_counts(session_ids * n_categories + node_codes)
+
+    summary = pd.DataFrame({
+        "session_id": session_ids[starts],
+        "student_id": sessions["student_id"].array.take(starts),
+        "start": times[starts],
+        "end": times[ends],
+        "访问次数": np.add.reduceat(sessions["count"].to_numpy(), starts),
+        "节点数": np.bincount(distinct // n_categories, minlength=session_ids[-1] + 1)[session_ids[starts]],
+    })
+    summary["时长(分钟)"] = ((summary["end"] - summary["start"]).dt.total_seconds() / 60).round(1)
+    return summary
+
+
+def session_paths(sessions, student_id, max_len=20):
+    """某个学生每个会话的访问路径（相邻重复节点只保留一次）"""
+    student_events = sessions[sessions["student_id"] == student_id]
+    if student_events.empty:
+        return []
+    node_codes = student_events["node_id"].cat.codes.to_numpy()
+    session_ids = student_events["session_id"].to_numpy()
+    keep = np.ones(len(student_events), dtype=bool)
+    keep[1:] = (node_codes[1:] != node_codes[:-1]) | (session_ids[1:] != session_ids[:-1])
+    kept = student_events[keep]
+    paths = []
+    for session_id, labels in kept.groupby("session_id", sort=True)["node_label"]:
+        labels = labels.tolist()
+        paths.append((session_id, labels[:max_len], len(labels) > max_len))
+    return paths
+
+
+# ==================== 节点跳转 ====================
+def transition_counts(sessions):
+    """同一会话内相邻两次访问构成一次跳转，返回 (source, target, 次数) 长表，按次数降序"""
+    columns = ["source", "target", "次数"]
+    if len(sessions) < 2:
+        return pd.DataFrame(columns=columns)
+
+    categories = sessions["node_id"].cat.categories
+    codes = sessions["node_id"].cat.codes.to_numpy().astype(np.int64)
+    session_ids = sessions["session_id"].to_numpy()
+
+    src, dst = codes[:-1], codes[1:]
+    valid = (session_ids[1:] == session_ids[:-1]) & (src != dst)
+    pairs = src[valid] * len(categories) + dst[valid]
+    if len(pairs) == 0:
+        return pd.DataFrame(columns=columns)
+
+    pair_ids, counts = _unique_counts(pairs)
+    order = np.argsort(-counts, kind="stable")
+    pair_ids, counts = pair_ids[order], counts[order]
+    return pd.DataFrame({
+        "source": categories[pair_ids // len(categories)],
+        "target": categories[pair_ids % len(categories)],
+        "次数": counts,
+    })
+
+
+def transition_matrix(transitions, node_ids=None):
+    """把跳转长表转换为 source × target 矩阵；node_ids 可限定行列范围"""
+    if node_ids is not None:
+        transitions = transitions[transitions["source"].isin(node_ids) & transitions["target"].isin(node_ids)]
+    return transitions.pivot_table(index="source", columns="target", values="次数", aggfunc="sum", fill_value=0)
+
+
+# ==================== 核心问题覆盖率 ====================
+def core_question_subtrees(json_data):
+    """每个核心问题沿出边可达的子树（不跨入根节点和其他核心问题），返回 (question_id, node_id) 长表"""
+    nodes = json_data.get("nodes", [])
+    core_ids = [n["id"] for n in nodes if n.get("level") == 1 and n.get("category") == "核心问题"]
+    stop_ids = {n["id"] for n in nodes if n.get("level", 1) <= 1}
+
+    children = {}
+    for rel in json_data.get("relationships", []):
+        children.setdefault(rel["source"], []).append(rel["target"])
+
+    question_ids, member_ids = [], []
+    for question_id in core_ids:
+        seen = {question_id}
+        stack = [question_id]
+        while stack:
+            for child in children.get(stack.pop(), ()):
+                if child not in seen and child not in stop_ids:
+                    seen.add(child)
+                    stack.append(child)
+        question_ids.extend([question_id] * len(seen))
+        member_ids.extend(seen)
+    return pd.DataFrame({"question_id": question_ids, "node_id": member_ids})
+
+
+def subtree_coverage(events, subtrees):
+    """每个学生对每个核心问题子树的覆盖率（访问过的子树节点数 / 子树节点数），返回 学生 × 问题 矩阵"""
+    question_ids = sorted(subtrees["question_id"].unique())
+    if events.empty or not question_ids:
+        return pd.DataFrame(columns=question_ids)
+
+    categories = events["node_id"].cat.categories
+    n_nodes = max(len(categories), 1)
+    pairs, _ = _unique_counts(
+        events["student_id"].cat.codes.to_numpy().astype(np.int64) * n_nodes
+        + events["node_id"].cat.codes.to_numpy()
+    )
+    visited = pd.DataFrame({"student": pairs // n_nodes, "node_code": pairs % n_nodes})
+    members = pd.DataFrame({
+        "question_id": subtrees["question_id"].to_numpy(),
+        "node_code": pd.Categorical(subtrees["node_id"], categories=categories).codes.astype(np.int64),
+    })
+    hits = visited.merge(members[members["node_code"] >= 0], on="node_code", how="inner")
+    counts = hits.groupby(["student", "question_id"]).size().unstack(fill_value=0)
+    counts = counts.reindex(columns=question_ids, fill_value=0)
+
+    sizes = subtrees.groupby("question_id").size().reindex(question_ids).to_numpy()
+    coverage = counts.to_numpy() / sizes
+
+    students = events["student_id"].cat.categories
+    result = pd.DataFrame(0.0, index=students, columns=question_ids)
+    result.iloc[counts.index.to_numpy()] = coverage
+    result.index.name = "student_id"
+    return result
+
+
+# ==================== 汇总入口 ====================
+def analyze(interactions, json_data, gap_minutes=SESSION_GAP_MINUTES):
+    """一次性计算全部分析结果"""
+    sessions = sessionize(prepare_events(interactions), gap_minutes)
+    return {
+        "sessions": sessions,
+        "session_summary": session_summary(sessions),
+        "transitions": transition_counts(sessions),
+        "coverage": subtree_coverage(sessions, core_question_subtrees(json_data)),
+    }
@@ -0,0 +1,173 @@
+"""
+Prometheus 指标导出
+把 perf_metrics 中的耗时直方图、计数器和仪表值渲染为 Prometheus 文本格式（text exposition format 0.0.4），
+可通过本地 HTTP 端点（/metrics）供 Prometheus 抓取，或定期原子重写到文件供 node_exporter 的 textfile collector 读取
+"""
+import os
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import perf_metrics
+
+# 指标名前缀
+METRIC_PREFIX = "gjf_"
+# 导出的直方图分桶：从 perf_metrics 的分桶上界中每隔 4 个取一个（约 2.4 倍递增），分桶计数仍然精确
+EXPORT_BUCKET_STEP = 4
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 指标说明（HELP 行）及类型；未列出的计数器按 counter、仪表值按 gauge 导出
+METRIC_HELP = {
+    "stage_duration_seconds": "各处理阶段耗时（含 Neo4j 查询 stage=neo4j.*）",
+    "reruns_total": "按页面统计的脚本重跑次数",
+    "interactions_recorded_total": "按存储后端统计的成功写入的交互记录数",
+    "interactions_failed_total": "按存储后端统计的写入失败的交互记录数",
+    "cache_requests_total": "按缓存统计的访问次数",
+    "cache_misses_total": "按缓存统计的未命中次数（命中率 = 1 - misses / requests）",
+    "rendered_html_bytes_total": "学生端累计渲染的图谱 HTML 字节数",
+    "rendered_html_bytes": "最近一次渲染的图谱 HTML 字节数",
+    "active_sessions": f"最近 {perf_metrics.ACTIVE_SESSION_WINDOW} 秒内有过重跑的会话数",
+    "process_start_time_seconds": "进程启动时间（Unix 时间戳）",
+}
+
+_START_TIME = time.time()
+# 抓取时才计算的仪表值：指标名 -> 无参函数
+_gauge_callbacks = {"active_sessions": perf_metrics.active_sessions}
+
+
+def register_gauge(name, callback, help_text=None):
+    """注册一个抓取时计算的仪表值"""
+    _gauge_callbacks[name] = callback
+    if help_text:
+        METRIC_HELP[name] = help_text
+
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(labels):
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{re.sub(r"[^a-zA-Z0-9_]", "_", k)}="{_escape(v)}"' for k, v in labels) + "}"
+
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+def _header(lines, name, metric_type):
+    help_text = METRIC_HELP.get(name, name)
+    lines.append(f"# HELP {METRIC_PREFIX}{name} {_escape(help_text)}")
+    lines.append(f"# TYPE {METRIC_PREFIX}{name} {metric_type}")
+
+
+def _group(samples):
+    """把 {(指标名, 标签): 值} 按指标名分组"""
+    grouped = {}
+    for (name, labels), value in sorted(samples.items()):
+        grouped.setdefault(name, []).append((labels, value))
+    return grouped
+
+
+def render():
+    """生成 Prometheus 文本格式的全部指标"""
+    lines = []
+
+    # 耗时直方图（累积分桶）
+    histograms = perf_metrics.histograms()
+    if histograms:
+        name = "stage_duration_seconds"
+        _header(lines, name, "histogram")
+        bounds = perf_metrics.BUCKET_BOUNDS
+        for stage, histogram in sorted(histograms.items()):
+            buckets = list(histogram.buckets)
+            stage_label = (("stage", stage),)
+            cumulative = 0
+            for index, bound in enumerate(bounds):
+                cumulative += buckets[index]
+                if index % EXPORT_BUCKET_STEP == EXPORT_BUCKET_STEP - 1:
+                    labels = _format_labels(stage_label + (("le", f"{bound:.6g}"),))
+                    lines.append(f"{METRIC_PREFIX}{name}_bucket{labels} {cumulative}")
+            count = cumulative + buckets[-1]
+            lines.append(f"{METRIC_PREFIX}{name}_bucket{_format_labels(stage_label + (('le', '+Inf'),))} {count}")
+            lines.append(f"{METRIC_PREFIX}{name}_sum{_format_labels(stage_label)} {histogram.total!r}")
+            lines.append(f"{METRIC_PREFIX}{name}_count{_format_labels(stage_label)} {count}")
+
+    # 计数器
+    for name, samples in _group(perf_metrics.counters()).items():
+        _header(lines, name, "counter")
+        for labels, value in samples:
+            lines.append(f"{METRIC_PREFIX}{name}{_format_labels(labels)} {_format_value(value)}")
+
+    # 仪表值（记录值 + 抓取时计算的值）
+    gauges = perf_metrics.gauges()
+    for name, callback in _gauge_callbacks.items():
+        try:
+            gauges[(name, ())] = callback()
+        except Exception:
+            # 单个仪表值计算失败不影响其他指标
+            continue
+    gauges[("process_start_time_seconds", ())] = _START_TIME
+    for name, samples in _group(gauges).items():
+        _header(lines, name, "gauge")
+        for labels, value in samples:
+            lines.append(f"{METRIC_PREFIX}{name}{_format_labels(labels)} {_format_value(value)}")
+
+    return "\n".join(lines) + "\n"
+
+
+# ==================== 导出方式 ====================
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split("?")[0] != "/metrics":
+            self.send_error(404)
+            return
+        body = render().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", CONTENT_TYPE)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # 不在控制台打印每次抓取
+        pass
+
+
+def start_http_server(port, host="0.0.0.0"):
+    """在后台线程中启动 /metrics 端点"""
+    server = ThreadingHTTPServer((host, port), _MetricsHandler)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, name="metrics-http", daemon=True).start()
+    return server
+
+
+def write_file(path):
+    """原子重写指标文件（先写临时文件再改名，node_exporter 不会读到写了一半的文件）"""
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(render())
+    os.replace(tmp_path, path)
+
+
+def start_file_writer(path, interval):
+    """在后台线程中每隔 interval 秒重写一次指标文件"""
+    def run():
+        while True:
+            try:
+                write_file(path)
+            except OSError:
+                # 磁盘暂时不可写时下个周期重试
+                pass
+            time.sleep(interval)
+
+    thread = threading.Thread(target=run, name="metrics-file-writer", daemon=True)
+    thread.start()
+    return thread
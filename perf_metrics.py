@@ -0,0 +1,170 @@
+"""
+性能计时
+热点路径按阶段计时，结果累计到进程内的直方图（对数分桶），可随时查询 p50/p95/p99
+单次记录只做一次二分查找和计数加一，开销在微秒级
+另有按标签区分的计数器、仪表值和活跃会话跟踪，供 metrics_exporter 导出为 Prometheus 格式
+"""
+import bisect
+import functools
+import math
+import threading
+import time
+from contextlib import contextmanager
+
+# 直方图分桶上界（秒）：10微秒 ~ 约2分钟，按 1.25 倍递增
+BUCKET_BOUNDS = [1e-5 * 1.25 ** i for i in range(74)]
+
+
+class LatencyHistogram:
+    """对数分桶的耗时直方图"""
+
+    def __init__(self):
+        self.buckets = [0] * (len(BUCKET_BOUNDS) + 1)
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._lock = threading.Lock()
+
+    def observe(self, seconds):
+        index = bisect.bisect_left(BUCKET_BOUNDS, seconds)
+        with self._lock:
+            self.buckets[index] += 1
+            self.count += 1
+            self.total += seconds
+            if seconds > self.max:
+                self.max = seconds
+
+    def percentile(self, q):
+        """按分桶估算分位数（在所在桶内按几何插值）"""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        cumulative = 0
+        for index, bucket_count in enumerate(self.buckets):
+            if bucket_count and cumulative + bucket_count >= rank:
+                upper = BUCKET_BOUNDS[index] if index < len(BUCKET_BOUNDS) else self.max
+                lower = BUCKET_BOUNDS[index - 1] if index > 0 else 0.0
+                fraction = (rank - cumulative) / bucket_count
+                if lower <= 0:
+                    estimate = upper * fraction
+                else:
+                    estimate = lower * math.exp(math.log(upper / lower) * fraction)
+                return min(estimate, self.max)
+            cumulative += bucket_count
+        return self.max
+
+
+# 最近多少秒内有过重跑的会话视为活跃会话
+ACTIVE_SESSION_WINDOW = 300
+
+_histograms = {}
+_counters = {}        # (指标名, ((标签, 值), ...)) -> 累计值
+_gauges = {}          # (指标名, ((标签, 值), ...)) -> 当前值
+_sessions = {}        # 会话ID -> 最近一次重跑时间
+_registry_lock = threading.Lock()
+
+
+def get_histogram(stage):
+    histogram = _histograms.get(stage)
+    if histogram is None:
+        with _registry_lock:
+            histogram = _histograms.setdefault(stage, LatencyHistogram())
+    return histogram
+
+
+def observe(stage, seconds):
+    """记录某阶段的一次耗时"""
+    get_histogram(stage).observe(seconds)
+
+
+@contextmanager
+def timed(stage):
+    """计时上下文：with timed("阶段名"): ..."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        get_histogram(stage).observe(time.perf_counter() - start)
+
+
+def timed_function(stage):
+    """计时装饰器"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                get_histogram(stage).observe(time.perf_counter() - start)
+        return wrapper
+    return decorator
+
+
+def increment(name, value=1, **labels):
+    """计数器累加：increment("interactions_recorded_total", backend="local")"""
+    key = (name, tuple(sorted(labels.items())))
+    with _registry_lock:
+        _counters[key] = _counters.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """设置仪表值（最近一次的取值）"""
+    with _registry_lock:
+        _gauges[(name, tuple(sorted(labels.items())))] = value
+
+
+def touch_session(session_id):
+    """记录会话的一次重跑"""
+    with _registry_lock:
+        _sessions[session_id] = time.time()
+
+
+def active_sessions(window=ACTIVE_SESSION_WINDOW):
+    """最近 window 秒内有过重跑的会话数，顺带清理过期会话"""
+    cutoff = time.time() - window
+    with _registry_lock:
+        for session_id in [sid for sid, seen in _sessions.items() if seen < cutoff]:
+            del _sessions[session_id]
+        return len(_sessions)
+
+
+def histograms():
+    """当前所有直方图 {阶段: LatencyHistogram}"""
+    with _registry_lock:
+        return dict(_histograms)
+
+
+def counters():
+    with _registry_lock:
+        return dict(_counters)
+
+
+def gauges():
+    with _registry_lock:
+        return dict(_gauges)
+
+
+def snapshot():
+    """所有阶段的统计（毫秒），按阶段名排序"""
+    rows = []
+    # 先在锁内复制，其他会话的线程可能同时新增阶段或 reset() 清空
+    for stage, histogram in sorted(histograms().items()):
+        if histogram.count == 0:
+            continue
+        rows.append({
+            "阶段": stage,
+            "次数": histogram.count,
+            "平均(ms)": round(histogram.total / histogram.count * 1000, 2),
+            "p50(ms)": round(histogram.percentile(0.50) * 1000, 2),
+            "p95(ms)": round(histogram.percentile(0.95) * 1000, 2),
+            "p99(ms)": round(histogram.percentile(0.99) * 1000, 2),
+            "最大(ms)": round(histogram.max * 1000, 2),
+        })
+    return rows
+
+
+def reset():
+    """清空耗时统计（Prometheus 端会视为一次计数器重置）；计数器和仪表值不随之清空"""
+    with _registry_lock:
+        _histograms.clear()
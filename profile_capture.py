@@ -0,0 +1,111 @@
+"""
+按需性能剖析
+用 cProfile 包裹单次页面重跑，把统计结果保存为 .pstats 文件，并在旁边写一份 JSON 说明（页面、核心问题、选中节点、耗时）
+未开启时不创建 Profile 对象，没有任何额外开销
+"""
+import cProfile
+import io
+import json
+import os
+import pstats
+import secrets
+import time
+
+# 最多保留的剖析文件数，超出后删除最旧的
+PROFILE_MAX_FILES = 20
+
+
+def capture(func, directory, describe):
+    """
+    在 cProfile 下执行 func()，保存统计结果
+    describe() 在执行结束后调用，返回描述本次重跑的字典（页面、问题、节点等）
+    """
+    profiler = cProfile.Profile()
+    try:
+        profiler.enable()
+    except ValueError:
+        # 已有其他剖析工具在运行（如外部 profiler），本次不剖析
+        return func()
+
+    start = time.perf_counter()
+    try:
+        return func()
+    finally:
+        profiler.disable()
+        elapsed = time.perf_counter() - start
+        try:
+            _save(profiler, directory, describe(), elapsed)
+        except Exception:
+            # 保存失败不影响页面本身
+            pass
+
+
+def _save(profiler, directory, context, elapsed):
+    os.makedirs(directory, exist_ok=True)
+    name = f"{time.strftime('%Y%m%d_%H%M%S')}_{secrets.token_hex(4)}"
+    stats_path = os.path.join(directory, name + ".pstats")
+    profiler.dump_stats(stats_path)
+
+    meta = dict(context)
+    meta.update({
+        "name": name,
+        "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "duration_ms": round(elapsed * 1000, 1),
+    })
+    tmp_path = os.path.join(directory, name + ".json.tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False)
+    os.replace(tmp_path, os.path.join(directory, name + ".json"))
+    _prune(directory)
+
+
+def _prune(directory, keep=PROFILE_MAX_FILES):
+    for meta in list_profiles(directory)[keep:]:
+        remove_profile(directory, meta["name"])
+
+
+def list_profiles(directory):
+    """已保存的剖析记录（说明字典列表），最新的在前"""
+    if not os.path.isdir(directory):
+        return []
+    profiles = []
+    for file_name in os.listdir(directory):
+        if not file_name.endswith(".json"):
+            continue
+        try:
+            with open(os.path.join(directory, file_name), "r", encoding="utf-8") as f:
+                profiles.append(json.load(f))
+        except (OSError, ValueError):
+            continue
+    profiles.sort(key=lambda meta: meta.get("name", ""), reverse=True)
+    return profiles
+
+
+def stats_path(directory, name):
+    return os.path.join(directory, name + ".pstats")
+
+
+def top_functions(directory, name, limit=20, sort_key="cumulative"):
+    """按累计耗时排序的前 limit 个函数"""
+    stats = pstats.Stats(stats_path(directory, name), stream=io.StringIO())
+    stats.sort_stats(sort_key)
+    rows = []
+    for func in stats.fcn_list[:limit]:
+        primitive_calls, total_calls, own_time, cumulative_time, _ = stats.stats[func]
+        file_name, line, func_name = func
+        rows.append({
+            "函数": func_name,
+            "位置": f"{os.path.basename(file_name)}:{line}",
+            "调用次数": total_calls,
+            "自身耗时(ms)": round(own_time * 1000, 2),
+            "累计耗时(ms)": round(cumulative_time * 1000, 2),
+        })
+    return rows
+
+
+def remove_profile(directory, name):
+    for suffix in (".pstats", ".json"):
+        try:
+            os.remove(os.path.join(directory, name + suffix))
+        except OSError:
+            pass
@@ -0,0 +1,188 @@
+"""
+Neo4j 查询观测
+记录每条语句的耗时、返回行数和服务器计数器（来自 result.consume()），
+超过阈值的语句进入有界的慢查询日志（参数脱敏），并可按需抓取 EXPLAIN 执行计划。
+日志中不保留原始参数（学生 id 等）：慢查询只记录参数的类型和长度，抓取执行计划用保留结构和类型的占位参数
+"""
+import os
+import threading
+import time
+from collections import deque
+
+# 慢查询阈值（毫秒）
+SLOW_QUERY_THRESHOLD_MS = float(os.getenv("SLOW_QUERY_THRESHOLD_MS", "200"))
+# 慢查询日志最多保留的条数
+SLOW_QUERY_LOG_SIZE = 100
+# 错误信息最多保留的字符数（服务器返回的错误信息可能带有参数值）
+ERROR_MESSAGE_LIMIT = 200
+
+# 服务器返回的写入计数器
+COUNTER_NAMES = [
+    "nodes_created", "nodes_deleted", "relationships_created", "relationships_deleted",
+    "properties_set", "labels_added", "labels_removed",
+    "indexes_added", "indexes_removed", "constraints_added", "constraints_removed",
+]
+
+
+def normalize_query(query):
+    """合并空白，作为同一语句的统计键"""
+    return " ".join(query.split())
+
+
+def redact(value):
+    """参数脱敏：只保留类型和长度，不记录具体内容"""
+    if isinstance(value, dict):
+        return {key: redact(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return f"<list len={len(value)}>"
+    if isinstance(value, str):
+        return f"<str len={len(value)}>"
+    if value is None or isinstance(value, bool):
+        return value
+    return f"<{type(value).__name__}>"
+
+
+def placeholder(value):
+    """
+    抓取执行计划用的占位参数：保留结构和类型，字符串替换为空串，列表只保留第一个元素（同样替换），
+    数字、布尔值和 None 原样保留（LIMIT、层数、时间戳等不涉及个人信息）
+    """
+    if isinstance(value, dict):
+        return {key: placeholder(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [placeholder(value[0])] if value else []
+    if isinstance(value, str):
+        return ""
+    return value
+
+
+def describe_error(error):
+    text = f"{type(error).__name__}: {error}"
+    return text if len(text) <= ERROR_MESSAGE_LIMIT else text[:ERROR_MESSAGE_LIMIT] + "…"
+
+
+def summary_counters(summary):
+    """从 ResultSummary 中取出非零的计数器"""
+    if summary is None:
+        return {}
+    counters = summary.counters
+    result = {}
+    for name in COUNTER_NAMES:
+        value = getattr(counters, name, 0)
+        if value:
+            result[name] = value
+    return result
+
+
+class QueryLog:
+    """进程内共享的查询统计与慢查询日志"""
+
+    def __init__(self, threshold_ms=SLOW_QUERY_THRESHOLD_MS, max_entries=SLOW_QUERY_LOG_SIZE):
+        self.threshold_ms = threshold_ms
+        self._lock = threading.Lock()
+        self._max_entries = max_entries
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.stats = {}                                 # 语句 -> 累计统计
+            self.slow_entries = deque(maxlen=self._max_entries)
+            self._worst = {}                                # 语句 -> (耗时, 占位参数)，仅用于抓取执行计划
+            self.plans = {}                                 # 语句 -> (计划类型, 计划文本)
+
+    def record(self, kind, query, parameters, seconds, rows, summary=None, error=None):
+        """记录一次执行"""
+        key = normalize_query(query)
+        duration_ms = seconds * 1000
+        counters = summary_counters(summary)
+        with self._lock:
+            stat = self.stats.setdefault(key, {"kind": kind, "calls": 0, "errors": 0, "total_ms": 0.0,
+                                               "max_ms": 0.0, "rows": 0, "counters": {}})
+            stat["calls"] += 1
+            stat["total_ms"] += duration_ms
+            stat["max_ms"] = max(stat["max_ms"], duration_ms)
+            stat["rows"] += rows
+            for name, value in counters.items():
+                stat["counters"][name] = stat["counters"].get(name, 0) + value
+            if error is not None:
+                stat["errors"] += 1
+
+            if duration_ms >= self.threshold_ms or error is not None:
+                self.slow_entries.append({
+                    "time": time.strftime("%Y-%m-%d %H:%M:%S"),
+                    "kind": kind,
+                    "duration_ms": round(duration_ms, 1),
+                    "rows": rows,
+                    "counters": counters,
+                    "query": key,
+                    "parameters": redact(parameters or {}),
+                    "error": None if error is None else describe_error(error),
+                })
+                worst = self._worst.get(key)
+                if worst is None or duration_ms > worst[0]:
+                    self._worst[key] = (duration_ms, placeholder(parameters or {}))
+
+    def statement_rows(self):
+        """每条语句的累计统计，按总耗时降序"""
+        with self._lock:
+            items = list(self.stats.items())
+        rows = []
+        for key, stat in items:
+            rows.append({
+                "语句": key[:160],
+                "类型": stat["kind"],
+                "次数": stat["calls"],
+                "失败": stat["errors"],
+                "总耗时(ms)": round(stat["total_ms"], 1),
+                "平均(ms)": round(stat["total_ms"] / stat["calls"], 2),
+                "最大(ms)": round(stat["max_ms"], 1),
+                "返回行数": stat["rows"],
+                "计数器": ", ".join(f"{k}={v}" for k, v in stat["counters"].items()),
+            })
+        rows.sort(key=lambda row: -row["总耗时(ms)"])
+        return rows
+
+    def worst_offenders(self, top_n=3):
+        """最慢的 top_n 条语句 [(语句, 最大耗时, 占位参数), ...]"""
+        with self._lock:
+            items = sorted(self._worst.items(), key=lambda item: -item[1][0])[:top_n]
+        return [(key, duration_ms, parameters) for key, (duration_ms, parameters) in items]
+
+    def capture_plans(self, conn, top_n=3):
+        """
+        为最慢的语句抓取执行计划；参数只保留了占位值，PROFILE 按占位值执行得到的行数和 dbHits 没有参考意义，
+        因此只用 EXPLAIN（不执行语句，显示计划和估计行数）
+        """
+        captured = 0
+        for key, _, parameters in self.worst_offenders(top_n):
+            try:
+                plan = conn.fetch_plan(key, parameters)
+                text = format_plan(plan) if plan else "（服务器未返回执行计划）"
+            except Exception as e:
+                text = f"抓取失败: {type(e).__name__}: {e}"
+            with self._lock:
+                self.plans[key] = ("EXPLAIN", text)
+            captured += 1
+        return captured
+
+
+def format_plan(plan, depth=0):
+    """把执行计划树格式化为缩进文本"""
+    args = plan.get("args", {})
+    details = []
+    for name in ("rows", "dbHits"):
+        if name in plan:
+            details.append(f"{name}={plan[name]}")
+    if "EstimatedRows" in args:
+        details.append(f"estimated={round(args['EstimatedRows'], 1)}")
+    if args.get("Details"):
+        details.append(str(args["Details"]))
+    line = "  " * depth + plan.get("operatorType", "?") + (f"  [{'; '.join(details)}]" if details else "")
+    lines = [line]
+    for child in plan.get("children", []):
+        lines.append(format_plan(child, depth + 1))
+    return "\n".join(lines)
+
+
+# 进程内唯一的查询日志
+query_log = QueryLog()
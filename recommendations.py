@@ -0,0 +1,89 @@
+"""
+"同学们还浏览了" 推荐
+在内存中维护节点跳转的稀疏计数矩阵（source → target → 次数），随新交互增量更新
+每个节点同时维护按次数排序的前 K 个后继，查询只需 O(K)，不扫描交互历史
+"""
+import threading
+from datetime import datetime
+
+# 每个节点保留的推荐数量
+COVISIT_TOP_K = 10
+# 会话切分间隔（秒），与 learning_analytics.SESSION_GAP_MINUTES 保持一致
+# （此处不导入 learning_analytics，学生端使用推荐时不必加载 pandas）
+SESSION_GAP_SECONDS = 30 * 60
+
+
+class CoVisitIndex:
+    """节点跳转的稀疏计数矩阵及每个节点的 Top-K 后继"""
+
+    def __init__(self, top_k=COVISIT_TOP_K, session_gap_seconds=SESSION_GAP_SECONDS):
+        self.top_k = top_k
+        self.session_gap_seconds = session_gap_seconds
+        self._counts = {}     # source -> {target: 次数}
+        self._top = {}        # source -> [[target, 次数], ...]，按次数降序
+        self._last_view = {}  # student_id -> (node_id, 时间戳秒)
+        self._lock = threading.Lock()
+
+    def observe(self, student_id, node_id, timestamp):
+        """记录一次访问：与该学生同一会话内的上一次访问构成一次跳转"""
+        with self._lock:
+            last = self._last_view.get(student_id)
+            if last and last[0] != node_id and 0 <= timestamp - last[1] <= self.session_gap_seconds:
+                self._increment(last[0], node_id)
+            self._last_view[student_id] = (node_id, timestamp)
+
+    def _increment(self, source, target):
+        row = self._counts.setdefault(source, {})
+        count = row[target] = row.get(target, 0) + 1
+
+        # 计数只增不减：不在 Top-K 中的节点只有超过当前第 K 名才需要进入
+        top = self._top.setdefault(source, [])
+        for entry in top:
+            if entry[0] == target:
+                entry[1] = count
+                break
+        else:
+            if len(top) < self.top_k:
+                top.append([target, count])
+            elif count > top[-1][1]:
+                top[-1] = [target, count]
+            else:
+                return
+        top.sort(key=lambda entry: -entry[1])
+
+    def suggest(self, node_id, k=5):
+        """返回 node_id 之后最常被访问的前 k 个节点 [(target, 次数), ...]"""
+        return [tuple(entry) for entry in self._top.get(node_id, [])[:k]]
+
+    def suggest_many(self, node_ids, k=5):
+        """
+        node_ids（集合或字典，当前视图中的节点）中有推荐的节点 {node_id: [(target, 次数), ...]}；
+        只遍历视图节点和有推荐的节点中较少的一方，不随图谱总规模增长
+        """
+        with self._lock:
+            candidates = node_ids if len(node_ids) <= len(self._top) else [node_id for node_id in self._top
+                                                                              if node_id in node_ids]
+            return {node_id: [tuple(entry) for entry in self._top[node_id][:k]]
+                    for node_id in candidates if self._top.get(node_id)}
+
+    def last_node(self, student_id):
+        """该学生最近一次访问的节点"""
+        last = self._last_view.get(student_id)
+        return last[0] if last else None
+
+    def bootstrap(self, interactions):
+        """用已有交互记录初始化（只在进程启动时调用一次）"""
+        events = []
+        for item in interactions:
+            try:
+                timestamp = datetime.fromisoformat(str(item["timestamp"]).replace("Z", "+00:00")).timestamp()
+            except (KeyError, ValueError):
+                continue
+            # 只记录停留时长的更新（count 为 0）不是新的访问，与 record_interaction 一致不计入跳转
+            if item.get("count", 1) <= 0:
+                continue
+            events.append((timestamp, item.get("student_id"), item.get("node_id")))
+        events.sort(key=lambda event: event[0])
+        for timestamp, student_id, node_id in events:
+            self.observe(student_id, node_id, timestamp)
+        return self
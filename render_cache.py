@@ -0,0 +1,246 @@
+"""
+多进程共享的磁盘渲染缓存
+负载均衡后面的多个 Streamlit 进程（以及 static_export 的进程池）各自生成同样的图谱HTML和布局坐标，
+改为按内容寻址保存在同一个目录中：键为（图谱内容哈希, 视图参数, …）的 SHA-256，一个进程生成后其余进程直接读取，
+新启动的进程也不必从头生成
+
+- 原子写入：先写临时文件再改名，读取方不会读到写了一半的文件
+- 跨进程锁：每个键一个锁文件（POSIX 用 fcntl.flock，Windows 用 msvcrt.locking），同一个键只有一个进程在生成，
+  其余进程等待后直接读取结果；生成的进程崩溃时锁由操作系统释放。锁文件在持有锁时删除，
+  获得锁后核对锁文件仍是同一个文件（inode），等待旧文件的进程和新建锁文件的进程不会同时生成
+- LRU 容量限制：命中时更新文件的修改时间，总大小超过上限时从最久未使用的开始删除；
+  总大小在进程内累计（写入和删除时增减），每隔 RESCAN_SECONDS 才重新扫描目录，计入其他进程写入的缓存项
+
+值用 pickle 保存（与 graph_snapshot 的快照一样，目录只应由本应用写入）
+"""
+import hashlib
+import json
+import os
+import pickle
+import threading
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+ENTRY_SUFFIX = ".pkl"
+LOCK_DIR = "locks"
+# 超过上限时删除到上限的这个比例以下，避免每次写入都要清理
+EVICT_TARGET_RATIO = 0.9
+# 重新扫描目录校准总大小的间隔（秒）
+RESCAN_SECONDS = 60
+
+
+def _lock_fd(fd, blocking):
+    if fcntl:
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX if blocking else fcntl.LOCK_EX | fcntl.LOCK_NB)
+            return True
+        except BlockingIOError:
+            return False
+    while True:
+        try:
+            # LK_LOCK 最多重试10秒后抛出 OSError，继续等待
+            msvcrt.locking(fd, msvcrt.LK_LOCK if blocking else msvcrt.LK_NBLCK, 1)
+            return True
+        except OSError:
+            if not blocking:
+                return False
+
+
+def _unlock_fd(fd):
+    if fcntl:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+def _same_file(fd, path):
+    try:
+        return os.path.samestat(os.fstat(fd), os.stat(path))
+    except FileNotFoundError:
+        return False
+
+
+@contextmanager
+def file_lock(path, blocking=True, remove=False):
+    """
+    跨进程的排他锁（锁文件 path），进入时获得锁，退出时释放；
+    blocking=False 时锁被其他进程持有则返回 False 而不等待。
+    remove=True 时在释放锁之前删除锁文件：获得锁后若锁文件已被持有者删除或替换，则重新打开新的锁文件再加锁
+    （Windows 不能删除打开中的文件，保留锁文件）
+    """
+    remove = remove and fcntl is not None
+    while True:
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        acquired = _lock_fd(fd, blocking)
+        if not acquired or not remove or _same_file(fd, path):
+            break
+        _unlock_fd(fd)
+        os.close(fd)
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            if remove:
+                try:
+                    os.remove(path)
+                except OSError:
+                    pass
+            _unlock_fd(fd)
+        os.close(fd)
+
+
+def _file_size(path):
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return 0
+
+
+class RenderCache:
+    """目录 directory 中按键保存的缓存项，总大小不超过 max_bytes"""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        os.makedirs(os.path.join(directory, LOCK_DIR), exist_ok=True)
+        # 进程内累计的总大小（字节），None 表示需要扫描目录
+        self._total = None
+        self._scanned_at = 0.0
+        self._total_lock = threading.Lock()
+
+    @staticmethod
+    def key(*parts):
+        """由任意可 JSON 序列化的部分（元组按列表处理）计算内容寻址的键"""
+        text = json.dumps(parts, ensure_ascii=False, sort_keys=True, separators=(",", ":"), default=list)
+        return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+    def _path(self, key):
+        # 按前两位分子目录，单个目录中的文件不会太多
+        return os.path.join(self.directory, key[:2], key + ENTRY_SUFFIX)
+
+    def get(self, key, default=None):
+        path = self._path(key)
+        try:
+            with open(path, "rb") as f:
+                value = pickle.load(f)
+        except FileNotFoundError:
+            return default
+        except Exception:
+            # 损坏的缓存项（如磁盘写满时留下的）直接删除，重新生成
+            self._remove_entry(path)
+            return default
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return value
+
+    def set(self, key, value):
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "wb") as f:
+                pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL)
+                written = f.tell()
+            replaced = _file_size(path)
+            os.replace(tmp_path, path)
+        except BaseException:
+            self._remove(tmp_path)
+            raise
+        self._adjust(written - replaced)
+        if self.size() > self.max_bytes:
+            self.evict()
+
+    def get_or_compute(self, key, compute):
+        """
+        返回 (值, 是否命中)：缓存中有时直接返回；否则持有该键的锁生成并写入，
+        同时请求同一个键的其他进程等待锁释放后读取，不重复生成
+        """
+        value = self.get(key)
+        if value is not None:
+            return value, True
+        with file_lock(os.path.join(self.directory, LOCK_DIR, key + ".lock"), remove=True):
+            value = self.get(key)
+            if value is not None:
+                return value, True
+            value = compute()
+            self.set(key, value)
+        return value, False
+
+    def entries(self):
+        """[(修改时间, 字节数, 路径)]"""
+        result = []
+        for entry in os.scandir(self.directory):
+            if not entry.is_dir() or entry.name == LOCK_DIR:
+                continue
+            for item in os.scandir(entry.path):
+                if item.name.endswith(ENTRY_SUFFIX):
+                    try:
+                        stat = item.stat()
+                    except FileNotFoundError:
+                        continue
+                    result.append((stat.st_mtime, stat.st_size, item.path))
+        return result
+
+    def size(self):
+        """总字节数：进程内累计的值，超过 RESCAN_SECONDS 未扫描时重新扫描目录"""
+        with self._total_lock:
+            stale = self._total is None or time.monotonic() - self._scanned_at > RESCAN_SECONDS
+        if stale:
+            self._set_total(sum(size for _, size, _ in self.entries()))
+        return self._total
+
+    def _set_total(self, total):
+        with self._total_lock:
+            self._total = total
+            self._scanned_at = time.monotonic()
+
+    def _adjust(self, delta):
+        with self._total_lock:
+            if self._total is not None:
+                self._total = max(self._total + delta, 0)
+
+    def evict(self):
+        """总大小超过上限时按最久未使用删除；其他进程正在清理时跳过。返回删除的缓存项数"""
+        with file_lock(os.path.join(self.directory, LOCK_DIR, "evict.lock"), blocking=False) as acquired:
+            if not acquired:
+                return 0
+            entries = self.entries()
+            total = sum(size for _, size, _ in entries)
+            removed = 0
+            target = self.max_bytes * EVICT_TARGET_RATIO
+            if total > self.max_bytes:
+                for _, size, path in sorted(entries):
+                    if total <= target:
+                        break
+                    if self._remove(path):
+                        total -= size
+                        removed += 1
+            self._set_total(total)
+            return removed
+
+    def clear(self):
+        for _, _, path in self.entries():
+            self._remove(path)
+        self._set_total(0)
+
+    def _remove_entry(self, path):
+        size = _file_size(path)
+        if self._remove(path):
+            self._adjust(-size)
+
+    @staticmethod
+    def _remove(path):
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
@@ -0,0 +1,212 @@
+"""
+静态站点导出：从当前图谱文件生成可由 CDN 或本地文件直接提供的离线版知识图谱，不经过 Streamlit 服务
+- index.html 为全图，每个核心问题一个页面，页面顶部互相导航
+- 布局在导出时预先计算（graph_layout），浏览器打开后直接绘制，不再运行物理模拟
+- 节点和关系数据压缩后写入 data/graph.<版本>.js，所有页面共用一份（文件名带版本，可长期缓存）
+- vis-network 等依赖复制到 lib/，不访问任何外部 CDN
+- 点击详情、2级关联高亮、拖动核心问题时子节点跟随，与学生端相同（gjf_graph_main.build_click_handler）
+各页面在进程池中并行生成；先写入临时目录，全部完成后再替换输出目录，导出过程中旧站点一直可用
+页面和布局坐标写入磁盘渲染缓存（render_cache，与学生端共用），各进程共享，图谱未变时再次导出直接读取；
+图谱修改后，节点和关系没有变化的页面仍复用原来的布局
+
+用法：python static_export.py [--course 课程标识] [--out 输出目录] [--workers 进程数]
+"""
+import argparse
+import html
+import json
+import os
+import re
+import shutil
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import graph_layout
+import graph_snapshot
+from graph_compact import file_hash
+
+LIB_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lib")
+DEFAULT_OUT_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "static_site")
+SAFE_FILE_NAME = re.compile(r"^[A-Za-z0-9_-]+$")
+# 布局算法和本文件的指纹，写入缓存的键；修改 graph_layout 后旧的坐标自然失效，修改页面生成代码后旧的页面自然失效
+LAYOUT_CODE_HASH = file_hash(graph_layout.__file__)[:16]
+EXPORT_CODE_HASH = file_hash(os.path.abspath(__file__))[:16]
+
+# pyvis 模板引用的 CDN 资源 -> lib/ 中的本地文件；bootstrap 只用于 pyvis 的筛选菜单，这里没有用到，直接去掉
+LOCAL_ASSETS = {
+    "vis-network.min.js": '<script src="lib/vis-9.1.2/vis-network.min.js"></script>',
+    "vis-network.min.css": '<link rel="stylesheet" href="lib/vis-9.1.2/vis-network.css" />',
+    "bootstrap.min.css": "",
+    "bootstrap.bundle.min.js": "",
+}
+_EXTERNAL_TAG = re.compile(r'<(?:script|link)\b[^>]*?(?:src|href)="https?://[^"]*?([^/"]+)"[^>]*?>(?:\s*</script>)?',
+                           re.S)
+
+NAV_STYLE = """
+<style>
+#site-nav { display: flex; flex-wrap: wrap; gap: 6px; padding: 8px 12px; background: #f8f9fa;
+            border-bottom: 1px solid #e0e0e0; font-family: 'Microsoft YaHei', sans-serif; font-size: 13px; }
+#site-nav a { color: #1976d2; text-decoration: none; padding: 4px 10px; border-radius: 12px; background: #e3f2fd; }
+#site-nav a.active { color: #ffffff; background: #1976d2; }
+#site-nav .title { font-weight: bold; color: #333; margin-right: 8px; padding: 4px 0; }
+</style>
+"""
+
+_graph = None
+
+
+# ==================== 页面生成 ====================
+def page_file_name(question_id, position):
+    """全图为 index.html，核心问题页面使用问题 id（含特殊字符时按序号命名）"""
+    if question_id is None:
+        return "index.html"
+    return f"{question_id}.html" if SAFE_FILE_NAME.match(question_id) else f"question_{position}.html"
+
+
+def localize_assets(page):
+    """把 CDN 上的脚本和样式换成 lib/ 中的本地文件；遇到未知的外部资源时抛出 ValueError"""
+    def replace(match):
+        name = match.group(1)
+        if name not in LOCAL_ASSETS:
+            raise ValueError(f"页面引用了没有本地副本的外部资源：{name}")
+        return LOCAL_ASSETS[name]
+
+    return _EXTERNAL_TAG.sub(replace, page)
+
+
+def render_navigation(title, pages, current):
+    links = "".join(
+        f'<a href="{file_name}" class="active">{html.escape(label)}</a>' if file_name == current
+        else f'<a href="{file_name}">{html.escape(label)}</a>'
+        for file_name, label in pages
+    )
+    return f'{NAV_STYLE}<div id="site-nav"><span class="title">{html.escape(title)}</span>{links}</div>'
+
+
+def render_page(graph, question_id, title, pages, current, data_script):
+    """生成一个页面的 HTML：pyvis 图谱（预先计算的布局、压缩的数据、本地依赖）+ 导航 + 点击处理"""
+    import gjf_graph_main as app
+
+    question = graph["nodes"][graph["node_index"][question_id]] if question_id else None
+    net, drag_script = app.create_knowledge_graph(graph, question)
+    net.height = "calc(100vh - 48px)"
+
+    node_ids = [node["id"] for node in net.nodes]
+    if len(node_ids) <= graph_layout.LAYOUT_MAX_NODES:
+        edges = [(edge["from"], edge["to"]) for edge in net.edges]
+        spring_length = net.options["physics"]["barnesHut"]["springLength"]
+        positions = app.cached_on_disk(
+            "layout", [LAYOUT_CODE_HASH, node_ids, edges, spring_length, graph_layout.LAYOUT_ITERATIONS],
+            lambda: graph_layout.force_layout(node_ids, edges, spring_length=spring_length))
+        for node in net.nodes:
+            node["x"], node["y"] = positions[node["id"]]
+        net.options["physics"]["enabled"] = False
+
+    # 注入页面的节点和关系数据使用紧凑的 JSON（无多余空格，中文不转义）
+    net.templateEnv.policies["json.dumps_kwargs"] = {"separators": (",", ":"), "ensure_ascii": False}
+    page = localize_assets(net.generate_html())
+    page = page.replace("<body>", "<body>" + render_navigation(title, pages, current), 1)
+    click_handler = app.build_click_handler("GRAPH_NODES", "GRAPH_EDGES")
+    return page.replace("</body>", f'<script src="{data_script}"></script>' + click_handler + drag_script + "</body>")
+
+
+def _init_worker(json_path, snapshot_path):
+    """进程池中的每个进程只加载一次图谱快照"""
+    global _graph
+    import gjf_graph_main as app
+    _graph = graph_snapshot.load_snapshot(json_path, app.node_style, app.STYLE_HASH, snapshot_path)
+
+
+def _render_to_file(task):
+    import gjf_graph_main as app
+
+    question_id, title, pages, file_name, data_script, out_dir = task
+    start = time.perf_counter()
+    page = app.cached_on_disk(
+        "static_page",
+        [EXPORT_CODE_HASH, LAYOUT_CODE_HASH, _graph["content_hash"], question_id, title, pages, file_name, data_script],
+        lambda: render_page(_graph, question_id, title, pages, file_name, data_script))
+    with open(os.path.join(out_dir, file_name), "w", encoding="utf-8") as f:
+        f.write(page)
+    return file_name, len(page.encode("utf-8")), time.perf_counter() - start
+
+
+# ==================== 导出 ====================
+def write_data_script(graph, out_dir):
+    """全部节点和关系写入 data/graph.<版本>.js，返回相对路径"""
+    nodes = {node["id"]: graph_snapshot.thaw(node) for node in graph["nodes"]}
+    edges = graph_snapshot.thaw(graph["relationships"])
+    relative_path = f"data/graph.{graph_snapshot.version_of(graph)}.js"
+    os.makedirs(os.path.join(out_dir, "data"), exist_ok=True)
+    with open(os.path.join(out_dir, relative_path), "w", encoding="utf-8") as f:
+        f.write("var GRAPH_NODES=" + json.dumps(nodes, ensure_ascii=False, separators=(",", ":")) + ";\n")
+        f.write("var GRAPH_EDGES=" + json.dumps(edges, ensure_ascii=False, separators=(",", ":")) + ";\n")
+    return relative_path
+
+
+def export_site(course, out_dir, workers=None):
+    """导出课程的静态站点到 out_dir，返回 [(文件名, 字节数, 耗时秒)]"""
+    import gjf_graph_main as app
+
+    graph = graph_snapshot.load_snapshot(course.json_path, app.node_style, app.STYLE_HASH, course.snapshot_path)
+    out_dir = os.path.abspath(out_dir)
+    staging_dir = f"{out_dir}.tmp-{os.getpid()}"
+    shutil.rmtree(staging_dir, ignore_errors=True)
+    os.makedirs(staging_dir)
+    try:
+        shutil.copytree(LIB_DIR, os.path.join(staging_dir, "lib"))
+        data_script = write_data_script(graph, staging_dir)
+
+        question_ids = [None] + list(graph["core_questions"])
+        file_names = [page_file_name(question_id, position) for position, question_id in enumerate(question_ids)]
+        labels = ["📖 全图"] + [graph["nodes"][graph["node_index"][question_id]]["label"]
+                               for question_id in question_ids[1:]]
+        pages = list(zip(file_names, labels))
+        title = f"{course.icon} {course.title}知识图谱"
+        tasks = [(question_id, title, pages, file_name, data_script, staging_dir)
+                 for question_id, file_name in zip(question_ids, file_names)]
+
+        initargs = (course.json_path, course.snapshot_path)
+        if workers == 1:
+            _init_worker(*initargs)
+            results = [_render_to_file(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=initargs) as pool:
+                results = list(pool.map(_render_to_file, tasks))
+
+        # 替换输出目录：旧站点先改名再删除，替换前后都是完整的站点
+        previous_dir = f"{out_dir}.old-{os.getpid()}"
+        if os.path.exists(out_dir):
+            os.replace(out_dir, previous_dir)
+        os.replace(staging_dir, out_dir)
+        shutil.rmtree(previous_dir, ignore_errors=True)
+    except BaseException:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+    return results
+
+
+# ==================== 命令行 ====================
+def main():
+    parser = argparse.ArgumentParser(description="导出知识图谱静态站点（全图 + 每个核心问题一个页面）")
+    parser.add_argument("--course", help="课程标识（默认为课程列表中的第一门课程）")
+    parser.add_argument("--out", default=DEFAULT_OUT_DIR, help="输出目录（默认 static_site/）")
+    parser.add_argument("--workers", type=int, default=None, help="生成页面的进程数（默认为CPU核数，1 表示不使用进程池）")
+    args = parser.parse_args()
+
+    import gjf_graph_main as app
+    registry = app.get_course_registry()
+    course = registry.get(args.course) if args.course else registry.default
+    if course is None:
+        print(f"未知的课程：{args.course}（可选：{', '.join(hosted.key for hosted in registry)}）", file=sys.stderr)
+        sys.exit(2)
+
+    start = time.perf_counter()
+    results = export_site(course, args.out, args.workers)
+    for file_name, size, seconds in results:
+        print(f"{file_name:<32} {size / 1024:8.1f} KB  {seconds:6.2f} s")
+    print(f"已导出 {len(results)} 个页面到 {os.path.abspath(args.out)}，耗时 {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
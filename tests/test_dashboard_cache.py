@@ -0,0 +1,39 @@
+"""dashboard_cache：增量拉取按 id 合并、水位边界上重复取回的记录不改变 version"""
+from dashboard_cache import DashboardCache
+
+
+def record(record_id, count=1, synced_ms=1000):
+    return {"id": record_id, "student_id": "s1", "node_id": record_id, "node_label": record_id,
+            "action_type": "view", "count": count, "duration": 1.0,
+            "timestamp": f"2026-01-05T10:00:0{record_id[-1]}", "synced_ms": synced_ms}
+
+
+def test_boundary_records_fetched_again_do_not_bump_version():
+    cache = DashboardCache(ttl_seconds=60)
+    batches = [
+        ([record("i1"), record("i2")], False),
+        # 与上次水位同一毫秒的记录（>= 比较）再次返回，另有一条同一毫秒内新写入的记录
+        ([record("i2"), record("i3")], True),
+        ([record("i2"), record("i3")], True),
+        # 合并更新：同 id 的记录次数变化
+        ([record("i3", count=2, synced_ms=1001)], True),
+    ]
+
+    def fetch(watermark):
+        records, incremental = batches.pop(0)
+        return records, ("neo4j", 1000), incremental
+
+    df = cache.get(fetch)
+    assert cache.version == 1 and len(df) == 2
+
+    df = cache.get(fetch, force=True)
+    assert cache.version == 2 and cache.last_new_records == 1
+    assert sorted(df["id"]) == ["i1", "i2", "i3"]
+
+    df = cache.get(fetch, force=True)
+    assert cache.version == 2 and cache.last_new_records == 0
+
+    df = cache.get(fetch, force=True)
+    assert cache.version == 3 and cache.last_new_records == 1
+    assert len(df) == 3
+    assert df.set_index("id").loc["i3", "count"] == 2
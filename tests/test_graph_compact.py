@@ -0,0 +1,90 @@
+"""graph_compact 的流式解析：与 json.load 结果一致、块边界切断多字节字符、截断和格式错误的文件"""
+import hashlib
+import io
+import json
+
+import pytest
+
+from graph_compact import GraphBuilder, iter_graph_file, load_graph_file
+
+GRAPH = {
+    "metadata": {"title": "国际法", "version": 2, "tags": ["条约", "习惯"]},
+    "nodes": [
+        {"id": "q1", "label": "国际法有约束力吗？", "category": "核心问题", "level": 1,
+         "properties": {"课时": "2学时", "权重": 0.75}},
+        {"id": "a", "label": "条约 \"必须遵守\"", "category": "基础", "level": 2, "description": "pacta\nsunt servanda"},
+        {"id": "b", "label": "😀 emoji", "category": "基础", "level": 12345},
+    ],
+    "relationships": [
+        {"source": "q1", "target": "a", "type": "包含"},
+        {"source": "a", "target": "b", "type": "案例", "description": ""},
+    ],
+    "extra": None,
+}
+
+
+def parse(data, chunk_size):
+    items, stream = iter_graph_file(io.BytesIO(data), chunk_size)
+    return list(items), stream
+
+
+def expected_items(graph):
+    items = []
+    for key, value in graph.items():
+        if key in ("nodes", "relationships"):
+            items.extend((key, item) for item in value)
+        else:
+            items.append((key, value))
+    return items
+
+
+@pytest.mark.parametrize("chunk_size", [1, 2, 3, 7, 64 * 1024])
+@pytest.mark.parametrize("indent", [None, 2])
+def test_stream_matches_json_load(chunk_size, indent):
+    data = json.dumps(GRAPH, ensure_ascii=False, indent=indent).encode("utf-8")
+    items, stream = parse(data, chunk_size)
+    assert items == expected_items(GRAPH)
+    assert stream.sha256.hexdigest() == hashlib.sha256(data).hexdigest()
+
+
+def test_bom_and_empty_arrays():
+    data = "﻿".encode("utf-8") + b' { "nodes" : [ ] , "relationships":[], "metadata": {} } \n'
+    items, _ = parse(data, 3)
+    assert items == [("metadata", {})]
+    assert parse(b"{}", 1)[0] == []
+
+
+def test_every_truncation_is_rejected():
+    data = json.dumps(GRAPH, ensure_ascii=False).encode("utf-8")
+    for cut in range(len(data)):
+        with pytest.raises(ValueError):
+            parse(data[:cut], 5)
+
+
+@pytest.mark.parametrize("data", [
+    b'{"nodes": [{"id": "a"} {"id": "b"}]}',
+    b'{"nodes": [{"id": "a"},]}',
+    b'{"nodes": []} {"nodes": []}',
+    b'{1: []}',
+    b'{"nodes" []}',
+    b'[{"id": "a"}]',
+    b'{"nodes": [{"id": "a\xff"}]}',
+])
+def test_malformed_json_is_rejected(data):
+    with pytest.raises(ValueError):
+        parse(data, 4)
+
+
+def test_load_graph_file_matches_builder(tmp_path):
+    path = tmp_path / "graph.json"
+    data = json.dumps(GRAPH, ensure_ascii=False, indent=2).encode("utf-8")
+    path.write_bytes(data)
+    builder, content_hash = load_graph_file(str(path), chunk_size=16)
+    assert content_hash == hashlib.sha256(data).hexdigest()
+
+    nodes, relationships, issues = builder.finish()
+    expected_nodes, expected_relationships, expected_issues = GraphBuilder().feed_dict(GRAPH).finish()
+    assert [dict(node) for node in nodes] == [dict(node) for node in expected_nodes]
+    assert [dict(rel) for rel in relationships] == [dict(rel) for rel in expected_relationships]
+    assert issues == expected_issues
+    assert builder.metadata == GRAPH["metadata"]
@@ -0,0 +1,135 @@
+"""graph_patch：补丁重复应用无变化、删除和移动子树、原子写入、同步到 Neo4j 的节点顺序"""
+import copy
+import json
+import os
+
+import pytest
+
+import graph_patch
+
+
+def sample_graph():
+    return {
+        "metadata": {"title": "测试图谱"},
+        "nodes": [
+            {"id": "q1", "label": "问题一", "category": "核心问题", "level": 1},
+            {"id": "q2", "label": "问题二", "category": "核心问题", "level": 1},
+            {"id": "a", "label": "知识点A", "category": "基础", "level": 2},
+            {"id": "b", "label": "知识点B", "category": "基础", "level": 3},
+        ],
+        "relationships": [
+            {"source": "q1", "target": "a", "type": "包含"},
+            {"source": "a", "target": "b", "type": "包含"},
+        ],
+    }
+
+
+PATCH = {
+    "operations": [
+        {"op": "upsert_node", "node": {"id": "root", "label": "根", "category": "核心问题", "level": 0}},
+        {"op": "upsert_edge", "source": "root", "target": {"level": 1}, "type": "包含"},
+        {"op": "update_node", "id": "a", "set": {"label": "知识点A'"}, "properties": {"课时": "2学时"}},
+        {"op": "relink", "id": "a", "parent": "q2"},
+    ]
+}
+
+
+def test_patch_is_idempotent():
+    patched, delta = graph_patch.apply_patch(sample_graph(), PATCH)
+    assert graph_patch.has_changes(delta)
+    assert delta["added_nodes"] == 1
+    # root -> q1、root -> q2、q2 -> a 三条新关系
+    assert delta["added_edges"] == 3
+
+    again, second = graph_patch.apply_patch(copy.deepcopy(patched), PATCH)
+    assert not graph_patch.has_changes(second)
+    assert again == patched
+
+
+def test_relink_moves_subtree_and_levels():
+    patched, delta = graph_patch.apply_patch(sample_graph(), {"operations": [
+        {"op": "upsert_node", "node": {"id": "q3", "label": "问题三", "category": "核心问题", "level": 2}},
+        {"op": "relink", "id": "a", "parent": "q3"},
+    ]})
+    edges = {(rel["source"], rel["target"]) for rel in patched["relationships"]}
+    assert ("q1", "a") not in edges and ("q3", "a") in edges
+    levels = {node["id"]: node["level"] for node in patched["nodes"]}
+    assert levels["a"] == 3 and levels["b"] == 4
+    assert ("q1", "a", "包含") in delta["removed_edges"]
+
+
+def test_remove_node_drops_incident_edges_once():
+    patch = {"operations": [{"op": "remove_node", "id": "a"}]}
+    patched, delta = graph_patch.apply_patch(sample_graph(), patch)
+    assert delta["removed_nodes"] == ["a"]
+    assert patched["relationships"] == []
+    _, second = graph_patch.apply_patch(patched, patch)
+    assert not graph_patch.has_changes(second)
+
+
+def test_invalid_operation_reports_position():
+    with pytest.raises(ValueError, match="第 2 个操作"):
+        graph_patch.apply_patch(sample_graph(), {"operations": [
+            {"op": "remove_node", "id": "b"},
+            {"op": "update_node", "id": "missing", "set": {"label": "x"}},
+        ]})
+
+
+def write_json(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+
+
+def test_patch_file_writes_atomically_and_skips_unchanged(tmp_path):
+    json_path = str(tmp_path / "graph.json")
+    write_json(json_path, sample_graph())
+
+    graph_patch.patch_file(json_path, PATCH)
+    with open(json_path, "r", encoding="utf-8") as f:
+        first = f.read()
+    assert os.listdir(tmp_path) == ["graph.json"]
+
+    mtime = os.stat(json_path).st_mtime_ns
+    delta = graph_patch.patch_file(json_path, PATCH)
+    assert not graph_patch.has_changes(delta)
+    assert os.stat(json_path).st_mtime_ns == mtime
+    with open(json_path, "r", encoding="utf-8") as f:
+        assert f.read() == first
+
+
+def test_dry_run_and_failed_patch_leave_file_untouched(tmp_path):
+    json_path = str(tmp_path / "graph.json")
+    write_json(json_path, sample_graph())
+    with open(json_path, "rb") as f:
+        original = f.read()
+
+    assert graph_patch.has_changes(graph_patch.patch_file(json_path, PATCH, dry_run=True))
+    with pytest.raises(ValueError):
+        graph_patch.patch_file(json_path, {"operations": [{"op": "upsert_node", "node": {"label": "无 id"}}]})
+    with open(json_path, "rb") as f:
+        assert f.read() == original
+    assert os.listdir(tmp_path) == ["graph.json"]
+
+
+class RecordingConn:
+    def __init__(self):
+        self.writes = []
+
+    def execute_write(self, query, parameters=None):
+        self.writes.append((query, parameters))
+
+
+def test_push_delta_assigns_source_order():
+    _, delta = graph_patch.apply_patch(sample_graph(), {"operations": [
+        {"op": "remove_node", "id": "b"},
+        {"op": "upsert_node", "node": {"id": "c", "label": "知识点C", "level": 2}},
+        {"op": "update_node", "id": "q2", "set": {"label": "问题二'"}},
+    ]})
+    conn = RecordingConn()
+    graph_patch.push_delta(conn, "TestLabel", delta)
+    rows = {row["id"]: row for query, parameters in conn.writes if "MERGE (n:" in query
+            for row in parameters["rows"]}
+    # 新节点排在所有原有节点（源文件中最大的 ord 为 3）之后；已有节点的 ord 只在缺失时补上
+    assert rows["c"]["ord"] > 3
+    assert rows["q2"]["ord"] < rows["c"]["ord"]
+    assert all("coalesce(n.ord, row.ord)" in query for query, _ in conn.writes if "MERGE (n:" in query)
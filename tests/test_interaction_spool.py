@@ -0,0 +1,169 @@
+"""interaction_spool：高水位只在批次写入成功后前移、部分同步后续传、半行和截断的缓冲文件、旧版记录导入后补写"""
+import json
+
+import pytest
+
+from interaction_spool import SPOOL_BATCH_SIZE, InteractionSpool, SpoolReplayer
+
+
+class FakeConn:
+    """按 id 合并写入的 Neo4j 替身；fail_on 为第几次写入（从1开始）时抛出异常"""
+
+    def __init__(self, store, fail_on=None):
+        self.driver = object()
+        self.store = store
+        self.fail_on = fail_on
+        self.writes = 0
+
+    def execute_write(self, query, parameters=None):
+        self.writes += 1
+        if self.writes == self.fail_on:
+            raise ConnectionError("连接中断")
+        for event in parameters["events"]:
+            # 旧版导入的记录：同一学生同一节点同一秒内已有的记录数超过 legacy_rank 时跳过
+            if "datetime.truncate" in query and self.count_in_second(event) > event["legacy_rank"]:
+                continue
+            self.store.setdefault(event["id"], []).append(event)
+
+    def count_in_second(self, event):
+        return sum(1 for writes in self.store.values()
+                   if (writes[0]["student_id"], writes[0]["node_id"], writes[0]["timestamp"][:19])
+                   == (event["student_id"], event["node_id"], event["timestamp"][:19]))
+
+    def close(self):
+        pass
+
+
+def event(index, count=1):
+    return {"id": f"s{index % 7}_n{index}_{index:06d}", "student_id": f"s{index % 7}", "node_id": f"n{index}",
+            "node_label": f"节点{index}", "action_type": "view", "count": count, "duration": 1.0,
+            "timestamp": f"2026-01-05T10:{index // 60 % 60:02d}:{index % 60:02d}"}
+
+
+def write_lines(path, events):
+    with open(path, "a", encoding="utf-8") as f:
+        for item in events:
+            f.write(json.dumps(item, ensure_ascii=False) + "\n")
+
+
+@pytest.fixture
+def spool(tmp_path):
+    return InteractionSpool(str(tmp_path / "interactions_log.jsonl"))
+
+
+def test_partial_replay_resumes_from_high_water_mark(spool):
+    total = SPOOL_BATCH_SIZE * 2 + 17
+    write_lines(spool.spool_path, [event(index) for index in range(total)])
+    store = {}
+    replayer = SpoolReplayer(spool, lambda: FakeConn(store, fail_on=2), "Test")
+
+    with pytest.raises(ConnectionError):
+        replayer.sync_once()
+    # 第一批已写入，高水位恰好停在第一批之后；第二批未确认，仍待同步
+    _, first_batch_end = spool._read_from(0, SPOOL_BATCH_SIZE)
+    assert spool.get_hwm() == first_batch_end
+    assert len(store) == SPOOL_BATCH_SIZE
+    assert spool.pending_count() == total - SPOOL_BATCH_SIZE
+    assert spool.pending_bytes() == spool.size() - first_batch_end
+
+    replayer._drop_connection()
+    replayer.conn_factory = lambda: FakeConn(store)
+    assert replayer.sync_once() == total - SPOOL_BATCH_SIZE
+    assert spool.get_hwm() == spool.size()
+    assert spool.pending_count() == 0
+    assert spool.pending_bytes() == 0
+    # 每条记录恰好写入一次（第一批没有被重复发送）
+    assert len(store) == total
+    assert all(len(writes) == 1 for writes in store.values())
+    assert replayer.sync_once() == 0
+
+
+def test_half_written_line_waits_for_newline(spool):
+    write_lines(spool.spool_path, [event(0)])
+    line = json.dumps(event(1), ensure_ascii=False)
+    with open(spool.spool_path, "a", encoding="utf-8") as f:
+        f.write(line[:20])
+    store = {}
+    replayer = SpoolReplayer(spool, lambda: FakeConn(store), "Test")
+
+    assert replayer.sync_once() == 1
+    complete = spool.get_hwm()
+    assert complete < spool.size()
+
+    with open(spool.spool_path, "a", encoding="utf-8") as f:
+        f.write(line[20:] + "\n")
+    assert replayer.sync_once() == 1
+    assert spool.get_hwm() == spool.size() > complete
+    assert set(store) == {event(0)["id"], event(1)["id"]}
+
+
+def test_merged_updates_are_folded_by_id(spool):
+    first = event(0)
+    updated = dict(first, count=3, duration=9.5)
+    for item in (first, event(1), updated):
+        spool.append(item)
+    events = spool.read_all()
+    assert [item["id"] for item in events] == [first["id"], event(1)["id"]]
+    assert events[0]["count"] == 3
+
+
+def test_truncated_spool_resyncs_from_start(spool):
+    write_lines(spool.spool_path, [event(index) for index in range(5)])
+    spool.set_hwm(spool.size() + 100)
+    assert spool.pending_bytes() == spool.size()
+    events, end_offset = spool.read_unsynced()
+    assert len(events) == 5
+    assert end_offset == spool.size()
+
+
+def legacy_row(student_id, node_id, timestamp, duration=3):
+    return {"student_id": student_id, "node_id": node_id, "node_label": node_id, "action_type": "view",
+            "duration": duration, "timestamp": timestamp}
+
+
+def baseline_neo4j_row(student_id, node_id, timestamp, microseconds):
+    """旧版直接写入 Neo4j 的记录：id 和时间带微秒"""
+    stamp = timestamp.replace("-", "").replace(" ", "").replace(":", "")
+    return {"id": f"{student_id}_{node_id}_{stamp}{microseconds:06d}", "student_id": student_id,
+            "node_id": node_id, "timestamp": f"{timestamp.replace(' ', 'T')}.{microseconds:06d}"}
+
+
+def test_legacy_records_already_in_neo4j_are_not_duplicated(tmp_path):
+    legacy_path = tmp_path / "interactions_log.json"
+    legacy_path.write_text(json.dumps([
+        # 同一秒内两次查看，旧版都已写入 Neo4j
+        legacy_row("s1", "q1", "2026-01-05 10:00:00"),
+        legacy_row("s1", "q1", "2026-01-05 10:00:00", duration=5),
+        # 同一秒内两次查看，Neo4j 中断时只写入了第一条
+        legacy_row("s2", "q1", "2026-01-05 10:00:01"),
+        legacy_row("s2", "q1", "2026-01-05 10:00:01"),
+        # Neo4j 中断期间只写入了本地文件
+        legacy_row("s1", "q2", "2026-01-05 10:00:02"),
+    ], ensure_ascii=False), encoding="utf-8")
+    spool = InteractionSpool(str(tmp_path / "interactions_log.jsonl"), legacy_path=str(legacy_path))
+    assert spool.get_hwm() == 0
+
+    store = {}
+    for row in (baseline_neo4j_row("s1", "q1", "2026-01-05 10:00:00", 123456),
+                baseline_neo4j_row("s1", "q1", "2026-01-05 10:00:00", 654321),
+                baseline_neo4j_row("s2", "q1", "2026-01-05 10:00:01", 500000)):
+        store[row["id"]] = [row]
+    replayer = SpoolReplayer(spool, lambda: FakeConn(store), "Test")
+    replayer.sync_once()
+
+    seconds = [(writes[0]["student_id"], writes[0]["node_id"], writes[0]["timestamp"][:19])
+               for writes in store.values()]
+    assert sorted(seconds) == [("s1", "q1", "2026-01-05T10:00:00"), ("s1", "q1", "2026-01-05T10:00:00"),
+                               ("s1", "q2", "2026-01-05T10:00:02"),
+                               ("s2", "q1", "2026-01-05T10:00:01"), ("s2", "q1", "2026-01-05T10:00:01")]
+    assert all(len(writes) == 1 for writes in store.values())
+
+    # 高水位被重置后重新补写，也不会产生重复
+    spool.set_hwm(0)
+    replayer.sync_once()
+    assert len(store) == 5
+    assert all(len(writes) == 1 for writes in store.values())
+
+    # 缓冲文件已存在时不再重复导入
+    InteractionSpool(spool.spool_path, legacy_path=str(legacy_path))
+    assert len(spool.read_all()) == 5
@@ -0,0 +1,33 @@
+"""query_log：慢查询日志和执行计划参数中不保留学生 id 等原始参数"""
+from query_log import ERROR_MESSAGE_LIMIT, QueryLog
+
+
+class PlanConn:
+    def __init__(self):
+        self.calls = []
+
+    def fetch_plan(self, query, parameters=None, profile=False):
+        self.calls.append((query, parameters, profile))
+        return {"operatorType": "ProduceResults", "children": [{"operatorType": "NodeIndexSeek"}]}
+
+
+def test_raw_parameters_are_not_kept():
+    log = QueryLog(threshold_ms=0)
+    parameters = {"student_id": "2023012345", "limit": 20,
+                  "events": [{"id": "2023012345_q1_1", "student_id": "2023012345", "count": 2}] * 3}
+    log.record("read", "MATCH (i {student_id: $student_id}) RETURN i LIMIT $limit", parameters, 0.5, 1,
+               error=RuntimeError("无法合并 2023012345 " + "x" * 500))
+
+    entry = log.slow_entries[0]
+    assert "2023012345" not in repr(entry["parameters"])
+    assert len(entry["error"]) <= ERROR_MESSAGE_LIMIT + 1
+
+    (_, _, stored), = log.worst_offenders()
+    assert "2023012345" not in repr(stored)
+    assert stored == {"student_id": "", "limit": 20, "events": [{"id": "", "student_id": "", "count": 2}]}
+
+    conn = PlanConn()
+    assert log.capture_plans(conn) == 1
+    assert conn.calls[0][1] == stored and conn.calls[0][2] is False
+    mode, text = next(iter(log.plans.values()))
+    assert mode == "EXPLAIN" and "NodeIndexSeek" in text